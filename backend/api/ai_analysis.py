@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 
 from backend.core.ai_service import ai_service
+from backend.core.executors import run_io
 from backend.core.data_store import InMemoryDataStore
 
 logger = logging.getLogger(__name__)
@@ -81,8 +82,8 @@ async def analyze_stage_performance(
                 "stats": stats
             }
         else:
-            # 完整AI分析（调用Kimi API）
-            result = ai_service.analyze_stage_performance(stage_data)
+            # 完整AI分析（调用Kimi API，同步HTTP请求在I/O线程中等待）
+            result = await run_io(ai_service.analyze_stage_performance, stage_data)
             result["analysis_type"] = "full"
             result["stats"] = stats
         
@@ -2,15 +2,21 @@
 台词提取API - 处理视频上传和台词提取
 """
 
-import os
+import json
+import asyncio
 import logging
-import tempfile
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends
-from fastapi.responses import JSONResponse
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from backend.core.audio_processor import audio_processor
+from backend.core.audio_processor import audio_processor, ASR_SAMPLE_RATE
+from backend.core.audio_chunking import ChunkStitcher
+from backend.core.asr_pool import recognize_file, stream_file, stitched_result
+from backend.core.executors import run_io
+from backend.core.job_queue import job_queue, JobContext, QueueFullError, ACTIVE_STATES, COMPLETED
+from backend.core.video_processor import video_processor
+from backend.core.workspace import workspace_manager, WorkspaceQuotaExceeded
 from backend.models.data_models import TranscriptSegment
 from backend.core.data_store import InMemoryDataStore
 
@@ -25,137 +31,318 @@ def get_data_store() -> InMemoryDataStore:
     from backend.main import data_store
     return data_store
 
+# 流式提取任务ID → 推送台词片段的队列
+_listeners: Dict[str, asyncio.Queue] = {}
+
 # 支持的视频格式
 SUPPORTED_VIDEO_FORMATS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".flv"}
 SUPPORTED_AUDIO_FORMATS = {".wav", ".mp3", ".flac", ".aac", ".ogg"}
 
+def _check_upload(file: UploadFile) -> str:
+    """验证上传文件的类型和大小，返回扩展名"""
+    file_extension = Path(file.filename or "").suffix.lower()
+    if file_extension not in SUPPORTED_VIDEO_FORMATS and file_extension not in SUPPORTED_AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的文件格式：{file_extension}。支持的格式：{SUPPORTED_VIDEO_FORMATS | SUPPORTED_AUDIO_FORMATS}"
+        )
+    
+    # 验证文件大小（限制200MB）
+    if file.size and file.size > 200 * 1024 * 1024:
+        raise HTTPException(
+            status_code=400,
+            detail="文件大小不能超过200MB"
+        )
+    return file_extension
+
+async def _save_upload(file: UploadFile, workspace, file_extension: str) -> str:
+    """把上传文件写入工作区，返回路径"""
+    temp_file_path = str(workspace.file(f"upload{file_extension}"))
+    with open(temp_file_path, "wb") as temp_file:
+        temp_file.write(await file.read())
+    
+    if file_extension in SUPPORTED_VIDEO_FORMATS:
+        # 视频文件：解码音轨后识别
+        logger.info("处理视频文件，开始解码音频...")
+    else:
+        # 音频文件：直接识别
+        logger.info("处理音频文件，开始语音识别...")
+    return temp_file_path
+
+def _save_dialogue_result(data_store: InMemoryDataStore, filename: str, file_size: Optional[int], language: str,
+                          enable_speaker_diarization: bool, hotwords: str,
+                          transcript_segments: List[TranscriptSegment], result: Dict[str, Any]) -> Dict[str, Any]:
+    """保存台词提取结果，返回响应内容（不含transcripts）"""
+    # 获取说话人统计信息
+    speaker_stats = audio_processor.get_speaker_statistics(result['sentences'])
+    
+    # 生成视频ID并保存数据
+    video_id = data_store.generate_video_id()
+    video_data = {
+        "id": video_id,
+        "filename": filename,
+        "file_size": file_size,
+        "language": language,
+        "enable_speaker_diarization": enable_speaker_diarization,
+        "hotwords": hotwords,
+        "transcripts": [segment.to_dict() for segment in transcript_segments],
+        "speaker_statistics": speaker_stats,
+        "raw_result": {
+            "text": result['text'],
+            "srt": result['srt'],
+            "sentences": result['sentences']
+        }
+    }
+    
+    # 保存到数据存储
+    data_store.save_video_data(video_id, video_data)
+    
+    logger.info(f"台词提取完成，共提取 {len(transcript_segments)} 个片段")
+    
+    return {
+        "success": True,
+        "video_id": video_id,
+        "filename": filename,
+        "total_segments": len(transcript_segments),
+        "total_duration": max([seg.end_time for seg in transcript_segments]) if transcript_segments else 0,
+        "language": language,
+        "speaker_count": speaker_stats['total_speakers'],
+        "speaker_statistics": speaker_stats,
+        "full_text": result['text'],
+        "srt_content": result['srt'],
+        "speech_trim": result.get('speech_trim')
+    }
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _media_duration(file_path: str, file_extension: str) -> Optional[float]:
+    """任务排序用的媒体时长，音频文件或无法探测时返回None（按默认耗时排队）"""
+    if file_extension not in SUPPORTED_VIDEO_FORMATS:
+        return None
+    try:
+        return (await run_io(video_processor.extract_video_info, file_path))["duration"] or None
+    except Exception as e:
+        logger.warning(f"无法获取媒体时长，按默认耗时排队: {file_path}, {e}")
+        return None
+
+async def _submit_extraction(file: UploadFile, file_extension: str, priority: str, stream: bool,
+                             language: str, enable_speaker_diarization: bool, hotwords: str):
+    """
+    保存上传文件并提交台词提取任务，返回 (工作区, 任务)
+
+    队列已满时在保存文件之前返回429。上传文件只在本次请求的工作区中，任务不重试。
+    """
+    try:
+        job_queue.admit(priority=priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    try:
+        workspace = await run_io(workspace_manager.create, "dialogue")
+    except WorkspaceQuotaExceeded as e:
+        raise HTTPException(status_code=507, detail=str(e))
+    
+    try:
+        temp_file_path = await _save_upload(file, workspace, file_extension)
+        duration = await _media_duration(temp_file_path, file_extension)
+        job = job_queue.submit("dialogue_extraction", params={
+            "file_path": temp_file_path,
+            "filename": file.filename,
+            "file_size": file.size,
+            "language": language,
+            "enable_speaker_diarization": enable_speaker_diarization,
+            "hotwords": hotwords,
+            "duration": duration,
+            "stream": stream
+        }, max_attempts=1, priority=priority, media_duration=duration, admit=False)
+    except QueueFullError as e:
+        await run_io(workspace.release)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception:
+        await run_io(workspace.release)
+        raise
+    return workspace, job
+
+def _cancel_if_active(job_id: str):
+    """请求结束（或客户端断开）时任务仍在排队或运行则取消"""
+    job = job_queue.get(job_id)
+    if job is not None and job.status in ACTIVE_STATES:
+        job_queue.cancel(job_id)
+
+async def dialogue_extraction_task(job: JobContext, file_path: str, filename: str, file_size: Optional[int],
+                                   language: str, enable_speaker_diarization: bool, hotwords: str,
+                                   duration: Optional[float] = None, stream: bool = False) -> Dict[str, Any]:
+    """
+    任务：识别上传文件中的台词并保存
+
+    stream为True时分块识别，每块新增的台词片段放入该任务的监听队列（见 /upload-video/stream）。
+    返回响应内容（不含transcripts）。
+    """
+    data_store = get_data_store()
+    transcript_segments: List[TranscriptSegment] = []
+    
+    if stream:
+        listener = _listeners.get(job.id)
+        stitcher = ChunkStitcher(ASR_SAMPLE_RATE, language)
+        batches = stream_file(file_path, stitcher, language, enable_speaker_diarization, hotwords)
+        try:
+            async for sentences in batches:
+                segments = audio_processor.convert_to_transcript_segments(sentences)
+                transcript_segments.extend(segments)
+                if listener is not None:
+                    for segment in segments:
+                        listener.put_nowait(segment.to_dict())
+                if duration and transcript_segments:
+                    job.report(min(transcript_segments[-1].end_time / duration, 0.99), f"已识别 {len(transcript_segments)} 个片段")
+                else:
+                    job.check_cancelled()
+        finally:
+            # 任务取消时立即关闭识别生成器，取消尚未开始的块
+            await batches.aclose()
+        result = stitched_result(stitcher)
+    else:
+        job.report(0.0, "语音识别中")
+        # 在ASR工作进程中识别，不阻塞事件循环
+        result = await recognize_file(
+            file_path,
+            language=language,
+            enable_speaker_diarization=enable_speaker_diarization,
+            hotwords=hotwords
+        )
+        transcript_segments = audio_processor.convert_to_transcript_segments(result['sentences'])
+    
+    return _save_dialogue_result(
+        data_store, filename, file_size, language, enable_speaker_diarization, hotwords, transcript_segments, result
+    )
+
+job_queue.register("dialogue_extraction", dialogue_extraction_task)
+
+async def _follow(job_id: str, listener: asyncio.Queue) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """依次输出任务推送的台词片段，任务结束后输出summary或error"""
+    finished = asyncio.ensure_future(job_queue.wait(job_id))
+    try:
+        while not finished.done():
+            item = asyncio.ensure_future(listener.get())
+            await asyncio.wait({item, finished}, return_when=asyncio.FIRST_COMPLETED)
+            if not item.done():
+                item.cancel()
+                break
+            yield "segment", item.result()
+        while not listener.empty():
+            yield "segment", listener.get_nowait()
+        
+        job = finished.result()
+        if job is not None and job.status == COMPLETED:
+            yield "summary", job.result
+        else:
+            detail = (job.error or job.message) if job is not None else "任务不存在"
+            yield "error", {"detail": f"台词提取失败: {detail}"}
+    finally:
+        finished.cancel()
+
 @router.post("/upload-video")
 async def upload_video_for_dialogue_extraction(
     file: UploadFile = File(...),
     language: str = Form("zh"),
     enable_speaker_diarization: bool = Form(True),
     hotwords: str = Form(""),
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
     data_store: InMemoryDataStore = Depends(get_data_store)
 ):
     """
     上传视频文件并提取台词
     
+    识别作为任务在任务队列中排队（准入控制、优先级和短任务优先与其他媒体任务相同），
+    请求等待任务完成后返回结果；请求中断时取消任务。
+    
     Args:
         file: 上传的视频文件
         language: 语音识别语言 (zh/en)
         enable_speaker_diarization: 是否启用说话人分离
         hotwords: 热词列表，逗号分隔
+        priority: interactive 或 batch
     
     Returns:
         包含台词信息的JSON响应
     """
+    # 验证文件类型和大小
+    file_extension = _check_upload(file)
+    
+    logger.info(f"开始处理上传的文件: {file.filename} ({file.size} bytes)")
+    
+    # 上传的文件保存在本次任务的工作区中，结束后连同提取的音频一起删除
+    workspace, job = await _submit_extraction(
+        file, file_extension, priority, False, language, enable_speaker_diarization, hotwords
+    )
     try:
-        # 验证文件类型
-        file_extension = Path(file.filename or "").suffix.lower()
-        if file_extension not in SUPPORTED_VIDEO_FORMATS and file_extension not in SUPPORTED_AUDIO_FORMATS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"不支持的文件格式：{file_extension}。支持的格式：{SUPPORTED_VIDEO_FORMATS | SUPPORTED_AUDIO_FORMATS}"
-            )
-        
-        # 验证文件大小（限制200MB）
-        if file.size and file.size > 200 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail="文件大小不能超过200MB"
-            )
-        
-        logger.info(f"开始处理上传的文件: {file.filename} ({file.size} bytes)")
-        
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            # 保存上传的文件
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
+        finished = await job_queue.wait(job.id)
+    finally:
+        _cancel_if_active(job.id)
+        await run_io(workspace.release)
+    
+    if finished is None or finished.status != COMPLETED:
+        detail = (finished.error or finished.message) if finished is not None else "任务不存在"
+        logger.error(f"台词提取失败: {detail}")
+        raise HTTPException(status_code=500, detail=f"台词提取失败: {detail}")
+    
+    summary = dict(finished.result)
+    summary["transcripts"] = data_store.get_video_data(summary["video_id"])["transcripts"]
+    return JSONResponse(summary)
+
+@router.post("/upload-video/stream")
+async def stream_dialogue_extraction(
+    file: UploadFile = File(...),
+    language: str = Form("zh"),
+    enable_speaker_diarization: bool = Form(True),
+    hotwords: str = Form(""),
+    priority: str = Query("interactive", pattern="^(interactive|batch)$")
+):
+    """
+    上传视频文件并以Server-Sent Events流式返回台词
+    
+    识别作为任务在任务队列中排队，开始后分块识别，每块完成后立即推送其中的台词，第一句在几秒内可见。事件：
+    - job: 已提交的任务，data为 {"job_id", "priority"}，可用 /api/jobs/{job_id} 查询进度或取消
+    - segment: 一个台词片段，格式同TranscriptSegment.to_dict()
+    - summary: 全部完成后的汇总，字段同 /upload-video 的响应（不含transcripts），包括speaker_statistics和srt_content
+    - error: 识别失败或任务被取消，data为 {"detail": 错误信息}
+    客户端断开时取消任务。
+    
+    Args:
+        file: 上传的视频文件
+        language: 语音识别语言 (zh/en)
+        enable_speaker_diarization: 是否启用说话人分离
+        hotwords: 热词列表，逗号分隔
+        priority: interactive 或 batch
+    """
+    file_extension = _check_upload(file)
+    
+    logger.info(f"开始流式处理上传的文件: {file.filename} ({file.size} bytes)")
+    
+    workspace, job = await _submit_extraction(
+        file, file_extension, priority, True, language, enable_speaker_diarization, hotwords
+    )
+    # 提交后没有让出事件循环，任务开始前监听队列已登记
+    listener: asyncio.Queue = asyncio.Queue()
+    _listeners[job.id] = listener
+    
+    async def events():
         try:
-            # 根据文件类型进行处理
-            if file_extension in SUPPORTED_VIDEO_FORMATS:
-                # 视频文件：提取音频后识别
-                logger.info("处理视频文件，开始提取音频...")
-                result = audio_processor.recognize_video_file(
-                    temp_file_path, 
-                    language=language,
-                    enable_speaker_diarization=enable_speaker_diarization,
-                    hotwords=hotwords
-                )
-            else:
-                # 音频文件：直接识别
-                logger.info("处理音频文件，开始语音识别...")
-                result = audio_processor.recognize_audio_file(
-                    temp_file_path,
-                    language=language, 
-                    enable_speaker_diarization=enable_speaker_diarization,
-                    hotwords=hotwords
-                )
-            
-            # 转换为TranscriptSegment格式
-            transcript_segments = audio_processor.convert_to_transcript_segments(
-                result['sentences'],
-                video_id=f"uploaded_{file.filename}"
-            )
-            
-            # 获取说话人统计信息
-            speaker_stats = audio_processor.get_speaker_statistics(result['sentences'])
-            
-            # 生成视频ID并保存数据
-            video_id = data_store.generate_video_id()
-            video_data = {
-                "id": video_id,
-                "filename": file.filename,
-                "file_size": file.size,
-                "language": language,
-                "enable_speaker_diarization": enable_speaker_diarization,
-                "hotwords": hotwords,
-                "transcripts": [segment.to_dict() for segment in transcript_segments],
-                "speaker_statistics": speaker_stats,
-                "raw_result": {
-                    "text": result['text'],
-                    "srt": result['srt'],
-                    "sentences": result['sentences']
-                }
-            }
-            
-            # 保存到数据存储
-            data_store.save_video_data(video_id, video_data)
-            
-            logger.info(f"台词提取完成，共提取 {len(transcript_segments)} 个片段")
-            
-            return JSONResponse({
-                "success": True,
-                "video_id": video_id,
-                "filename": file.filename,
-                "total_segments": len(transcript_segments),
-                "total_duration": max([seg.end_time for seg in transcript_segments]) if transcript_segments else 0,
-                "language": language,
-                "speaker_count": speaker_stats['total_speakers'],
-                "transcripts": [segment.to_dict() for segment in transcript_segments],
-                "speaker_statistics": speaker_stats,
-                "full_text": result['text'],
-                "srt_content": result['srt']
-            })
-            
+            yield _sse("job", {"job_id": job.id, "priority": job.priority})
+            async for event, data in _follow(job.id, listener):
+                yield _sse(event, data)
         finally:
-            # 清理临时文件
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"台词提取失败: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"台词提取失败: {str(e)}"
-        )
+            # 识别结束或客户端断开后取消任务并清理临时文件
+            _listeners.pop(job.id, None)
+            _cancel_if_active(job.id)
+            await run_io(workspace.release)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/video/{video_id}/dialogues")
 async def get_video_dialogues(
@@ -0,0 +1,45 @@
+"""
+任务队列API路由
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+
+from backend.core.job_queue import job_queue
+
+router = APIRouter()
+
+@router.get("/")
+async def list_jobs(
+    video_id: Optional[str] = None,
+    kind: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """列出任务（按提交时间倒序）"""
+
+    jobs = job_queue.list_jobs(video_id=video_id, kind=kind, status=status, limit=limit)
+    return {
+        "jobs": [job.to_dict() for job in jobs],
+        "statistics": job_queue.get_statistics()
+    }
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """获取任务状态、进度、预计剩余时间和结果"""
+
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    return job.to_dict()
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """取消排队中或运行中的任务"""
+
+    job = job_queue.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    return job.to_dict()
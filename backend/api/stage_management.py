@@ -110,6 +110,16 @@ async def update_actor_position(
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
     
+    # 优先修改检测轨迹中对应时间戳的采样点
+    if data_store.update_track_position(video_id, actor_id, timestamp, request.x, request.y):
+        data_store.save_to_json("data/project_data.json")
+        return {
+            "message": "位置更新成功",
+            "actor_id": actor_id,
+            "timestamp": timestamp,
+            "position": {"x": request.x, "y": request.y}
+        }
+    
     # 获取现有位置数据
     positions = data_store.get_actor_positions(video_id)
     
@@ -124,7 +134,7 @@ async def update_actor_position(
     
     if not updated:
         # 如果没有找到对应的位置数据，创建新的
-        from models.data_models import ActorPosition
+        from backend.models.data_models import ActorPosition
         new_position = ActorPosition.create(
             actor_id, timestamp, Position2D(request.x, request.y), 1.0
         )
@@ -154,6 +164,7 @@ async def get_timeline_data(
     
     transcripts = data_store.get_transcripts(video_id)
     positions = data_store.get_actor_positions(video_id)
+    tracks = data_store.get_actor_tracks(video_id)
     
     # 获取项目的灯光和音乐数据
     project = data_store.get_current_project()
@@ -168,6 +179,7 @@ async def get_timeline_data(
         "video": dataclass_to_dict(video),
         "transcripts": [dataclass_to_dict(t) for t in transcripts],
         "actor_positions": [dataclass_to_dict(p) for p in positions],
+        "actor_tracks": [dataclass_to_dict(t) for t in tracks],
         "lighting_cues": [dataclass_to_dict(c) for c in lighting_cues],
         "music_cues": [dataclass_to_dict(c) for c in music_cues]
     }
\ No newline at end of file
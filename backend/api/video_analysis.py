@@ -2,17 +2,35 @@
 视频分析API路由
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks
-from typing import List, Dict, Any
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, FileResponse, JSONResponse
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional
 import os
 import shutil
+import asyncio
 import logging
+import numpy as np
 from pathlib import Path
 
-from backend.models.data_models import Video, dataclass_to_dict
+from backend.models.data_models import Video, ActorTrack, SceneMarker, dataclass_to_dict
+from backend.models.validators import validate_stage_calibration
 from backend.core.data_store import InMemoryDataStore
 from backend.core.video_processor import video_processor
-from backend.core.audio_processor import audio_processor
+from backend.core.thumbnail_cache import thumbnail_cache
+from backend.core.filmstrip import generate_filmstrip, load_filmstrip_index
+from backend.core.audio_processor import audio_processor, decode_audio
+from backend.core.asr_pool import transcribe_file, transcribe_range
+from backend.core.transcript_splice import expand_range, splice_transcripts
+from backend.core.executors import run_io, run_cpu, get_cpu_executor
+from backend.core.job_queue import job_queue, Job, JobContext, JobCancelled, QueueFullError
+from backend.core.pose_pipeline import actor_position_pipeline
+from backend.core.tracker import match_previous_tracks
+from backend.core.stage_calibration import reproject_tracks
+from backend.core.scene_detection import SceneDetectionConfig, detect_scenes
+from backend.core.motion_energy import (
+    MotionEnergyConfig, compute_motion_energy, motion_energy_store
+)
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -20,21 +38,71 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 自动识别出的演员依次使用的颜色
+ACTOR_COLORS = ["#FF5733", "#33A1FF", "#33FF57", "#F3C623", "#A633FF", "#FF33A8", "#33FFF5", "#FF8F33"]
+
+class TranscribeRangeRequest(BaseModel):
+    start_time: float
+    end_time: float
+    language: str = "zh"
+    hotwords: str = ""
+
+class StageCalibrationRequest(BaseModel):
+    # 舞台四角（左上、右上、右下、左下）的归一化画面坐标，None表示清除标定
+    points: Optional[List[List[float]]] = None
+
+def _analysis_path(video: Video, min_width: int = 0) -> str:
+    """分析读取使用的文件：有代理文件且分辨率够用时读代理，原文件只用于播放和导出"""
+    if (video.proxy_path and min_width <= video_processor.PROXY_WIDTH
+            and os.path.exists(video.proxy_path)):
+        return video.proxy_path
+    return video.file_path
+
 # 依赖注入：获取数据存储实例
 def get_data_store() -> InMemoryDataStore:
     from backend.main import data_store
     return data_store
 
+def _queue_full(e: QueueFullError) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def _media_duration(video: Video) -> Optional[float]:
+    """任务排序用的媒体时长：优先用已记录的时长，否则探测文件"""
+    if video.duration > 0:
+        return video.duration
+    try:
+        return (await run_io(video_processor.extract_video_info, video.file_path))["duration"]
+    except Exception as e:
+        logger.warning(f"无法获取视频时长，按默认耗时排队: {video.id}, {e}")
+        return None
+
+async def _submit_job(kind: str, video: Video, params: Dict[str, Any], priority: str,
+                      duration: Optional[float] = None) -> Job:
+    """提交该视频的任务，队列已满时返回429（duration: 任务处理的媒体时长，默认为整个视频）"""
+    try:
+        job_queue.admit(priority=priority)
+        if duration is None:
+            duration = await _media_duration(video)
+        return job_queue.submit(kind, video.id, params, priority=priority, media_duration=duration, admit=False)
+    except QueueFullError as e:
+        raise _queue_full(e)
+
 @router.post("/upload")
 async def upload_video(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
     data_store: InMemoryDataStore = Depends(get_data_store)
 ):
-    """上传视频文件"""
+    """上传视频文件（priority: interactive 或 batch，批量导入时使用batch）"""
     
     logger.info(f"开始上传视频: {file.filename}")
     
+    # 准入控制：队列已满时在保存文件之前拒绝
+    try:
+        job_queue.admit(2, priority)
+    except QueueFullError as e:
+        raise _queue_full(e)
+    
     # 基础验证
     if not file.filename:
         raise HTTPException(status_code=400, detail="文件名不能为空")
@@ -82,7 +150,7 @@ async def upload_video(
     
     # 验证保存的文件
     try:
-        validation_result = video_processor.validate_video_file(str(file_path), file_size)
+        validation_result = await run_io(video_processor.validate_video_file, str(file_path), file_size)
         
         if not validation_result["valid"]:
             # 删除无效文件
@@ -105,8 +173,11 @@ async def upload_video(
     # 创建视频记录
     video = data_store.add_video(file.filename, str(file_path))
     
-    # 后台任务：提取视频信息
-    background_tasks.add_task(extract_video_info_task, video.id, str(file_path), data_store)
+    # 排队任务：提取视频信息，然后生成分析用代理文件（已在上面做过准入检查）
+    duration = await _media_duration(video)
+    params = {"video_id": video.id, "file_path": str(file_path)}
+    info_job = job_queue.submit("video_info", video.id, params, priority=priority, media_duration=duration, admit=False)
+    proxy_job = job_queue.submit("proxy", video.id, params, priority=priority, media_duration=duration, admit=False)
     
     # 保存数据
     try:
@@ -119,16 +190,18 @@ async def upload_video(
     
     return {
         "message": "视频上传成功，正在后台处理...",
-        "video": dataclass_to_dict(video)
+        "video": dataclass_to_dict(video),
+        "job_ids": [info_job.id, proxy_job.id]
     }
 
-async def extract_video_info_task(video_id: str, file_path: str, data_store: InMemoryDataStore):
-    """后台任务：提取视频信息"""
+async def extract_video_info_task(job: JobContext, video_id: str, file_path: str) -> Dict[str, Any]:
+    """任务：提取视频信息"""
+    data_store = get_data_store()
     try:
         logger.info(f"开始提取视频信息: {video_id}")
         
         # 提取视频信息
-        video_info = video_processor.extract_video_info(file_path)
+        video_info = await run_io(video_processor.extract_video_info, file_path)
         
         # 更新视频记录
         data_store.update_video_status(
@@ -142,23 +215,94 @@ async def extract_video_info_task(video_id: str, file_path: str, data_store: InM
         video = data_store.get_video(video_id)
         if video:
             video.resolution = video_info["resolution"]
-        
+        job.report(0.5, "视频信息已提取")
+
+        # 构建关键帧索引，后续缩略图和取帧直接按索引定位
+        try:
+            index_info = await run_io(video_processor.build_keyframe_index, file_path)
+            logger.info(f"关键帧索引已建立: {video_id}, {index_info}")
+        except Exception as e:
+            logger.warning(f"关键帧索引构建失败，将退回帧号seek: {video_id}, {e}")
+
         # 保存数据
         data_store.save_to_json("data/project_data.json")
         
         logger.info(f"视频信息提取完成: {video_id}")
+        return {
+            "duration": video_info["duration"],
+            "fps": video_info["fps"],
+            "resolution": video_info["resolution"]
+        }
         
     except Exception as e:
         logger.error(f"视频信息提取失败: {video_id}, {e}")
         
-        # 更新状态为错误
+        # 更新状态为错误（重试成功后会被覆盖）
         data_store.update_video_status(video_id, "error")
         data_store.save_to_json("data/project_data.json")
+        raise
+
+job_queue.register("video_info", extract_video_info_task, cost_factor=0.01)
+
+async def create_proxy_task(job: JobContext, video_id: str, file_path: str) -> Dict[str, Any]:
+    """任务：生成分析用低分辨率代理文件（失败不影响原文件的使用）"""
+    data_store = get_data_store()
+    try:
+        output_path = Path("data/proxies") / f"{video_id}.mp4"
+
+        # 转码占用CPU，经由CPU执行器限制并发
+        proxy_info = await run_cpu(video_processor.create_proxy, file_path, str(output_path))
+        if proxy_info is None:
+            return {"proxy_path": None}
+        job.report(0.8, "代理文件已生成")
+
+        # 代理文件也建立关键帧索引，取帧直接按索引定位
+        await run_io(video_processor.build_keyframe_index, proxy_info["proxy_path"])
+
+        video = data_store.get_video(video_id)
+        if video:
+            video.proxy_path = proxy_info["proxy_path"]
+            data_store.save_to_json("data/project_data.json")
+
+        logger.info(f"代理文件已就绪: {video_id}, {proxy_info}")
+        return proxy_info
+
+    except Exception as e:
+        logger.warning(f"代理文件生成失败，分析将读取原文件: {video_id}, {e}")
+        raise
+
+job_queue.register("proxy", create_proxy_task, cost_factor=0.3)
+
+@router.post("/{video_id}/proxy")
+async def create_proxy(
+    video_id: str,
+    priority: str = Query("batch", pattern="^(interactive|batch)$"),
+    data_store: InMemoryDataStore = Depends(get_data_store)
+):
+    """（重新）生成分析用代理文件"""
+
+    video = data_store.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+
+    if not os.path.exists(video.file_path):
+        raise HTTPException(status_code=404, detail="视频文件不存在")
+
+    if job_queue.find_active(video_id, "proxy"):
+        raise HTTPException(status_code=409, detail="代理文件正在生成中")
+
+    job = await _submit_job("proxy", video, {"video_id": video_id, "file_path": video.file_path}, priority)
+
+    return {
+        "message": "代理文件生成任务已提交",
+        "video_id": video_id,
+        "job_id": job.id
+    }
 
 @router.post("/{video_id}/extract-audio")
 async def extract_audio(
     video_id: str,
-    background_tasks: BackgroundTasks,
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
     data_store: InMemoryDataStore = Depends(get_data_store)
 ):
     """提取视频音频"""
@@ -170,39 +314,46 @@ async def extract_audio(
     if not os.path.exists(video.file_path):
         raise HTTPException(status_code=404, detail="视频文件不存在")
     
-    # 后台任务：提取音频
-    background_tasks.add_task(extract_audio_task, video_id, video.file_path, data_store)
+    # 排队任务：提取音频，音频属性保存在任务结果中
+    job = await _submit_job("extract_audio", video, {"video_id": video_id, "video_path": video.file_path}, priority)
     
     return {
-        "message": "音频提取任务已启动",
-        "video_id": video_id
+        "message": "音频提取任务已提交",
+        "video_id": video_id,
+        "job_id": job.id
     }
 
-async def extract_audio_task(video_id: str, video_path: str, data_store: InMemoryDataStore):
-    """后台任务：提取音频"""
+async def extract_audio_task(job: JobContext, video_id: str, video_path: str) -> Dict[str, Any]:
+    """任务：提取音频并分析音频属性"""
     try:
         logger.info(f"开始提取音频: {video_id}")
         
-        # 提取音频
-        audio_path = audio_processor.extract_audio_from_video(video_path)
-        
-        # 分析音频属性
-        audio_properties = audio_processor.analyze_audio_properties(audio_path)
+        def extract_and_analyze():
+            # ffmpeg直接把音轨解码到内存，不再经moviepy写WAV
+            data = decode_audio(video_path)
+            job.report(0.5, "音频已提取")
+            
+            # 分析音频属性
+            return audio_processor.analyze_audio_properties(data)
         
-        logger.info(f"音频提取完成: {video_id}, 音频文件: {audio_path}")
+        # 解码在ffmpeg子进程中进行，在I/O线程中等待
+        audio_properties = await run_io(extract_and_analyze)
         
-        # 这里可以保存音频路径到数据存储中
-        # 暂时只记录日志
+        logger.info(f"音频提取完成: {video_id}, 音频属性: {audio_properties}")
+        return {"audio_properties": audio_properties}
         
     except Exception as e:
         logger.error(f"音频提取失败: {video_id}, {e}")
+        raise
+
+job_queue.register("extract_audio", extract_audio_task, cost_factor=0.05)
 
 @router.post("/{video_id}/transcribe")
 async def transcribe_video(
     video_id: str,
-    background_tasks: BackgroundTasks,
     use_whisper: bool = False,
     language: str = "zh",
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
     data_store: InMemoryDataStore = Depends(get_data_store)
 ):
     """转录视频音频为文本"""
@@ -214,42 +365,38 @@ async def transcribe_video(
     if not os.path.exists(video.file_path):
         raise HTTPException(status_code=404, detail="视频文件不存在")
     
-    # 后台任务：音频转录
-    background_tasks.add_task(
-        transcribe_audio_task, 
-        video_id, 
-        video.file_path, 
-        use_whisper, 
-        language, 
-        data_store
-    )
+    # 排队任务：音频转录
+    job = await _submit_job("transcribe", video, {
+        "video_id": video_id,
+        "video_path": video.file_path,
+        "use_whisper": use_whisper,
+        "language": language
+    }, priority)
     
     return {
-        "message": "音频转录任务已启动",
+        "message": "音频转录任务已提交",
         "video_id": video_id,
+        "job_id": job.id,
+        "priority": job.priority,
         "use_whisper": use_whisper,
         "language": language
     }
 
 async def transcribe_audio_task(
+    job: JobContext,
     video_id: str, 
     video_path: str, 
     use_whisper: bool, 
-    language: str, 
-    data_store: InMemoryDataStore
-):
-    """后台任务：音频转录"""
+    language: str
+) -> Dict[str, Any]:
+    """任务：音频转录"""
+    data_store = get_data_store()
     try:
         logger.info(f"开始音频转录: {video_id}")
         
-        # 提取音频
-        audio_path = audio_processor.extract_audio_from_video(video_path)
-        
-        # 转录音频
-        if use_whisper:
-            transcripts = audio_processor.transcribe_audio_with_funasr(audio_path, language)
-        else:
-            transcripts = audio_processor.transcribe_audio_simple(audio_path, language)
+        # 解码音频后在ASR工作进程中转录（模型常驻，音频经共享内存传入）；
+        # use_whisper仅为兼容旧接口保留，两种请求都由FunASR识别
+        transcripts = await transcribe_file(video_path, language)
         
         # 保存转录结果
         data_store.add_transcripts(video_id, transcripts)
@@ -263,13 +410,100 @@ async def transcribe_audio_task(
         data_store.save_to_json("data/project_data.json")
         
         logger.info(f"音频转录完成: {video_id}, {len(transcripts)} 个片段")
+        return {"segments": len(transcripts)}
         
     except Exception as e:
         logger.error(f"音频转录失败: {video_id}, {e}")
         
-        # 更新状态为错误
+        # 更新状态为错误（重试成功后会被覆盖）
         data_store.update_video_status(video_id, "error")
         data_store.save_to_json("data/project_data.json")
+        raise
+
+job_queue.register("transcribe", transcribe_audio_task)
+
+@router.post("/{video_id}/transcribe-range")
+async def transcribe_video_range(
+    video_id: str,
+    request: TranscribeRangeRequest,
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
+    data_store: InMemoryDataStore = Depends(get_data_store)
+):
+    """
+    只重新转录视频的一个时间区间（如剪辑后或换热词重跑一场戏）
+
+    区间扩展到与之相交的已有片段的边界；区间外的片段（含ID和手动指定的说话人）不变，
+    耗时与区间长度成正比。
+    """
+    
+    video = data_store.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    if not video.file_path or not os.path.exists(video.file_path):
+        raise HTTPException(status_code=404, detail="视频文件不存在")
+    
+    if request.start_time < 0 or request.end_time <= request.start_time:
+        raise HTTPException(status_code=400, detail="时间区间无效")
+    
+    start_time, end_time = expand_range(data_store.get_transcripts(video_id), request.start_time, request.end_time)
+    
+    # 排队任务：区间转录，预计耗时按区间长度计算
+    job = await _submit_job("transcribe_range", video, {
+        "video_id": video_id,
+        "video_path": video.file_path,
+        "start_time": request.start_time,
+        "end_time": request.end_time,
+        "language": request.language,
+        "hotwords": request.hotwords
+    }, priority, duration=end_time - start_time)
+    
+    return {
+        "message": "区间转录任务已提交",
+        "video_id": video_id,
+        "job_id": job.id,
+        "priority": job.priority,
+        "start_time": start_time,
+        "end_time": end_time
+    }
+
+async def transcribe_range_task(
+    job: JobContext,
+    video_id: str,
+    video_path: str,
+    start_time: float,
+    end_time: float,
+    language: str,
+    hotwords: str
+) -> Dict[str, Any]:
+    """任务：区间转录，识别结果替换该区间内的片段"""
+    data_store = get_data_store()
+    try:
+        start, end = expand_range(data_store.get_transcripts(video_id), start_time, end_time)
+        logger.info(f"开始区间转录: {video_id}, {start:.2f}s~{end:.2f}s")
+        
+        segments = await transcribe_range(video_path, start, end, language, hotwords)
+        job.report(0.9, "识别完成")
+        
+        # 按识别完成时的片段列表替换（识别期间的手动修改不会丢失）
+        transcripts, replaced = splice_transcripts(data_store.get_transcripts(video_id), segments, start, end)
+        data_store.add_transcripts(video_id, transcripts)
+        data_store.save_to_json("data/project_data.json")
+        
+        logger.info(f"区间转录完成: {video_id}, 替换 {len(replaced)} 个片段为 {len(segments)} 个")
+        return {
+            "start_time": start,
+            "end_time": end,
+            "removed": len(replaced),
+            "added": len(segments),
+            "segments": len(transcripts)
+        }
+        
+    except Exception as e:
+        logger.error(f"区间转录失败: {video_id}, {e}")
+        raise
+
+job_queue.register("transcribe_range", transcribe_range_task)
 
 @router.get("/{video_id}/audio-info")
 async def get_audio_info(
@@ -285,15 +519,16 @@ async def get_audio_info(
     if not os.path.exists(video.file_path):
         raise HTTPException(status_code=404, detail="视频文件不存在")
     
+    def extract_and_analyze():
+        # 只解码一次，属性和语音片段都基于同一份采样
+        data = decode_audio(video.file_path)
+        return (
+            audio_processor.analyze_audio_properties(data),
+            audio_processor.detect_speech_segments(data)
+        )
+    
     try:
-        # 提取音频（如果还没有的话）
-        audio_path = audio_processor.extract_audio_from_video(video.file_path)
-        
-        # 分析音频属性
-        audio_properties = audio_processor.analyze_audio_properties(audio_path)
-        
-        # 检测语音片段
-        speech_segments = audio_processor.detect_speech_segments(audio_path)
+        audio_properties, speech_segments = await run_io(extract_and_analyze)
         
         return {
             "video_id": video_id,
@@ -345,11 +580,11 @@ async def get_video_details(
         
         try:
             # 获取详细信息
-            detailed_info = video_processor.extract_video_info(video.file_path)
+            detailed_info = await run_io(video_processor.extract_video_info, video.file_path)
             result["detailed_info"] = detailed_info
             
             # 验证文件
-            validation = video_processor.validate_video_content(video.file_path)
+            validation = await run_io(video_processor.validate_video_content, _analysis_path(video))
             result["validation"] = validation
             
         except Exception as e:
@@ -361,7 +596,9 @@ async def get_video_details(
 @router.get("/{video_id}/thumbnail")
 async def get_video_thumbnail(
     video_id: str,
-    timestamp: float = 1.0,
+    request: Request,
+    timestamp: float = Query(1.0, ge=0),
+    width: int = Query(320, ge=16, le=1920),
     data_store: InMemoryDataStore = Depends(get_data_store)
 ):
     """获取视频缩略图"""
@@ -373,23 +610,279 @@ async def get_video_thumbnail(
     if not os.path.exists(video.file_path):
         raise HTTPException(status_code=404, detail="视频文件不存在")
     
+    # 缓存键和ETag包含读取的文件（代理或原文件）及其修改时间，重新上传或重新生成代理后不再命中
+    source = _analysis_path(video, width)
+    key = thumbnail_cache.make_key(video_id, timestamp, width, source)
+    etag = thumbnail_cache.etag(key)
+    cache_headers = {
+        "Cache-Control": "public, max-age=86400",
+        "ETag": etag
+    }
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    
     try:
-        thumbnail_path = video_processor.extract_thumbnail(video.file_path, timestamp)
-        
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            from fastapi.responses import FileResponse
-            return FileResponse(
-                thumbnail_path,
-                media_type="image/jpeg",
-                filename=f"{video_id}_thumbnail.jpg"
-            )
-        else:
+        data = await run_io(
+            thumbnail_cache.get_or_create,
+            key,
+            lambda: video_processor.render_thumbnail(source, thumbnail_cache.bucket_timestamp(key), width)
+        )
+        
+        if not data:
             raise HTTPException(status_code=500, detail="缩略图生成失败")
+        
+        return Response(content=data, media_type="image/jpeg", headers=cache_headers)
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"缩略图生成失败: {e}")
         raise HTTPException(status_code=500, detail=f"缩略图生成失败: {str(e)}")
 
+# 同一视频同一参数的胶片条只生成一次
+_filmstrip_locks: Dict[str, asyncio.Lock] = {}
+
+def _filmstrip_dir(video_id: str, interval: float, tile_width: int) -> Path:
+    return Path("data/filmstrips") / video_id / f"i{interval:g}_w{tile_width}"
+
+@router.get("/{video_id}/filmstrip")
+async def get_video_filmstrip(
+    video_id: str,
+    interval: float = Query(5.0, ge=0.5, le=600),
+    tile_width: int = Query(160, ge=32, le=640),
+    data_store: InMemoryDataStore = Depends(get_data_store)
+):
+    """获取时间轴胶片条索引（首次请求时在工作进程中生成）"""
+    
+    video = data_store.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    if not os.path.exists(video.file_path):
+        raise HTTPException(status_code=404, detail="视频文件不存在")
+    
+    output_dir = _filmstrip_dir(video_id, interval, tile_width)
+    lock = _filmstrip_locks.setdefault(str(output_dir), asyncio.Lock())
+    
+    source_path = _analysis_path(video, tile_width)
+    
+    try:
+        async with lock:
+            index = load_filmstrip_index(str(output_dir), source_path)
+            if index is None:
+                index = await run_cpu(generate_filmstrip, source_path, str(output_dir), interval, tile_width)
+    except Exception as e:
+        logger.error(f"胶片条生成失败: {e}")
+        raise HTTPException(status_code=500, detail=f"胶片条生成失败: {str(e)}")
+    finally:
+        # 生成结束后移除；等锁的请求进入后会先读到已生成的索引
+        if _filmstrip_locks.get(str(output_dir)) is lock:
+            del _filmstrip_locks[str(output_dir)]
+    
+    base_url = f"/api/video/{video_id}/filmstrip/sheets"
+    return {
+        "video_id": video_id,
+        **{k: v for k, v in index.items() if k not in ("version", "source", "sheets")},
+        "sheets": [
+            f"{base_url}/{i}?interval={interval:g}&tile_width={tile_width}"
+            for i in range(len(index["sheets"]))
+        ]
+    }
+
+@router.get("/{video_id}/filmstrip/sheets/{sheet_index}")
+async def get_video_filmstrip_sheet(
+    video_id: str,
+    sheet_index: int,
+    interval: float = Query(5.0, ge=0.5, le=600),
+    tile_width: int = Query(160, ge=32, le=640),
+    data_store: InMemoryDataStore = Depends(get_data_store)
+):
+    """获取胶片条雪碧图"""
+    
+    video = data_store.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    output_dir = _filmstrip_dir(video_id, interval, tile_width)
+    index = load_filmstrip_index(str(output_dir), _analysis_path(video, tile_width))
+    if index is None:
+        raise HTTPException(status_code=404, detail="胶片条尚未生成")
+    
+    if sheet_index < 0 or sheet_index >= len(index["sheets"]):
+        raise HTTPException(status_code=404, detail="雪碧图不存在")
+    
+    return FileResponse(
+        str(output_dir / index["sheets"][sheet_index]),
+        media_type="image/jpeg",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
+async def _scene_response(video: Video) -> Dict[str, Any]:
+    """场景标记及由其划分出的场景区间，以及最近一次场景检测任务的状态"""
+    markers = sorted(video.scene_markers, key=lambda marker: marker.timestamp)
+    # 未处理的视频还没有记录时长，最后一个区间按探测到的容器时长收尾
+    duration = await _media_duration(video) or (markers[-1].timestamp if markers else 0.0)
+    bounds = [0.0] + [marker.timestamp for marker in markers] + [duration]
+    job = job_queue.latest(video.id, "scene_detection")
+    return {
+        "video_id": video.id,
+        "markers": [dataclass_to_dict(marker) for marker in markers],
+        "scenes": [
+            {"index": i, "start_time": start, "end_time": end}
+            for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))
+        ],
+        "detection": None if job is None else {
+            "job_id": job.id,
+            "status": job.status,
+            "progress": job.progress,
+            "error": job.error
+        }
+    }
+
+@router.post("/{video_id}/scenes")
+async def detect_video_scenes(
+    video_id: str,
+    threshold: float = Query(0.3, gt=0, le=1),
+    min_scene_seconds: float = Query(2.0, ge=0),
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
+    data_store: InMemoryDataStore = Depends(get_data_store)
+):
+    """提交场景检测任务，完成后保存为视频的场景标记（覆盖原有标记）"""
+    
+    video = data_store.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    if not os.path.exists(video.file_path):
+        raise HTTPException(status_code=404, detail="视频文件不存在")
+    
+    if job_queue.find_active(video_id, "scene_detection"):
+        raise HTTPException(status_code=409, detail="场景检测正在进行中")
+    
+    job = await _submit_job("scene_detection", video, {
+        "video_id": video_id,
+        "threshold": threshold,
+        "min_scene_seconds": min_scene_seconds
+    }, priority)
+    
+    return {
+        "message": "场景检测任务已提交",
+        "video_id": video_id,
+        "job_id": job.id
+    }
+
+async def scene_detection_task(job: JobContext, video_id: str, threshold: float,
+                               min_scene_seconds: float) -> Dict[str, Any]:
+    """任务：检测场景边界并保存为视频的场景标记"""
+    data_store = get_data_store()
+    video = data_store.get_video(video_id)
+    if not video:
+        raise Exception("视频不存在")
+    
+    # 运行时才选读取的文件：排队期间可能已生成代理
+    config = SceneDetectionConfig(threshold=threshold, min_scene_seconds=min_scene_seconds)
+    result = await run_cpu(detect_scenes, _analysis_path(video, config.max_width), config)
+    job.report(0.9, f"检测到 {len(result['boundaries'])} 个场景边界")
+    
+    video.scene_markers = [
+        SceneMarker.create(boundary["timestamp"], round(boundary["score"], 3))
+        for boundary in result["boundaries"]
+    ]
+    data_store.save_to_json("data/project_data.json")
+    
+    return {"boundaries": len(result["boundaries"]), "frames": result["frames"]}
+
+job_queue.register("scene_detection", scene_detection_task, cost_factor=0.05)
+
+@router.get("/{video_id}/scenes")
+async def get_video_scenes(
+    video_id: str,
+    data_store: InMemoryDataStore = Depends(get_data_store)
+):
+    """获取视频的场景标记和场景检测进度"""
+    
+    video = data_store.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    return await _scene_response(video)
+
+async def motion_energy_task(job: JobContext, video_id: str) -> Dict[str, Any]:
+    """任务：计算运动能量曲线并保存"""
+    data_store = get_data_store()
+    video = data_store.get_video(video_id)
+    if not video:
+        raise Exception("视频不存在")
+    
+    source_path = _analysis_path(video, MotionEnergyConfig.max_width)
+    stats = await run_cpu(compute_motion_energy, source_path, str(motion_energy_store.path_for(video_id)))
+    motion_energy_store.invalidate(video_id)
+    return stats
+
+job_queue.register("motion_energy", motion_energy_task, cost_factor=0.05)
+
+@router.get("/{video_id}/motion-energy")
+async def get_video_motion_energy(
+    video_id: str,
+    start_time: float = Query(0.0, ge=0),
+    end_time: Optional[float] = Query(None, gt=0),
+    max_points: int = Query(1000, ge=1, le=10000),
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
+    data_store: InMemoryDataStore = Depends(get_data_store)
+):
+    """
+    获取运动能量曲线
+    
+    从多分辨率金字塔中选出使[start_time, end_time)内格数不超过max_points的最细层级，
+    每格返回平均值和峰值。尚未计算时提交计算任务（同一视频只提交一个）并返回202和任务ID，
+    任务完成后再次请求即可取得曲线。
+    """
+    
+    video = data_store.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    if not os.path.exists(video.file_path):
+        raise HTTPException(status_code=404, detail="视频文件不存在")
+    
+    source_path = _analysis_path(video, MotionEnergyConfig.max_width)
+    pyramid = await run_io(motion_energy_store.get_pyramid, video_id, source_path)
+    if pyramid is None:
+        # 先取时长再查重，查重和提交之间没有await，并发请求不会重复提交
+        duration = await _media_duration(video)
+        job = job_queue.find_active(video_id, "motion_energy")
+        if job is None:
+            job = await _submit_job("motion_energy", video, {"video_id": video_id}, priority, duration=duration)
+        return JSONResponse(status_code=202, content={
+            "video_id": video_id,
+            "job_id": job.id,
+            "status": job.status,
+            "progress": job.progress
+        })
+    
+    total_seconds = len(pyramid[0][0])
+    end_time = min(end_time if end_time is not None else total_seconds, total_seconds)
+    span = max(end_time - start_time, 0.0)
+    
+    level = 0
+    while level < len(pyramid) - 1 and span / (2 ** level) > max_points:
+        level += 1
+    bin_seconds = 2 ** level
+    
+    first = int(start_time // bin_seconds)
+    last = int(np.ceil(end_time / bin_seconds))
+    mean, peak = pyramid[level]
+    
+    return {
+        "video_id": video_id,
+        "bin_seconds": bin_seconds,
+        "start_time": first * bin_seconds,
+        "duration": total_seconds,
+        "values": np.round(mean[first:last].astype(np.float64), 4).tolist(),
+        "peaks": np.round(peak[first:last].astype(np.float64), 4).tolist()
+    }
+
 @router.post("/{video_id}/validate")
 async def validate_video(
     video_id: str,
@@ -406,10 +899,10 @@ async def validate_video(
     
     try:
         # 文件验证
-        file_validation = video_processor.validate_video_file(video.file_path)
+        file_validation = await run_io(video_processor.validate_video_file, video.file_path)
         
         # 内容验证
-        content_validation = video_processor.validate_video_content(video.file_path)
+        content_validation = await run_io(video_processor.validate_video_content, _analysis_path(video))
         
         return {
             "video_id": video_id,
@@ -433,80 +926,203 @@ async def get_analysis_result(
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
     
-    # 获取分析结果
+    # 获取分析结果（检测出的位置以轨迹返回，逐点位置只包含手动添加的）
     transcripts = data_store.get_transcripts(video_id)
     positions = data_store.get_actor_positions(video_id)
+    tracks = data_store.get_actor_tracks(video_id)
     
     return {
         "video": dataclass_to_dict(video),
         "transcripts": [dataclass_to_dict(t) for t in transcripts],
         "actor_positions": [dataclass_to_dict(p) for p in positions],
+        "actor_tracks": [dataclass_to_dict(t) for t in tracks],
         "analysis_status": video.status
     }
 
+# 任务状态在处理进度接口中的对应值
+_PROCESS_STATUS = {
+    "queued": "queued",
+    "running": "processing",
+    "completed": "completed",
+    "failed": "error",
+    "cancelled": "cancelled"
+}
+
 @router.post("/{video_id}/process")
 async def process_video(
     video_id: str,
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
     data_store: InMemoryDataStore = Depends(get_data_store)
 ):
-    """处理视频（提取音频和位置信息）"""
+    """处理视频（提取演员位置信息）"""
     
     video = data_store.get_video(video_id)
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
     
+    if not os.path.exists(video.file_path):
+        raise HTTPException(status_code=404, detail="视频文件不存在")
+    
+    if job_queue.find_active(video_id, "process"):
+        raise HTTPException(status_code=409, detail="视频正在处理中")
+    
+    # 排队任务：演员位置提取（取消时恢复处理前的状态）
+    job = await _submit_job("process", video, {
+        "video_id": video_id,
+        "file_path": _analysis_path(video),
+        "previous_status": video.status
+    }, priority)
+    
     # 更新状态为处理中
     data_store.update_video_status(video_id, "processing")
     
+    return {
+        "message": "视频处理任务已提交",
+        "video_id": video_id,
+        "job_id": job.id
+    }
+
+@router.get("/{video_id}/process/status")
+async def get_process_status(
+    video_id: str,
+    data_store: InMemoryDataStore = Depends(get_data_store)
+):
+    """获取视频处理进度"""
+    
+    video = data_store.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    job = job_queue.latest(video_id, "process")
+    if job is None:
+        return {"video_id": video_id, "video_status": video.status, "status": "idle", "progress": 0.0, "message": ""}
+    
+    return {
+        "video_id": video_id,
+        "video_status": video.status,
+        "job_id": job.id,
+        "status": _PROCESS_STATUS[job.status],
+        "progress": job.progress,
+        "message": job.error if job.status == "failed" else job.message,
+        "eta_seconds": job.eta_seconds
+    }
+
+def _match_previous_actors(data_store: InMemoryDataStore, video_id: str,
+                           tracks: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """
+    新轨迹对应的原有演员ID（None表示新演员）
+
+    按画面坐标比较：重新标定不影响匹配。同一演员的多条旧轨迹合并后参与匹配，
+    没有画面坐标的旧轨迹和已删除的演员不参与。
+    """
+    grouped: Dict[str, List[ActorTrack]] = {}
+    for old in data_store.get_actor_tracks(video_id):
+        if old.image_x is not None and old.image_y is not None and data_store.get_actor(old.actor_id):
+            grouped.setdefault(old.actor_id, []).append(old)
+    
+    actor_ids = list(grouped)
+    previous = []
+    for actor_id in actor_ids:
+        timestamps = np.concatenate([old.timestamps for old in grouped[actor_id]])
+        points = np.concatenate([np.column_stack([old.image_x, old.image_y]) for old in grouped[actor_id]])
+        order = np.argsort(timestamps, kind="stable")
+        previous.append({"timestamps": timestamps[order], "points": points[order]})
+    
+    new_tracks = [{"timestamps": track["timestamps"], "points": track["image_points"]} for track in tracks]
+    return [None if j is None else actor_ids[j] for j in match_previous_tracks(new_tracks, previous)]
+
+async def process_video_task(job: JobContext, video_id: str, file_path: str,
+                             previous_status: str = "processed") -> Dict[str, Any]:
+    """任务：演员位置提取"""
+    data_store = get_data_store()
+    
+    def on_progress(fraction: float, message: str):
+        # 检测占总耗时的绝大部分，留出最后一点给跟踪和保存
+        job.report(fraction * 0.95, message)
+    
     try:
-        # TODO: 这里将实现实际的视频处理逻辑
-        # 1. 音频提取和转文本
-        # 2. 人体姿态检测
-        # 3. 位置数据提取
-        
-        # 暂时返回模拟数据
-        from models.data_models import TranscriptSegment, ActorPosition, Position2D, Actor
-        
-        # 创建示例演员
-        actor = data_store.add_actor("演员A", "#FF5733")
-        
-        # 模拟转录数据
-        mock_transcripts = [
-            TranscriptSegment.create("欢迎来到舞台", 0.0, 2.0, actor.id, 0.95, "positive"),
-            TranscriptSegment.create("让我们开始表演", 2.5, 5.0, actor.id, 0.90, "neutral"),
-            TranscriptSegment.create("这是一个精彩的演出", 5.5, 8.0, actor.id, 0.88, "positive")
-        ]
+        logger.info(f"开始提取演员位置: {video_id}")
         
-        # 模拟位置数据
-        mock_positions = [
-            ActorPosition.create(actor.id, 0.0, Position2D(100, 200), 0.9),
-            ActorPosition.create(actor.id, 1.0, Position2D(120, 210), 0.85),
-            ActorPosition.create(actor.id, 2.0, Position2D(140, 220), 0.88),
-            ActorPosition.create(actor.id, 3.0, Position2D(160, 200), 0.92),
-            ActorPosition.create(actor.id, 4.0, Position2D(180, 180), 0.87)
-        ]
+        video = data_store.get_video(video_id)
+        duration = video.duration if video else 0
+        if duration <= 0:
+            duration = (await run_io(video_processor.extract_video_info, file_path))["duration"]
+        calibration = video.stage_calibration if video else None
         
-        # 保存分析结果
-        data_store.add_transcripts(video_id, mock_transcripts)
-        data_store.add_actor_positions(video_id, mock_positions)
+        # 检测在共享的CPU进程池中进行，这里只在I/O线程中调度和等待结果，不阻塞事件循环
+        tracks = await run_io(
+            actor_position_pipeline.run, file_path, duration, on_progress, calibration,
+            executor=get_cpu_executor()
+        )
         
-        # 更新视频状态
-        data_store.update_video_status(video_id, "processed", duration=10.0, fps=30)
+        # 每条轨迹对应一名演员；重新处理时按时间和位置重合找回该视频之前识别出的演员
+        previous_actor_ids = _match_previous_actors(data_store, video_id, tracks)
+        actor_tracks = []
+        for i, track in enumerate(tracks):
+            actor_id = previous_actor_ids[i]
+            if actor_id is None:
+                actor_id = data_store.add_actor(f"演员{i + 1}", ACTOR_COLORS[i % len(ACTOR_COLORS)]).id
+            actor_tracks.append(ActorTrack.create(
+                actor_id,
+                np.round(track["timestamps"], 3).tolist(),
+                np.round(track["points"][:, 0], 1).tolist(),
+                np.round(track["points"][:, 1], 1).tolist(),
+                np.round(track["scores"].astype(np.float64), 3).tolist(),
+                np.round(track["image_points"][:, 0].astype(np.float64), 4).tolist(),
+                np.round(track["image_points"][:, 1].astype(np.float64), 4).tolist()
+            ))
         
-        # 保存数据
+        # 保存分析结果
+        data_store.add_actor_tracks(video_id, actor_tracks)
+        data_store.update_video_status(video_id, "processed")
         data_store.save_to_json("data/project_data.json")
         
-        return {
-            "message": "视频处理完成",
-            "video": dataclass_to_dict(data_store.get_video(video_id)),
-            "transcripts_count": len(mock_transcripts),
-            "positions_count": len(mock_positions)
-        }
+        positions_count = sum(len(track.timestamps) for track in actor_tracks)
+        job.report(1.0, f"识别到 {len(tracks)} 名演员, {positions_count} 个位置点")
+        logger.info(f"演员位置提取完成: {video_id}, {len(tracks)} 条轨迹")
+        return {"tracks": len(tracks), "positions": positions_count}
         
+    except (JobCancelled, asyncio.CancelledError):
+        if job.cancelled:
+            data_store.update_video_status(video_id, previous_status)
+            data_store.save_to_json("data/project_data.json")
+        raise
     except Exception as e:
-        # 处理失败，更新状态
+        logger.error(f"演员位置提取失败: {video_id}, {e}")
+        
+        # 更新状态为错误（重试成功后会被覆盖）
         data_store.update_video_status(video_id, "error")
-        raise HTTPException(status_code=500, detail=f"视频处理失败: {str(e)}")
+        data_store.save_to_json("data/project_data.json")
+        raise
+
+job_queue.register("process", process_video_task)
+
+@router.put("/{video_id}/calibration")
+async def update_stage_calibration(
+    video_id: str,
+    request: StageCalibrationRequest,
+    data_store: InMemoryDataStore = Depends(get_data_store)
+):
+    """设置舞台标定，并按新标定重新投影已有的演员轨迹（无需重新检测）"""
+    
+    video = data_store.get_video(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    if request.points is not None:
+        errors = validate_stage_calibration(request.points)
+        if errors:
+            raise HTTPException(status_code=400, detail="; ".join(errors))
+    
+    video.stage_calibration = request.points
+    reprojected = reproject_tracks(data_store.get_actor_tracks(video_id), request.points)
+    data_store.save_to_json("data/project_data.json")
+    
+    return {
+        "video_id": video_id,
+        "stage_calibration": video.stage_calibration,
+        "reprojected_tracks": reprojected
+    }
 
 @router.get("/")
 async def list_videos(data_store: InMemoryDataStore = Depends(get_data_store)):
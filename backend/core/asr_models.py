@@ -0,0 +1,191 @@
+"""
+FunASR模型注册表
+
+每种语言（模型配置）缓存一个已加载的AutoModel，按最近使用顺序淘汰，最多保留max_models个，
+中英文请求交替到达时不再反复加载模型（每次加载需要数十秒）。
+
+模型只存在于ASR工作进程中：工作进程启动时（init_asr_worker）预加载配置的语言，
+并对每个模型做一次预热推理，使第一个请求的延迟与之后的请求一致。
+
+预加载的语言和缓存上限可用环境变量 AI_STAGE_ASR_PRELOAD（逗号分隔，默认zh，为空表示不预加载）、
+AI_STAGE_ASR_MAX_MODELS（默认2）配置。
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .asr_config import asr_config
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PRELOAD_LANGUAGES = [
+    language.strip() for language in os.environ.get("AI_STAGE_ASR_PRELOAD", "zh").split(",") if language.strip()
+]
+DEFAULT_MAX_MODELS = max(1, int(os.environ.get("AI_STAGE_ASR_MAX_MODELS", 2)))
+WARM_UP_SECONDS = 1.0
+
+def _config_key(language: str) -> Tuple[Tuple[str, str], ...]:
+    """模型配置的缓存键：配置相同的语言共用一个模型"""
+    return tuple(sorted(asr_config.get_funasr_models_config(language).items()))
+
+class _PendingLoad:
+    """进行中的一次模型加载，等待同一配置的请求共用其结果或异常"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.model: Any = None
+        self.error: Optional[BaseException] = None
+
+class ASRModelRegistry:
+    """按模型配置缓存的FunASR模型（LRU）"""
+
+    def __init__(self, max_models: int = DEFAULT_MAX_MODELS):
+        self.max_models = max_models
+        self._models: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[Tuple, _PendingLoad] = {}
+        self._load_seconds: Dict[str, float] = {}
+
+    def _load(self, language: str) -> Any:
+        from funasr import AutoModel
+
+        model_config = asr_config.get_funasr_models_config(language)
+        logger.info(f"加载FunASR模型（语言: {language}）: {model_config['model']}")
+        start = time.perf_counter()
+        model = AutoModel(
+            model=model_config["model"],
+            vad_model=model_config["vad_model"],
+            punc_model=model_config["punc_model"],
+            spk_model=model_config["spk_model"]
+        )
+        self._load_seconds[language] = round(time.perf_counter() - start, 1)
+        logger.info(f"✅ FunASR模型加载完成（语言: {language}）, 耗时 {self._load_seconds[language]}s")
+        return model
+
+    def _evict(self):
+        """超出上限时淘汰最久未使用的模型（需持有_lock）"""
+        while len(self._models) > self.max_models:
+            key, _ = self._models.popitem(last=False)
+            logger.info(f"淘汰FunASR模型: {dict(key)['model']}")
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def get(self, language: str = "zh", warm_up: bool = False) -> Any:
+        """
+        获取该语言的模型，未加载时加载（同一配置并发请求只加载一次）
+
+        加载失败时，正在等待的请求收到同一个异常；之后的请求会重新尝试加载。
+
+        Args:
+            warm_up: 新加载的模型是否先做一次预热推理
+        """
+        key = _config_key(language)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+            pending = self._loading.get(key)
+            if pending is None:
+                pending = self._loading[key] = _PendingLoad()
+                loader = True
+            else:
+                loader = False
+
+        if not loader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.model
+
+        try:
+            model = self._load(language)
+            if warm_up:
+                self.warm_up(model, language)
+
+            with self._lock:
+                self._models[key] = model
+                if len(self._models) > self.max_models:
+                    self._evict()
+            pending.model = model
+            return model
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.done.set()
+
+    def warm_up(self, model: Any, language: str = "zh"):
+        """用一段低电平噪声做一次推理，完成首次推理时的初始化和内存分配"""
+        start = time.perf_counter()
+        audio = (np.random.default_rng(0).standard_normal(int(16000 * WARM_UP_SECONDS)) * 1e-3).astype(np.float32)
+        try:
+            model.generate(audio, **asr_config.get_recognition_params(language))
+            logger.info(f"FunASR模型预热完成（语言: {language}）, 耗时 {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            logger.warning(f"FunASR模型预热失败（语言: {language}）: {e}")
+
+    def preload(self, languages: Optional[List[str]] = None):
+        """加载并预热指定语言的模型（默认PRELOAD_LANGUAGES），失败只记录日志"""
+        for language in (PRELOAD_LANGUAGES if languages is None else languages)[:self.max_models]:
+            try:
+                self.get(language, warm_up=True)
+            except Exception as e:
+                logger.error(f"FunASR模型预加载失败（语言: {language}）: {e}")
+
+    def is_loaded(self, language: str) -> bool:
+        with self._lock:
+            return _config_key(language) in self._models
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = [dict(key)["model"] for key in self._models]
+        return {
+            "pid": os.getpid(),
+            "max_models": self.max_models,
+            "loaded_models": loaded,
+            "load_seconds": dict(self._load_seconds)
+        }
+
+# 全局模型注册表实例（每个进程一个）
+asr_model_registry = ASRModelRegistry()
+
+def set_worker_threads(threads: int):
+    """限制本进程的推理线程数（OpenMP/MKL和torch），多个工作进程不争抢同一批核"""
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        logger.info(f"ASR工作进程 {os.getpid()} 使用 {threads} 个推理线程")
+    except ImportError:
+        pass
+
+def init_asr_worker(threads: Optional[int] = None):
+    """ASR工作进程初始化：设置推理线程数，预加载并预热配置的语言（不抛出异常，以免工作进程无法启动）"""
+    try:
+        if threads:
+            set_worker_threads(threads)
+        asr_model_registry.preload()
+    except Exception as e:
+        logger.error(f"ASR工作进程初始化失败: {e}")
+
+def get_asr_worker_status() -> Dict[str, Any]:
+    """在ASR工作进程中调用，返回该进程已加载的模型"""
+    return asr_model_registry.get_statistics()
@@ -0,0 +1,263 @@
+"""
+ASR工作进程池
+
+语音识别全部在executors的asr进程池中进行：每个工作进程常驻并持有自己的模型（见asr_models），
+一次只执行一个识别任务，多个请求不会共用同一个模型对象，也不占用API进程的GIL。
+请求在进程池的任务队列中排队，并发数即工作进程数（AI_STAGE_ASR_WORKERS）。
+
+音频在API进程的I/O线程中由ffmpeg解码，放入共享内存后只把引用交给工作进程，
+不再把数百MB的数组pickle后经管道传给工作进程；识别结束（或失败、取消）后由API进程删除共享内存块。
+
+长音频（默认超过7.5分钟）在静音处分块（见audio_chunking），各块引用同一共享内存块的不同区间，
+并行识别后按顺序拼接；耗时随ASR工作进程数下降。同一段录音同时在进程池中的块不超过ASR工作进程数，
+每完成一块再提交下一块，之后提交的其他识别任务不必排在整段长录音的所有块之后。
+块长可用环境变量 AI_STAGE_ASR_CHUNK_SECONDS（默认300）配置。
+
+识别结果按 音频sha256 + 识别参数 缓存在磁盘上（见transcript_cache），同一文件再次识别时
+按文件sha256直接命中，不再解码和识别。
+
+识别前先按帧能量去除静音和非语音段（见speech_trim），只把语音区间拼接后交给模型，
+时间戳再映射回原始时间轴；识别结果的speech_trim字段报告跳过的比例和实时率。
+可用环境变量 AI_STAGE_ASR_TRIM_SILENCE=0 关闭。
+
+流式识别（stream_file）使用更小的块（第一块20秒、之后60秒），每块识别完成即按顺序输出新句子，
+第一句在几秒内可见，不必等整段录音识别完。
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from backend.models.data_models import TranscriptSegment
+from .audio_chunking import AudioChunk, ChunkingConfig, ChunkStitcher, plan_chunks
+from .audio_processor import (
+    audio_processor, decode_audio_shared, generate_srt, recognize_shared_audio, ASR_SAMPLE_RATE
+)
+from .executors import POOL_LIMITS, run_asr, run_io
+from .shared_audio import SharedAudio
+from .speech_trim import TRIM_ENABLED, TimeMap, compact_audio, plan_trim
+from .transcript_cache import audio_digest, file_digest, params_digest, transcript_cache
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNKING = ChunkingConfig(chunk_seconds=float(os.environ.get("AI_STAGE_ASR_CHUNK_SECONDS", 300)))
+STREAM_CHUNKING = ChunkingConfig(chunk_seconds=60.0, first_chunk_seconds=20.0, search_seconds=10.0, overlap_seconds=10.0)
+
+def _plan(shared: SharedAudio, config: ChunkingConfig):
+    return plan_chunks(shared.data, shared.ref.sample_rate, config)
+
+def _plan_trim(shared: SharedAudio):
+    """检测语音区间，返回 (语音区间或None, 统计或None)"""
+    if not TRIM_ENABLED:
+        return None, None
+    return plan_trim(shared.data, shared.ref.sample_rate)
+
+def _compact(shared: SharedAudio, regions) -> SharedAudio:
+    """把语音区间拼接进新的共享内存块"""
+    return SharedAudio.create(compact_audio(shared.data, regions), shared.ref.sample_rate)
+
+def _trim_report(statistics: Optional[Dict[str, float]], elapsed: float) -> Optional[Dict[str, float]]:
+    """去除静音的统计：跳过比例、识别耗时、实时率（耗时/原始时长）和相对识别整段的预计加速"""
+    if statistics is None:
+        return None
+    report = dict(statistics, recognition_seconds=round(elapsed, 2))
+    if statistics["total_seconds"] > 0:
+        report["real_time_factor"] = round(elapsed / statistics["total_seconds"], 4)
+    if statistics["speech_seconds"] > 0:
+        report["rtf_gain"] = round(statistics["total_seconds"] / statistics["speech_seconds"], 2)
+    logger.info(
+        f"去除静音: 跳过 {statistics['skipped_fraction']:.1%} "
+        f"({statistics['total_seconds'] - statistics['speech_seconds']:.0f}s / {statistics['total_seconds']:.0f}s), "
+        f"实时率 {report.get('real_time_factor', 0):.3f}, 预计加速 {report.get('rtf_gain', 1):.2f}x"
+    )
+    return report
+
+def _audio_key(shared: SharedAudio, file_key: Optional[str] = None) -> str:
+    """计算音频摘要并记录文件摘要对应的音频摘要"""
+    audio_key = audio_digest(shared.data)
+    if file_key:
+        transcript_cache.remember_file(file_key, audio_key)
+    return audio_key
+
+async def _cached_by_file(file_path: str, params_key: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """按文件内容查找缓存，返回 (文件摘要, 识别结果或None)"""
+    file_key = await run_io(file_digest, file_path)
+    cached = await run_io(transcript_cache.get_by_file, file_key, params_key)
+    if cached is not None:
+        logger.info(f"命中识别结果缓存: {file_path}")
+    return file_key, cached
+
+async def _cached_by_audio(shared: SharedAudio, file_key: Optional[str], params_key: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """按解码后的音频查找缓存（内容相同、封装不同的文件也能命中），返回 (音频摘要, 识别结果或None)"""
+    audio_key = await run_io(_audio_key, shared, file_key)
+    cached = await run_io(transcript_cache.get, audio_key, params_key)
+    if cached is not None:
+        logger.info(f"命中识别结果缓存: {audio_key[:12]}")
+    return audio_key, cached
+
+async def iter_chunks(shared: SharedAudio, chunks: List[AudioChunk], stitcher: ChunkStitcher, language: str = "zh",
+                      enable_speaker_diarization: bool = False, hotwords: str = "") -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    各块在ASR进程池中并行识别，按顺序拼接，每块完成后输出该块新增的句子
+
+    同时提交到进程池的块不超过ASR工作进程数，每完成一块再按顺序提交下一块，
+    进程池的FIFO队列中不会堆积整段录音的所有块。提前退出（出错、客户端断开）时取消尚未开始的块。
+    """
+    ref = shared.ref
+    slots = asyncio.Semaphore(POOL_LIMITS["asr"])
+
+    async def recognize(chunk: AudioChunk) -> Dict[str, Any]:
+        async with slots:
+            return await run_asr(
+                recognize_shared_audio, ref.slice(chunk.start, chunk.end),
+                language, enable_speaker_diarization, hotwords
+            )
+
+    tasks = [asyncio.ensure_future(recognize(chunk)) for chunk in chunks]
+    try:
+        for chunk, task in zip(chunks, tasks):
+            yield stitcher.add(chunk, await task)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def stitched_result(stitcher: ChunkStitcher) -> Dict[str, Any]:
+    """拼接后的完整识别结果（含SRT）"""
+    result = stitcher.result()
+    result["srt"] = generate_srt(result["sentences"])
+    if stitcher.statistics is not None:
+        result["speech_trim"] = stitcher.statistics
+    return result
+
+async def _recognize_chunked(shared: SharedAudio, language: str, enable_speaker_diarization: bool,
+                             hotwords: str, config: ChunkingConfig) -> Dict[str, Any]:
+    """识别共享内存中的音频，长音频分块并行识别后拼接"""
+    ref = shared.ref
+    chunks = await run_io(_plan, shared, config)
+    if len(chunks) == 1:
+        return await run_asr(recognize_shared_audio, ref, language, enable_speaker_diarization, hotwords)
+
+    logger.info(f"长音频分块识别: {ref.length / ref.sample_rate:.0f}s, {len(chunks)} 块")
+    stitcher = ChunkStitcher(ref.sample_rate, language)
+    async for _ in iter_chunks(shared, chunks, stitcher, language, enable_speaker_diarization, hotwords):
+        pass
+    return stitched_result(stitcher)
+
+async def recognize_shared(shared: SharedAudio, language: str = "zh", enable_speaker_diarization: bool = False,
+                           hotwords: str = "", config: ChunkingConfig = CHUNKING) -> Dict[str, Any]:
+    """识别共享内存中的音频：先去除静音，长音频分块并行识别后拼接，时间戳映射回原始时间轴"""
+    started = time.perf_counter()
+    regions, statistics = await run_io(_plan_trim, shared)
+    if regions is None:
+        result = await _recognize_chunked(shared, language, enable_speaker_diarization, hotwords, config)
+    else:
+        compact = await run_io(_compact, shared, regions)
+        try:
+            result = await _recognize_chunked(compact, language, enable_speaker_diarization, hotwords, config)
+        finally:
+            compact.release()
+        result = TimeMap(regions, shared.ref.sample_rate).map_result(result)
+        result["srt"] = generate_srt(result["sentences"])
+
+    result["speech_trim"] = _trim_report(statistics, time.perf_counter() - started)
+    return result
+
+async def recognize_file(file_path: str, language: str = "zh",
+                         enable_speaker_diarization: bool = False, hotwords: str = "") -> Dict[str, Any]:
+    """解码音视频文件并在ASR工作进程中识别，返回FunASR识别结果（优先使用缓存）"""
+    params_key = params_digest(language, enable_speaker_diarization, hotwords)
+    file_key, cached = await _cached_by_file(file_path, params_key)
+    if cached is not None:
+        return cached
+
+    shared = await run_io(decode_audio_shared, file_path)
+    try:
+        logger.info(f"音频已解码: {file_path}, {shared.ref.length / shared.ref.sample_rate:.1f}s")
+        audio_key, cached = await _cached_by_audio(shared, file_key, params_key)
+        if cached is not None:
+            return cached
+
+        result = await recognize_shared(shared, language, enable_speaker_diarization, hotwords)
+        await run_io(transcript_cache.put, audio_key, params_key, result)
+        return result
+    finally:
+        shared.release()
+
+async def transcribe_file(file_path: str, language: str = "zh") -> List[TranscriptSegment]:
+    """识别音视频文件并转换为TranscriptSegment"""
+    result = await recognize_file(file_path, language)
+    return audio_processor.convert_to_transcript_segments(result['sentences'])
+
+async def transcribe_range(file_path: str, start: float, end: float, language: str = "zh",
+                           hotwords: str = "") -> List[TranscriptSegment]:
+    """
+    只识别文件中[start, end)秒的音频，返回整段时间轴上的TranscriptSegment
+
+    只解码和识别该区间，耗时与区间长度成正比；结果同样按音频缓存。
+    """
+    params_key = params_digest(language, False, hotwords)
+    shared = await run_io(decode_audio_shared, file_path, ASR_SAMPLE_RATE, start, end - start)
+    try:
+        logger.info(f"区间识别: {file_path}, {start:.2f}s~{end:.2f}s")
+        audio_key, result = await _cached_by_audio(shared, None, params_key)
+        if result is None:
+            result = await recognize_shared(shared, language, False, hotwords)
+            await run_io(transcript_cache.put, audio_key, params_key, result)
+    finally:
+        shared.release()
+
+    segments = audio_processor.convert_to_transcript_segments(result['sentences'])
+    for segment in segments:
+        segment.start_time = round(segment.start_time + start, 3)
+        segment.end_time = round(min(segment.end_time + start, end), 3)
+    return segments
+
+async def stream_file(file_path: str, stitcher: ChunkStitcher, language: str = "zh",
+                      enable_speaker_diarization: bool = False, hotwords: str = "",
+                      config: ChunkingConfig = STREAM_CHUNKING) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    流式识别音视频文件：每块识别完成后输出新增的句子（整段时间轴），结束后完整结果见stitched_result(stitcher)
+
+    命中缓存时一次输出全部句子。去除静音的统计见stitcher.statistics。
+    """
+    params_key = params_digest(language, enable_speaker_diarization, hotwords)
+    file_key, cached = await _cached_by_file(file_path, params_key)
+    if cached is not None:
+        stitcher.statistics = cached.get("speech_trim")
+        yield stitcher.add(AudioChunk(index=0, start=0, cut=0, end=0), cached)
+        return
+
+    shared = await run_io(decode_audio_shared, file_path)
+    source = shared
+    try:
+        audio_key, cached = await _cached_by_audio(shared, file_key, params_key)
+        if cached is not None:
+            stitcher.statistics = cached.get("speech_trim")
+            yield stitcher.add(AudioChunk(index=0, start=0, cut=0, end=shared.ref.length), cached)
+            return
+
+        started = time.perf_counter()
+        regions, statistics = await run_io(_plan_trim, shared)
+        if regions is not None:
+            source = await run_io(_compact, shared, regions)
+            stitcher.time_map = TimeMap(regions, shared.ref.sample_rate)
+
+        chunks = await run_io(_plan, source, config)
+        logger.info(f"流式识别: {file_path}, {source.ref.length / source.ref.sample_rate:.0f}s, {len(chunks)} 块")
+        # 调用方提前关闭时，立即关闭内层生成器以取消尚未开始的块
+        batches = iter_chunks(source, chunks, stitcher, language, enable_speaker_diarization, hotwords)
+        try:
+            async for sentences in batches:
+                yield sentences
+        finally:
+            await batches.aclose()
+        stitcher.statistics = _trim_report(statistics, time.perf_counter() - started)
+        await run_io(transcript_cache.put, audio_key, params_key, stitched_result(stitcher))
+    finally:
+        if source is not shared:
+            source.release()
+        shared.release()
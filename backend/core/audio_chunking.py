@@ -0,0 +1,236 @@
+"""
+长音频分块识别
+
+两三个小时的排练录音如果一次交给model.generate，只能用到一个工作进程，峰值内存也随时长增长。
+长音频在静音处切成有上限的块，各块交给ASR进程池并行识别，再按顺序拼接sentence_info：
+
+- 切分：按20ms帧计算能量（dB），在每块目标长度之前的搜索窗口内选平滑后能量最低（最安静）的位置切开
+- 重叠：除第一块外，每块向前多识别overlap_seconds，这部分的句子只用于对齐说话人，不进入结果
+- 拼接：句子时间戳加上块的起始时间；每块只保留起点在切分点之后的句子
+- 说话人：各块独立聚类，编号互不相关。重叠区内两块都识别到的句子按时间重合长度投票，
+  把新块的局部编号映射到全局编号，没有对应的说话人分配新编号
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ChunkingConfig:
+    """分块参数"""
+    chunk_seconds: float = 300.0     # 每块目标时长（不含重叠）
+    first_chunk_seconds: Optional[float] = None  # 第一块目标时长（流式输出时取小值，尽快得到第一句），默认同chunk_seconds
+    search_seconds: float = 30.0     # 在目标切分点之前多长范围内找静音
+    overlap_seconds: float = 15.0    # 相邻块的重叠时长（用于对齐说话人）
+    frame_ms: float = 20.0           # 能量帧长
+    smooth_ms: float = 300.0         # 找静音时的能量平滑窗口（停顿而不是单帧）
+
+    def target_seconds(self, index: int) -> float:
+        """第index块的目标时长"""
+        if index == 0 and self.first_chunk_seconds:
+            return self.first_chunk_seconds
+        return self.chunk_seconds
+
+    @property
+    def min_chunked_seconds(self) -> float:
+        """短于该时长的音频不分块"""
+        return self.target_seconds(0) * 1.5
+
+@dataclass
+class AudioChunk:
+    """一个识别块（采样下标，相对整段音频）"""
+    index: int
+    start: int      # 识别起点（含重叠）
+    cut: int        # 切分点，起点在此之前的句子属于上一块
+    end: int
+
+def frame_energy_db(data: np.ndarray, sample_rate: int, frame_ms: float = 20.0,
+                    block_seconds: float = 60.0) -> np.ndarray:
+    """
+    逐帧能量（dB，相对满幅）
+
+    按block_seconds分段计算，不为整段音频分配平方后的临时数组。
+    """
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    frames = len(data) // frame
+    energy = np.empty(frames, dtype=np.float32)
+    block = max(1, int(block_seconds * sample_rate) // frame)
+    for first in range(0, frames, block):
+        last = min(frames, first + block)
+        segment = np.asarray(data[first * frame:last * frame], dtype=np.float32).reshape(-1, frame)
+        energy[first:last] = np.einsum("ij,ij->i", segment, segment) / frame
+    return 10 * np.log10(energy + 1e-10)
+
+def find_split_points(data: np.ndarray, sample_rate: int, config: ChunkingConfig) -> List[int]:
+    """
+    在静音处选切分点（采样下标，不含0和结尾）
+
+    每个切分点取 [目标位置 - search_seconds, 目标位置] 内平滑能量最低处（搜索范围不超过块长的一半），
+    目标位置为上一个切分点之后该块的目标时长。
+    """
+    total = len(data)
+    if total < config.min_chunked_seconds * sample_rate:
+        return []
+
+    frame = max(1, int(sample_rate * config.frame_ms / 1000))
+    energy = frame_energy_db(data, sample_rate, config.frame_ms)
+    window = max(1, int(config.smooth_ms / config.frame_ms))
+    smoothed = np.convolve(energy, np.ones(window, dtype=np.float32) / window, mode="same")
+
+    points = []
+    last = 0
+    while True:
+        target_seconds = config.target_seconds(len(points))
+        chunk_frames = int(target_seconds * 1000 / config.frame_ms)
+        # 剩余部分不足一块半时不再切分，避免最后出现很短的块
+        if len(smoothed) - last <= chunk_frames * 1.5:
+            break
+        search_frames = max(1, int(min(config.search_seconds, target_seconds / 2) * 1000 / config.frame_ms))
+        target = last + chunk_frames
+        low = max(last + 1, target - search_frames)
+        cut = low + int(np.argmin(smoothed[low:target]))
+        points.append(cut * frame)
+        last = cut
+    return points
+
+def plan_chunks(data: np.ndarray, sample_rate: int, config: Optional[ChunkingConfig] = None) -> List[AudioChunk]:
+    """把音频划分为识别块（短音频只有一块）"""
+    config = config or ChunkingConfig()
+    overlap = int(config.overlap_seconds * sample_rate)
+    bounds = [0] + find_split_points(data, sample_rate, config) + [len(data)]
+    return [
+        AudioChunk(index=i, start=max(0, cut - overlap) if i else 0, cut=cut, end=bounds[i + 1])
+        for i, cut in enumerate(bounds[:-1])
+    ]
+
+def _shift_sentence(sentence: Dict[str, Any], offset_ms: int) -> Dict[str, Any]:
+    """把块内句子的时间戳平移到整段音频的时间轴"""
+    shifted = dict(sentence)
+    for key in ("start", "end"):
+        if key in shifted and shifted[key] is not None:
+            shifted[key] = shifted[key] + offset_ms
+    if shifted.get("timestamp"):
+        shifted["timestamp"] = [[begin + offset_ms, end + offset_ms] for begin, end in shifted["timestamp"]]
+    return shifted
+
+def _sentence_span(sentence: Dict[str, Any]) -> Optional[tuple]:
+    """句子的 (开始ms, 结束ms)"""
+    if sentence.get("timestamp"):
+        return sentence["timestamp"][0][0], sentence["timestamp"][-1][1]
+    if sentence.get("start") is not None and sentence.get("end") is not None:
+        return sentence["start"], sentence["end"]
+    return None
+
+class ChunkStitcher:
+    """
+    按块顺序拼接识别结果
+
+    必须按AudioChunk.index顺序调用add；每次返回该块新增的（已平移、已映射说话人的）句子，
+    可以边识别边输出。
+
+    识别的是去除静音后的音频时，设置time_map（speech_trim.TimeMap），输出的句子映射回原始时间轴；
+    块间对齐仍在识别音频的时间轴上进行。
+    """
+
+    def __init__(self, sample_rate: int, language: str = "zh"):
+        self.sample_rate = sample_rate
+        self.separator = "" if language == "zh" else " "
+        self.time_map = None
+        self.statistics: Optional[Dict[str, Any]] = None  # 识别统计（如去除静音的比例）
+        self.sentences: List[Dict[str, Any]] = []  # 识别音频时间轴
+        self.output: List[Dict[str, Any]] = []     # 输出时间轴
+        self.timestamp: List[List[int]] = []
+        self._next_index = 0
+        self._next_speaker = 0
+
+    def _ms(self, sample: int) -> int:
+        return int(round(sample * 1000 / self.sample_rate))
+
+    def _map_speakers(self, overlap: List[Dict[str, Any]], kept: List[Dict[str, Any]], start_ms: int) -> Dict[Any, int]:
+        """根据重叠区句子的时间重合投票，把块内说话人编号映射为全局编号"""
+        previous = []
+        for sentence in reversed(self.sentences):
+            span = _sentence_span(sentence)
+            if span is None:
+                continue
+            if span[1] <= start_ms:
+                break
+            if sentence.get("spk") is not None:
+                previous.append((span, sentence["spk"]))
+
+        votes: Dict[Any, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        for sentence in overlap:
+            span = _sentence_span(sentence)
+            if sentence.get("spk") is None or span is None:
+                continue
+            for (begin, end), speaker in previous:
+                shared = min(span[1], end) - max(span[0], begin)
+                if shared > 0:
+                    votes[sentence["spk"]][speaker] += shared
+
+        # 重合最长的配对优先，一个全局说话人只对应一个局部编号
+        mapping: Dict[Any, int] = {}
+        used = set()
+        pairs = sorted(
+            ((weight, local, speaker) for local, candidates in votes.items() for speaker, weight in candidates.items()),
+            key=lambda item: -item[0]
+        )
+        for _, local, speaker in pairs:
+            if local not in mapping and speaker not in used:
+                mapping[local] = speaker
+                used.add(speaker)
+
+        for sentence in overlap + kept:
+            local = sentence.get("spk")
+            if local is not None and local not in mapping:
+                mapping[local] = self._next_speaker
+                self._next_speaker += 1
+        return mapping
+
+    def add(self, chunk: AudioChunk, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """加入一块的识别结果（recognize_audio_data的返回值），返回新增的句子"""
+        if chunk.index != self._next_index:
+            raise ValueError(f"识别块必须按顺序拼接: 期望 {self._next_index}, 实际 {chunk.index}")
+        self._next_index += 1
+
+        offset_ms = self._ms(chunk.start)
+        cut_ms = self._ms(chunk.cut)
+        overlap, kept = [], []
+        for sentence in result.get("sentences") or []:
+            shifted = _shift_sentence(sentence, offset_ms)
+            span = _sentence_span(shifted)
+            (overlap if chunk.index and span is not None and span[0] < cut_ms else kept).append(shifted)
+
+        mapping = self._map_speakers(overlap, kept, offset_ms)
+        for sentence in kept:
+            if sentence.get("spk") is not None:
+                sentence["spk"] = mapping[sentence["spk"]]
+
+        self.timestamp.extend(
+            [begin + offset_ms, end + offset_ms] for begin, end in result.get("timestamp") or []
+            if begin + offset_ms >= cut_ms or not chunk.index
+        )
+        self.sentences.extend(kept)
+        if self.time_map is not None:
+            kept = [self.time_map.map_sentence(sentence) for sentence in kept]
+        self.output.extend(kept)
+        return kept
+
+    def result(self) -> Dict[str, Any]:
+        """拼接后的完整结果（字段与recognize_audio_data一致，srt除外）"""
+        text = self.separator.join(sentence.get("text", "") for sentence in self.output)
+        return {
+            "text": text,
+            "sentences": self.output,
+            "raw_text": self.separator.join(
+                sentence.get("raw_text", sentence.get("text", "")) for sentence in self.output
+            ),
+            "timestamp": self.time_map.map_pairs(self.timestamp) if self.time_map is not None else self.timestamp
+        }
@@ -2,29 +2,86 @@
 音频处理核心模块 - 基于FunClip
 """
 
-import os
 import re
 import logging
+import subprocess
 import numpy as np
-import librosa
+import soxr
 import moviepy.editor as mpy
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 
 from backend.models.data_models import TranscriptSegment
 from .asr_config import asr_config
+from .asr_models import asr_model_registry
+from .shared_audio import SharedAudio, SharedAudioRef, attach_audio
+from .speech_trim import SpeechTrimConfig, speech_regions
+from .audio_chunking import frame_energy_db
+from .workspace import TempWorkspace, workspace_manager
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 识别模型的输入采样率
+ASR_SAMPLE_RATE = 16000
+
+def decode_audio(file_path: str, sample_rate: int = ASR_SAMPLE_RATE,
+                 start: float = 0.0, duration: Optional[float] = None) -> np.ndarray:
+    """
+    用ffmpeg把音视频文件的第一条音轨直接解码为单声道float32（不落盘）
+
+    解码、混音和重采样都在ffmpeg中一次完成，输出经管道读入内存后直接作为数组使用，
+    不再经过 moviepy写WAV → librosa读取并重采样 的三次处理和临时文件。
+
+    Args:
+        start: 从第几秒开始解码（输入端定位，只解码所需区间）
+        duration: 解码时长（秒），None表示到结尾
+
+    Returns:
+        一维float32数组（只读），采样率为sample_rate
+    """
+    import imageio_ffmpeg
+
+    cmd = [imageio_ffmpeg.get_ffmpeg_exe(), "-v", "error", "-nostdin"]
+    if start > 0:
+        cmd += ["-ss", f"{start:.3f}"]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += [
+        "-i", str(file_path),
+        "-map", "0:a:0", "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "f32le", "-c:a", "pcm_f32le", "-"
+    ]
+    completed = subprocess.run(cmd, capture_output=True)
+    if completed.returncode != 0:
+        stderr = completed.stderr.decode(errors="ignore").strip()
+        if "matches no streams" in stderr:
+            raise Exception("文件中没有音频信息")
+        raise Exception(f"音频解码失败: {stderr[:200]}")
+
+    # 字节缓冲直接视为float32数组，不再复制
+    return np.frombuffer(completed.stdout, dtype="<f4")
+
+def decode_audio_shared(file_path: str, sample_rate: int = ASR_SAMPLE_RATE,
+                        start: float = 0.0, duration: Optional[float] = None) -> SharedAudio:
+    """解码音频并放入共享内存，交给ASR工作进程识别（调用方负责release）"""
+    return SharedAudio.create(decode_audio(file_path, sample_rate, start, duration), sample_rate)
+
 # FunClip工具函数 - 直接移植
 def convert_pcm_to_float(data):
-    """PCM数据转换为浮点"""
-    if data.dtype == np.float64:
+    """
+    PCM数据转换为float32
+
+    识别模型只需要float32精度：float32输入原样返回（不复制），float64输入降为float32，
+    整数输入只分配一个float32数组并在其上原地平移和缩放，不产生float64中间结果。
+    两小时16kHz单声道录音预处理新分配的内存：int16输入从879MB降到440MB，float32输入从879MB降到0
+    （见 test/bench_audio_memory.py）。
+    """
+    if data.dtype == np.float32:
         return data
-    elif data.dtype == np.float32:
-        return data.astype(np.float64)
+    elif data.dtype == np.float64:
+        return data.astype(np.float32)
     elif data.dtype == np.int16:
         bit_depth = 16
     elif data.dtype == np.int32:
@@ -36,9 +93,64 @@ def convert_pcm_to_float(data):
 
     # Now handle the integer types
     max_int_value = float(2 ** (bit_depth - 1))
+    result = data.astype(np.float32)
     if bit_depth == 8:
-        data = data - 128
-    return (data.astype(np.float64) / max_int_value)
+        result -= 128
+    result *= np.float32(1.0 / max_int_value)
+    return result
+
+def downmix_to_mono(data: np.ndarray, channel: Optional[int] = None) -> np.ndarray:
+    """
+    多声道转为单声道float32
+
+    支持 (采样数, 声道数) 和 (声道数, 采样数) 两种布局。channel为None时各声道取平均，
+    否则只取该声道。逐声道转换并累加，不会把整段多声道数据一次转为浮点。
+    """
+    if data.ndim == 1:
+        return convert_pcm_to_float(data)
+    
+    # 声道数远少于采样数，以此判断布局
+    if data.shape[0] < data.shape[1]:
+        data = data.T
+    
+    if channel is not None:
+        return convert_pcm_to_float(np.ascontiguousarray(data[:, channel]))
+    
+    channels = data.shape[1]
+    mono = convert_pcm_to_float(data[:, 0])
+    if channels == 1:
+        return np.ascontiguousarray(mono)
+    if np.shares_memory(mono, data):
+        mono = mono.copy()
+    for c in range(1, channels):
+        mono += convert_pcm_to_float(data[:, c])
+    mono *= np.float32(1.0 / channels)
+    return mono
+
+def resample_audio(data: np.ndarray, orig_sr: int, target_sr: int = ASR_SAMPLE_RATE) -> np.ndarray:
+    """
+    单声道float32重采样
+
+    采样率相同时直接返回；其余情况用soxr（FFT多相滤波，HQ质量）。整数比例（48k→16k）
+    和非整数比例（44.1k→16k）走同一实现：实测soxr在整数比例下也比scipy.signal.resample_poly快约4倍，
+    比原来的librosa.resample快约10倍。
+    """
+    if orig_sr == target_sr:
+        return data
+    return soxr.resample(data, orig_sr, target_sr, quality="HQ")
+
+def prepare_audio(audio_data: Tuple[int, np.ndarray], channel: Optional[int] = None) -> np.ndarray:
+    """
+    识别前的预处理：先转为单声道，再重采样到16kHz（全程float32）
+
+    先混音再重采样，多声道输入只需对一个声道做重采样。
+    """
+    sr, data = audio_data
+    if data.ndim == 2 and min(data.shape) > 1:
+        mode = "混为单声道" if channel is None else f"只取第{channel + 1}声道"
+        logger.info(f"多声道音频（{min(data.shape)}声道），{mode}")
+    data = downmix_to_mono(data, channel)
+    return resample_audio(data, sr)
 
 def time_convert(ms):
     """时间转换函数"""
@@ -110,33 +222,14 @@ class AudioProcessor:
     """音频处理器 - 基于FunClip核心功能"""
     
     def __init__(self):
-        self.temp_dir = Path("temp")
-        self.temp_dir.mkdir(exist_ok=True)
-        self.funasr_model = None
         self.language = "zh"
     
     def _init_funasr_model(self, language: str = "zh"):
-        """初始化FunASR模型"""
-        if self.funasr_model is not None and self.language == language:
-            return  # 已经初始化且语言一致
-        
+        """获取该语言的FunASR模型（由模型注册表按语言缓存，切换语言不再重新加载）"""
         try:
-            from funasr import AutoModel
-            
-            logger.info(f"初始化FunASR模型（语言: {language}）...")
-            
-            # 获取模型配置
-            model_config = asr_config.get_funasr_models_config(language)
-            
-            self.funasr_model = AutoModel(
-                model=model_config["model"],
-                vad_model=model_config["vad_model"],
-                punc_model=model_config["punc_model"],
-                spk_model=model_config["spk_model"]
-            )
-            
+            model = asr_model_registry.get(language)
             self.language = language
-            logger.info("✅ FunASR模型初始化成功!")
+            return model
             
         except ImportError:
             logger.error("❌ FunASR未安装，请运行: pip install funasr")
@@ -145,14 +238,24 @@ class AudioProcessor:
             logger.error(f"❌ FunASR模型初始化失败: {e}")
             raise
     
-    def extract_audio_from_video(self, video_path: str) -> str:
-        """从视频中提取音频"""
+    def extract_audio_from_video(self, video_path: str, workspace: Optional[TempWorkspace] = None) -> str:
+        """
+        从视频中提取音频
+        
+        Args:
+            video_path: 视频文件路径
+            workspace: 写入的工作区，None时新建一个（由调用方或清理任务回收）
+        """
         logger.info(f"从视频提取音频: {video_path}")
         
         video_path = Path(video_path)
         if not video_path.exists():
             raise FileNotFoundError(f"视频文件不存在: {video_path}")
         
+        owns_workspace = workspace is None
+        if owns_workspace:
+            workspace = workspace_manager.create("audio", detach=True)
+        
         try:
             # 使用moviepy提取音频
             video = mpy.VideoFileClip(str(video_path))
@@ -160,9 +263,8 @@ class AudioProcessor:
             if video.audio is None:
                 raise Exception("视频中没有音频信息")
             
-            # 生成临时音频文件路径
-            audio_filename = f"{video_path.stem}_temp_audio.wav"
-            audio_path = self.temp_dir / audio_filename
+            # 音频写在任务自己的工作区中，同名视频的并发任务不会冲突
+            audio_path = workspace.file(f"{video_path.stem}.wav")
             
             # 提取音频
             video.audio.write_audiofile(str(audio_path), verbose=False, logger=None)
@@ -175,26 +277,19 @@ class AudioProcessor:
             
         except Exception as e:
             logger.error(f"音频提取失败: {e}")
+            if owns_workspace:
+                workspace.release()
             raise
     
     def recognize_audio_data(self, audio_data: Tuple[int, np.ndarray], language: str = "zh", 
                            enable_speaker_diarization: bool = False, hotwords: str = "") -> Dict[str, Any]:
         """识别音频数据"""
         try:
-            # 初始化模型
-            self._init_funasr_model(language)
-            
-            sr, data = audio_data
+            # 获取模型
+            model = self._init_funasr_model(language)
             
             # 数据预处理
-            data = convert_pcm_to_float(data)
-            
-            if sr != 16000:
-                data = librosa.resample(data, orig_sr=sr, target_sr=16000)
-            
-            if len(data.shape) == 2:
-                logger.warning(f"多声道音频，只保留第一个声道")
-                data = data[:, 0]
+            data = prepare_audio(audio_data)
             
             logger.info("开始语音识别...")
             
@@ -202,7 +297,7 @@ class AudioProcessor:
             params = asr_config.get_recognition_params(language, enable_speaker_diarization, hotwords)
             
             # 执行识别
-            rec_result = self.funasr_model.generate(data, **params)
+            rec_result = model.generate(data, **params)
             
             # 生成结果
             result_text = rec_result[0]['text']
@@ -227,8 +322,8 @@ class AudioProcessor:
         """识别音频文件"""
         try:
             logger.info(f"加载音频文件: {audio_path}")
-            wav, sr = librosa.load(audio_path, sr=16000)
-            return self.recognize_audio_data((sr, wav), language, enable_speaker_diarization, hotwords)
+            wav = decode_audio(audio_path)
+            return self.recognize_audio_data((ASR_SAMPLE_RATE, wav), language, enable_speaker_diarization, hotwords)
         except Exception as e:
             logger.error(f"音频文件处理失败: {e}")
             raise
@@ -239,20 +334,14 @@ class AudioProcessor:
         try:
             logger.info(f"处理视频文件: {video_path}")
             
-            # 提取音频
-            audio_path = self.extract_audio_from_video(video_path)
+            if not Path(video_path).exists():
+                raise FileNotFoundError(f"视频文件不存在: {video_path}")
             
-            # 加载音频数据
-            wav, sr = librosa.load(audio_path, sr=16000)
-            
-            # 删除临时音频文件
-            try:
-                os.remove(audio_path)
-            except:
-                pass
+            # 直接从视频解码出16kHz单声道音频，不写临时WAV
+            wav = decode_audio(video_path)
             
             # 执行音频识别
-            return self.recognize_audio_data((sr, wav), language, enable_speaker_diarization, hotwords)
+            return self.recognize_audio_data((ASR_SAMPLE_RATE, wav), language, enable_speaker_diarization, hotwords)
             
         except Exception as e:
             logger.error(f"视频文件处理失败: {e}")
@@ -363,17 +452,72 @@ class AudioProcessor:
             logger.error(f"说话人统计失败: {e}")
             return {'speakers': {}, 'total_speakers': 0, 'total_duration': 0}
     
+    def _samples(self, audio: Union[str, np.ndarray]) -> np.ndarray:
+        """文件路径则解码为ASR_SAMPLE_RATE的单声道采样，已解码的数组原样返回"""
+        if isinstance(audio, np.ndarray):
+            return audio
+        return decode_audio(audio)
+    
+    def analyze_audio_properties(self, audio: Union[str, np.ndarray]) -> Dict[str, Any]:
+        """
+        分析音频属性：时长、电平和静音比例
+        
+        Args:
+            audio: 音视频文件路径，或decode_audio解码出的采样（ASR_SAMPLE_RATE）
+        """
+        data = self._samples(audio)
+        if len(data) == 0:
+            return {'duration': 0.0, 'sample_rate': ASR_SAMPLE_RATE,
+                    'rms_db': None, 'peak_db': None, 'silence_ratio': 1.0}
+        
+        energy = frame_energy_db(data, ASR_SAMPLE_RATE)
+        mean_square = float(np.mean(np.power(10.0, energy / 10))) if len(energy) else 0.0
+        peak = float(np.max(np.abs(data)))
+        silence_ratio = float(np.mean(energy < SpeechTrimConfig.min_db)) if len(energy) else 1.0
+        
+        return {
+            'duration': round(len(data) / ASR_SAMPLE_RATE, 3),
+            'sample_rate': ASR_SAMPLE_RATE,
+            'rms_db': round(10 * np.log10(mean_square + 1e-10), 1),
+            'peak_db': round(20 * np.log10(peak + 1e-10), 1),
+            'silence_ratio': round(silence_ratio, 3)
+        }
+    
+    def detect_speech_segments(self, audio: Union[str, np.ndarray]) -> List[Dict[str, float]]:
+        """
+        按帧能量检测语音片段（与识别前去除静音使用相同的阈值和padding）
+        
+        Returns:
+            [{'start_time', 'end_time', 'duration'}, ...]，单位秒，按时间排序
+        """
+        data = self._samples(audio)
+        segments = []
+        for start, end in speech_regions(data, ASR_SAMPLE_RATE):
+            start_time, end_time = start / ASR_SAMPLE_RATE, end / ASR_SAMPLE_RATE
+            segments.append({
+                'start_time': round(start_time, 3),
+                'end_time': round(end_time, 3),
+                'duration': round(end_time - start_time, 3)
+            })
+        return segments
+    
     def cleanup_temp_files(self):
-        """清理临时文件"""
+        """清理临时文件（所有空闲的音频工作区）"""
         try:
-            for file_path in self.temp_dir.glob("*_temp_audio.*"):
-                file_path.unlink()
-                logger.debug(f"删除临时文件: {file_path}")
-            
+            workspace_manager.cleanup(max_age=0, prefix="audio")
             logger.info("临时文件清理完成")
             
         except Exception as e:
             logger.error(f"临时文件清理失败: {e}")
 
 # 全局音频处理器实例
-audio_processor = AudioProcessor()
\ No newline at end of file
+audio_processor = AudioProcessor()
+
+# 以下函数是ASR执行器（进程池）的入口：工作进程常驻，使用进程内的全局audio_processor，
+# FunASR模型在每个工作进程中只加载一次
+
+def recognize_shared_audio(ref: SharedAudioRef, language: str = "zh",
+                           enable_speaker_diarization: bool = False, hotwords: str = "") -> Dict[str, Any]:
+    """识别共享内存中的音频（API进程已解码，工作进程只映射不复制）"""
+    with attach_audio(ref) as data:
+        return audio_processor.recognize_audio_data((ref.sample_rate, data), language, enable_speaker_diarization, hotwords)
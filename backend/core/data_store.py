@@ -10,12 +10,12 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 
 from backend.models.data_models import (
-    Project, Video, Actor, TranscriptSegment, ActorPosition,
+    Project, Video, Actor, TranscriptSegment, ActorPosition, ActorTrack,
     LightingCue, MusicCue, dataclass_to_dict, dict_to_dataclass
 )
 from backend.models.validators import (
     validate_project, validate_video, validate_actor,
-    validate_transcript_segment, validate_actor_position,
+    validate_transcript_segment, validate_actor_position, validate_actor_track,
     validate_lighting_cue, validate_music_cue
 )
 
@@ -32,6 +32,7 @@ class InMemoryDataStore:
         self.actors: Dict[str, Actor] = {}
         self.transcripts: Dict[str, List[TranscriptSegment]] = {}  # video_id -> transcripts
         self.actor_positions: Dict[str, List[ActorPosition]] = {}  # video_id -> positions
+        self.actor_tracks: Dict[str, List[ActorTrack]] = {}  # video_id -> tracks
         self.lighting_cues: Dict[str, List[LightingCue]] = {}  # project_id -> cues
         self.music_cues: Dict[str, List[MusicCue]] = {}  # project_id -> cues
         
@@ -159,9 +160,46 @@ class InMemoryDataStore:
         self.actor_positions[video_id] = positions
     
     def get_actor_positions(self, video_id: str) -> List[ActorPosition]:
-        """获取演员位置数据"""
+        """获取逐点存储的演员位置数据（检测得到的位置以轨迹存储，见get_actor_tracks，不在这里展开）"""
         return self.actor_positions.get(video_id, [])
     
+    def add_actor_tracks(self, video_id: str, tracks: List[ActorTrack]):
+        """添加演员轨迹（覆盖该视频原有的位置数据），任一轨迹不合法时抛出ValueError且不做修改"""
+        for track in tracks:
+            errors = validate_actor_track(dataclass_to_dict(track))
+            if errors:
+                raise ValueError(f"演员轨迹数据无效 ({track.actor_id}): {'; '.join(errors)}")
+        
+        self.actor_tracks[video_id] = tracks
+        self.actor_positions.pop(video_id, None)
+    
+    def get_actor_tracks(self, video_id: str) -> List[ActorTrack]:
+        """获取演员轨迹"""
+        return self.actor_tracks.get(video_id, [])
+    
+    def update_track_position(self, video_id: str, actor_id: str, timestamp: float,
+                              x: float, y: float, tolerance: float = 0.1) -> bool:
+        """
+        修改演员轨迹中最接近timestamp的采样点的舞台坐标
+        
+        Returns:
+            是否找到相差不超过tolerance秒的采样点
+        """
+        best = None
+        for track in self.get_actor_tracks(video_id):
+            if track.actor_id != actor_id:
+                continue
+            for i, sample_time in enumerate(track.timestamps):
+                difference = abs(sample_time - timestamp)
+                if difference <= tolerance and (best is None or difference < best[0]):
+                    best = (difference, track, i)
+        if best is None:
+            return False
+        _, track, i = best
+        track.x[i] = x
+        track.y[i] = y
+        return True
+    
     def add_lighting_cue(self, project_id: str, cue: LightingCue):
         """添加灯光提示"""
         if project_id not in self.lighting_cues:
@@ -197,6 +235,7 @@ class InMemoryDataStore:
             "actors": [dataclass_to_dict(actor) for actor in self.actors.values()],
             "transcripts": {},
             "actor_positions": {},
+            "actor_tracks": {},
             "lighting_cues": [dataclass_to_dict(cue) for cue in self.get_lighting_cues(project_id)],
             "music_cues": [dataclass_to_dict(cue) for cue in self.get_music_cues(project_id)]
         }
@@ -209,6 +248,9 @@ class InMemoryDataStore:
             data["actor_positions"][video.id] = [
                 dataclass_to_dict(p) for p in self.get_actor_positions(video.id)
             ]
+            data["actor_tracks"][video.id] = [
+                dataclass_to_dict(t) for t in self.get_actor_tracks(video.id)
+            ]
         
         return data
     
@@ -226,6 +268,10 @@ class InMemoryDataStore:
                 vid: [dataclass_to_dict(p) for p in positions] 
                 for vid, positions in self.actor_positions.items()
             },
+            "actor_tracks": {
+                vid: [dataclass_to_dict(t) for t in tracks]
+                for vid, tracks in self.actor_tracks.items()
+            },
             "lighting_cues": {
                 pid: [dataclass_to_dict(c) for c in cues] 
                 for pid, cues in self.lighting_cues.items()
@@ -280,6 +326,12 @@ class InMemoryDataStore:
             for vid, positions in data.get("actor_positions", {}).items()
         }
         
+        # 加载演员轨迹
+        self.actor_tracks = {
+            vid: [dict_to_dataclass(ActorTrack, t) for t in tracks]
+            for vid, tracks in data.get("actor_tracks", {}).items()
+        }
+        
         # 加载灯光提示
         self.lighting_cues = {
             pid: [dict_to_dataclass(LightingCue, c) for c in cues] 
@@ -303,6 +355,7 @@ class InMemoryDataStore:
         self.actors.clear()
         self.transcripts.clear()
         self.actor_positions.clear()
+        self.actor_tracks.clear()
         self.lighting_cues.clear()
         self.music_cues.clear()
         self.current_project_id = None
@@ -315,6 +368,7 @@ class InMemoryDataStore:
             "actors_count": len(self.actors),
             "transcripts_count": sum(len(transcripts) for transcripts in self.transcripts.values()),
             "positions_count": sum(len(positions) for positions in self.actor_positions.values()),
+            "tracks_count": sum(len(tracks) for tracks in self.actor_tracks.values()),
             "lighting_cues_count": sum(len(cues) for cues in self.lighting_cues.values()),
             "music_cues_count": sum(len(cues) for cues in self.music_cues.values()),
             "current_project_id": self.current_project_id,
@@ -331,6 +385,7 @@ class InMemoryDataStore:
         total_size += sys.getsizeof(self.actors)
         total_size += sys.getsizeof(self.transcripts)
         total_size += sys.getsizeof(self.actor_positions)
+        total_size += sys.getsizeof(self.actor_tracks)
         total_size += sys.getsizeof(self.lighting_cues)
         total_size += sys.getsizeof(self.music_cues)
         
@@ -353,6 +408,15 @@ class InMemoryDataStore:
                 if position.actor_id not in self.actors:
                     errors.append(f"位置数据引用的演员ID {position.actor_id} 不存在")
         
+        # 检查演员轨迹中的演员引用
+        for video_id, tracks in self.actor_tracks.items():
+            if video_id not in self.videos:
+                errors.append(f"轨迹数据引用的视频ID {video_id} 不存在")
+            
+            for track in tracks:
+                if track.actor_id not in self.actors:
+                    errors.append(f"轨迹数据引用的演员ID {track.actor_id} 不存在")
+        
         # 检查转录中的演员引用
         for video_id, transcripts in self.transcripts.items():
             if video_id not in self.videos:
@@ -391,6 +455,12 @@ class InMemoryDataStore:
                     orphaned_video_ids.append(video_id)
                 del self.actor_positions[video_id]
         
+        for video_id in list(self.actor_tracks.keys()):
+            if video_id not in self.videos:
+                if video_id not in orphaned_video_ids:
+                    orphaned_video_ids.append(video_id)
+                del self.actor_tracks[video_id]
+        
         # 清理引用不存在项目的数据
         orphaned_project_ids = []
         for project_id in list(self.lighting_cues.keys()):
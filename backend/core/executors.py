@@ -0,0 +1,142 @@
+"""
+执行器层 - 把阻塞工作移出asyncio事件循环
+
+API协程中所有耗时调用都经由这里的执行器完成，事件循环只负责等待结果：
+- io:  线程池，用于文件探测、ffmpeg/moviepy子进程、外部HTTP请求等主要在等待的工作
+- cpu: 进程池，用于视频解码、直方图/差分计算、检测等占用CPU的工作
+- asr: 进程池，用于语音识别；工作进程常驻，启动时预加载并预热模型（见asr_models），模型在进程内只加载一次，
+       音频经共享内存传入（见asr_pool）
+
+各池的并发上限可用环境变量配置：
+AI_STAGE_IO_WORKERS（默认8）、AI_STAGE_CPU_WORKERS（默认CPU核数的一半，至少1）、
+AI_STAGE_ASR_WORKERS（默认1）。每个ASR工作进程的torch线程数为 AI_STAGE_ASR_THREADS
+（默认CPU核数除以ASR工作进程数，至少1），多个工作进程不会争抢同一批核。
+提交到进程池的函数和参数必须可以pickle（模块级函数）。
+
+进程池以forkserver方式（不支持时用spawn）启动工作进程：API进程中已有事件循环和多个线程，
+在此之后fork出的子进程可能继承被其他线程持有的锁而死锁。
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from .asr_models import init_asr_worker, get_asr_worker_status
+from .shared_audio import ensure_resource_tracker
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _env_workers(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        logger.warning(f"环境变量{name}不是整数，使用默认值{default}")
+        return default
+
+POOL_LIMITS = {
+    "io": _env_workers("AI_STAGE_IO_WORKERS", 8),
+    "cpu": _env_workers("AI_STAGE_CPU_WORKERS", max(1, (os.cpu_count() or 2) // 2)),
+    "asr": _env_workers("AI_STAGE_ASR_WORKERS", 1)
+}
+
+ASR_THREADS = _env_workers("AI_STAGE_ASR_THREADS", max(1, (os.cpu_count() or 1) // POOL_LIMITS["asr"]))
+
+PROCESS_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_executors: Dict[str, Executor] = {}
+_lock = threading.Lock()
+
+def get_process_context():
+    """进程池使用的multiprocessing上下文（不从已有线程的进程fork）"""
+    return multiprocessing.get_context(PROCESS_START_METHOD)
+
+def get_executor(kind: str) -> Executor:
+    """获取指定类型的执行器（首次使用时创建）"""
+    if kind not in POOL_LIMITS:
+        raise ValueError(f"未知的执行器类型: {kind}")
+
+    with _lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            workers = POOL_LIMITS[kind]
+            if kind == "io":
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="io")
+            elif kind == "asr":
+                # 工作进程与API进程共用resource_tracker，attach共享内存音频时不会被工作进程误删
+                ensure_resource_tracker()
+                executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=get_process_context(),
+                    initializer=init_asr_worker, initargs=(ASR_THREADS,)
+                )
+            else:
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context())
+            _executors[kind] = executor
+            logger.info(f"创建{kind}执行器: {workers} 个工作{'线程' if kind == 'io' else '进程'}")
+        return executor
+
+def get_io_executor() -> Executor:
+    return get_executor("io")
+
+def get_cpu_executor() -> Executor:
+    return get_executor("cpu")
+
+def get_asr_executor() -> Executor:
+    return get_executor("asr")
+
+async def run_in(kind: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在指定执行器中运行func并等待结果"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(kind), functools.partial(func, *args, **kwargs))
+
+async def run_io(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在I/O线程池中运行"""
+    return await run_in("io", func, *args, **kwargs)
+
+async def run_cpu(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在CPU进程池中运行"""
+    return await run_in("cpu", func, *args, **kwargs)
+
+async def run_asr(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在ASR进程池中运行"""
+    return await run_in("asr", func, *args, **kwargs)
+
+async def start_asr_workers() -> Dict[str, Any]:
+    """
+    启动ASR工作进程（应用启动时在后台调用）
+
+    工作进程在初始化函数中预加载并预热模型，提交一个查询任务即可触发启动，
+    返回时至少有一个工作进程已完成预加载。
+    """
+    try:
+        status = await run_asr(get_asr_worker_status)
+    except Exception as e:
+        logger.error(f"ASR工作进程启动失败: {e}")
+        return {}
+    logger.info(f"ASR工作进程已就绪: {status}")
+    return status
+
+def get_executor_statistics() -> Dict[str, Dict[str, Any]]:
+    """各执行器的并发上限和是否已创建"""
+    with _lock:
+        statistics = {
+            kind: {"max_workers": limit, "started": kind in _executors}
+            for kind, limit in POOL_LIMITS.items()
+        }
+    statistics["asr"]["threads_per_worker"] = ASR_THREADS
+    return statistics
+
+def shutdown_executors(wait: bool = False):
+    """关闭所有执行器（应用退出时调用）"""
+    with _lock:
+        executors = list(_executors.items())
+        _executors.clear()
+    for kind, executor in executors:
+        executor.shutdown(wait=wait, cancel_futures=True)
+        logger.info(f"{kind}执行器已关闭")
@@ -0,0 +1,173 @@
+"""
+时间轴胶片条（雪碧图）生成
+
+一次顺序解码整段视频，按固定间隔取帧并缩小，拼接成若干张雪碧图，
+同时输出每个时间戳对应的图块坐标索引（JSON），前端一次请求即可渲染整条时间轴。
+取帧和缩小由ffmpeg滤镜完成：未选中的帧解码后直接丢弃，选中的帧先缩到图块尺寸
+再转成BGR，Python侧只接收图块大小的数据，不会为每帧分配原分辨率的图像。
+有代理文件时调用方传入代理，解码量也随之降低。
+生成在独立的工作进程中执行，结果按视频缓存到磁盘。
+"""
+
+import json
+import logging
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 索引格式版本，结构变化时递增以使旧缓存失效
+FILMSTRIP_VERSION = 2
+
+INDEX_FILENAME = "index.json"
+
+def _source_signature(file_path: str) -> Dict[str, Any]:
+    stat = Path(file_path).stat()
+    return {"file_size": stat.st_size, "mtime": stat.st_mtime}
+
+def load_filmstrip_index(output_dir: str, file_path: str) -> Optional[Dict[str, Any]]:
+    """读取已缓存的胶片条索引，源文件变化或版本不符时返回None"""
+    index_path = Path(output_dir) / INDEX_FILENAME
+    if not index_path.exists():
+        return None
+
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except Exception as e:
+        logger.warning(f"胶片条索引读取失败: {index_path}, {e}")
+        return None
+
+    if index.get("version") != FILMSTRIP_VERSION or index.get("source") != _source_signature(file_path):
+        return None
+    return index
+
+def generate_filmstrip(file_path: str, output_dir: str, interval: float = 5.0,
+                       tile_width: int = 160, columns: int = 10, rows: int = 10) -> Dict[str, Any]:
+    """
+    生成胶片条雪碧图和索引（在工作进程中调用）
+
+    Args:
+        file_path: 视频文件路径
+        output_dir: 输出目录
+        interval: 取帧间隔（秒）
+        tile_width: 单个图块宽度（像素）
+        columns: 每张雪碧图的列数
+        rows: 每张雪碧图的行数
+
+    Returns:
+        胶片条索引
+    """
+    import imageio_ffmpeg
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    cap = cv2.VideoCapture(file_path)
+    if not cap.isOpened():
+        raise Exception("无法打开视频文件")
+
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    if fps <= 0 or total_frames <= 0 or width <= 0:
+        raise Exception("无法读取视频帧率或尺寸")
+
+    tile_width = min(tile_width, width)
+    tile_height = max(2, int(round(height * tile_width / width / 2)) * 2)
+    tiles_per_sheet = columns * rows
+    tile_bytes = tile_width * tile_height * 3
+
+    logger.info(f"生成胶片条: {file_path}, 间隔 {interval:g}s, {tile_width}x{tile_height}")
+
+    # 第k个图块取时间戳不早于 k*interval 的第一帧（按帧时间选取，可变帧率同样准确）
+    cmd = [
+        imageio_ffmpeg.get_ffmpeg_exe(), "-v", "error", "-nostdin",
+        "-i", str(file_path), "-map", "0:v:0", "-an", "-sn",
+        "-vf", f"select='gte(t\\,selected_n*{interval:g})',scale={tile_width}:{tile_height}:flags=area",
+        "-fps_mode", "passthrough",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-"
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    try:
+        tiles = []
+        sheets = []
+        sheet = None
+
+        def flush_sheet(sheet_image: np.ndarray, used_tiles: int):
+            # 最后一张只保留实际用到的行
+            used_rows = (used_tiles + columns - 1) // columns
+            sheet_name = f"sheet_{len(sheets):03d}.jpg"
+            temp_path = output_dir / f"{sheet_name}.tmp.jpg"
+            if not cv2.imwrite(str(temp_path), sheet_image[:used_rows * tile_height], [cv2.IMWRITE_JPEG_QUALITY, 80]):
+                raise Exception("雪碧图保存失败")
+            os.replace(temp_path, output_dir / sheet_name)
+            sheets.append(sheet_name)
+
+        while True:
+            data = process.stdout.read(tile_bytes)
+            if len(data) < tile_bytes:
+                break
+
+            slot = len(tiles) % tiles_per_sheet
+            if slot == 0:
+                if sheet is not None:
+                    flush_sheet(sheet, tiles_per_sheet)
+                sheet = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+
+            row, column = divmod(slot, columns)
+            x, y = column * tile_width, row * tile_height
+            sheet[y:y + tile_height, x:x + tile_width] = np.frombuffer(data, dtype=np.uint8).reshape(
+                tile_height, tile_width, 3
+            )
+            tiles.append({
+                "timestamp": round(len(tiles) * interval, 3),
+                "sheet": len(sheets),
+                "x": x,
+                "y": y
+            })
+
+        if process.wait() != 0:
+            raise Exception(f"胶片条取帧失败: {process.stderr.read().decode(errors='ignore').strip()[:200]}")
+
+        if sheet is not None:
+            flush_sheet(sheet, len(tiles) - (len(sheets) * tiles_per_sheet))
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+    index = {
+        "version": FILMSTRIP_VERSION,
+        "source": _source_signature(file_path),
+        "interval": interval,
+        "duration": round(total_frames / fps, 2),
+        "tile_width": tile_width,
+        "tile_height": tile_height,
+        "columns": columns,
+        "rows": rows,
+        "sheets": sheets,
+        "tiles": tiles
+    }
+
+    temp_index = output_dir / f"{INDEX_FILENAME}.tmp"
+    with open(temp_index, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(temp_index, output_dir / INDEX_FILENAME)
+
+    logger.info(f"胶片条生成完成: {len(tiles)} 个图块, {len(sheets)} 张雪碧图")
+    return index
@@ -0,0 +1,175 @@
+"""
+按关键帧索引随机读取单帧
+
+缩略图和拖动时间轴时的单帧读取不再为每一帧启动一个ffmpeg进程，而是在进程内保持少量打开的
+VideoCapture（按最近使用淘汰）：
+
+- 目标帧与当前解码位置在同一个GOP内且在其后时，直接向后解码，不再seek；
+- 否则seek到目标帧之前最近的关键帧（关键帧索引给出），再只解码到目标帧为止；
+- 解码位置按每帧的实际时间戳（CAP_PROP_POS_MSEC）对照索引确定，可变帧率视频不会错帧；
+  OpenCV的时间以视频流的首帧为零点，与索引的frame_times一致，打开时用首帧校准一次。
+"""
+
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .keyframe_index import KeyframeIndex
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 时间戳对照索引时的容差（秒）
+TIME_TOLERANCE = 1e-3
+
+class FrameReader:
+    """一个视频文件的常驻解码器（同一时间只服务一个读取）"""
+
+    def __init__(self, file_path: str, index: KeyframeIndex):
+        self.file_path = file_path
+        self.index = index
+        self.seeks = 0
+        self._lock = Lock()
+        self._cap = cv2.VideoCapture(file_path)
+        if not self._cap.isOpened():
+            raise Exception("无法打开视频文件")
+        # 最近一次解码出的帧下标，-1表示尚未解码
+        self._current = -1
+        self._origin = 0.0
+        if self._cap.grab():
+            self._origin = self._cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            self._current = 0
+
+    def _locate(self) -> int:
+        """按刚解码帧的时间戳确定其在索引中的帧下标"""
+        timestamp = self._cap.get(cv2.CAP_PROP_POS_MSEC) / 1000 - self._origin
+        frame = int(np.searchsorted(self.index.frame_times, timestamp - TIME_TOLERANCE, side="left"))
+        return min(frame, self.index.frame_count - 1)
+
+    def _seek(self, frame: int) -> bool:
+        """
+        跳到frame之前最近的关键帧并解码一帧
+
+        OpenCV把目标时间按平均帧率换算成帧号后再向后解码，可变帧率视频上可能越过目标帧
+        甚至越过结尾；这时依次改用更早的关键帧（间隔每次翻倍），最后从头开始。
+        """
+        self.seeks += 1
+        position = int(np.searchsorted(self.index.keyframes, frame, side="right")) - 1
+        step = 1
+        while True:
+            position = max(position, 0)
+            keyframe = int(self.index.keyframes[position])
+            if keyframe == 0:
+                self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            else:
+                self._cap.set(cv2.CAP_PROP_POS_MSEC, (float(self.index.frame_times[keyframe]) + self._origin) * 1000)
+            if self._cap.grab():
+                self._current = self._locate() if keyframe > 0 else 0
+                if self._current <= frame:
+                    return True
+            if position == 0:
+                self._current = -1
+                return False
+            position -= step
+            step *= 2
+
+    def read(self, frame: int) -> Optional[np.ndarray]:
+        """读取第frame帧（索引中的帧下标）"""
+        with self._lock:
+            if self._cap is None:
+                return None
+            keyframe = self.index.keyframe_before(frame)
+            # 目标帧就是当前帧，或在当前位置之后且不跨关键帧时直接向后解码
+            if not (keyframe - 1 <= self._current <= frame):
+                if not self._seek(frame):
+                    return None
+            while self._current < frame:
+                if not self._cap.grab():
+                    self._current = -1
+                    return None
+                # 向后解码时至少前进一帧（时间戳相同的相邻帧也能区分）
+                self._current = max(self._current + 1, self._locate())
+            ok, image = self._cap.retrieve()
+            return image if ok else None
+
+    @property
+    def closed(self) -> bool:
+        return self._cap is None
+
+    def close(self):
+        with self._lock:
+            if self._cap is not None:
+                self._cap.release()
+                self._cap = None
+
+class FrameReaderPool:
+    """按文件缓存打开的FrameReader，超过max_open时关闭最久未用的"""
+
+    def __init__(self, max_open: int = 8):
+        self.max_open = max_open
+        self._readers: "OrderedDict[str, FrameReader]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, file_path: str, index: KeyframeIndex) -> FrameReader:
+        """获取文件的解码器；索引已重建（文件变化）时重新打开"""
+        key = str(Path(file_path).resolve())
+        stale = None
+        with self._lock:
+            reader = self._readers.get(key)
+            if reader is not None and reader.index is not index:
+                stale, reader = self._readers.pop(key), None
+            if reader is not None:
+                self._readers.move_to_end(key)
+        if stale is not None:
+            stale.close()
+        if reader is not None:
+            return reader
+
+        reader = FrameReader(file_path, index)
+        evicted = []
+        with self._lock:
+            existing = self._readers.get(key)
+            if existing is not None and existing.index is index:
+                # 其他线程已经打开
+                evicted.append(reader)
+                reader = existing
+            else:
+                if existing is not None:
+                    evicted.append(existing)
+                self._readers[key] = reader
+            self._readers.move_to_end(key)
+            while len(self._readers) > self.max_open:
+                evicted.append(self._readers.popitem(last=False)[1])
+        for old in evicted:
+            old.close()
+        return reader
+
+    def read(self, file_path: str, index: KeyframeIndex, frame: int) -> Optional[np.ndarray]:
+        """读取一帧；解码器恰好被其他线程淘汰关闭时重新打开一次"""
+        for _ in range(2):
+            reader = self.get(file_path, index)
+            image = reader.read(frame)
+            if image is not None or not reader.closed:
+                return image
+        return None
+
+    def close(self, file_path: Optional[str] = None):
+        """关闭文件的解码器，None时全部关闭"""
+        with self._lock:
+            if file_path is None:
+                readers = list(self._readers.values())
+                self._readers.clear()
+            else:
+                reader = self._readers.pop(str(Path(file_path).resolve()), None)
+                readers = [reader] if reader is not None else []
+        for reader in readers:
+            reader.close()
+
+# 全局单帧读取器池实例
+frame_reader_pool = FrameReaderPool()
@@ -0,0 +1,521 @@
+"""
+持久化任务队列
+
+媒体处理（信息提取、代理转码、音频提取、转录、位置提取）不再直接挂在请求的BackgroundTasks上，
+而是作为任务写入SQLite（data/jobs.db），由固定数量的后台工作协程按提交顺序取出执行：
+负载突增时任务排队等待，而不是同时抢占CPU。
+
+任务记录包含状态、进度、说明、结果和预计剩余时间，可以查询、等待（wait，用于同步返回结果的接口）和取消：
+- 排队中的任务取消后直接标记为cancelled；
+- 运行中的任务取消时中断等待，处理函数在下次报告进度时也会收到JobCancelled。
+
+处理函数抛出异常时按指数退避重新排队，超过最大尝试次数后标记为failed。
+服务重启时，上次未完成（running）的任务重新排队；已用完尝试次数的任务（包括只允许执行一次、
+等待结果的请求已随重启断开的任务）直接标记为failed，不会因反复崩溃而无限重跑。
+
+调度顺序：
+- 优先级分为interactive（用户正在等待）和batch（批量导入），interactive总是先于batch；
+  batch任务排队超过BATCH_AGING_SECONDS后按interactive对待，避免一直得不到执行；
+- 同一优先级内按预计耗时（媒体时长×任务类型系数）从短到长，短任务不会被长任务堵住，
+  耗时相同时按提交顺序。
+
+准入控制：排队中的任务达到队列深度上限时拒绝提交（QueueFullError，附带建议的重试等待秒数）；
+batch任务只能占用上限的BATCH_DEPTH_RATIO，剩余的位置留给interactive任务。
+
+工作协程数、最大尝试次数、队列深度可用环境变量
+AI_STAGE_JOB_WORKERS、AI_STAGE_JOB_MAX_ATTEMPTS、AI_STAGE_JOB_QUEUE_DEPTH 配置。
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = "data/jobs.db"
+DEFAULT_WORKERS = max(1, int(os.environ.get("AI_STAGE_JOB_WORKERS", 2)))
+DEFAULT_MAX_ATTEMPTS = max(1, int(os.environ.get("AI_STAGE_JOB_MAX_ATTEMPTS", 3)))
+RETRY_BASE_DELAY = 5.0       # 第一次重试前等待的秒数，之后每次翻倍
+RETRY_MAX_DELAY = 300.0
+FINISHED_JOB_TTL = 7 * 24 * 3600  # 已结束任务记录的保留时间
+DEFAULT_QUEUE_DEPTH = max(1, int(os.environ.get("AI_STAGE_JOB_QUEUE_DEPTH", 100)))
+BATCH_DEPTH_RATIO = 0.8           # batch任务可占用的队列深度比例
+BATCH_AGING_SECONDS = 900.0       # batch任务排队超过该时间后提升为interactive
+DEFAULT_EXPECTED_COST = 300.0     # 无法得知媒体时长时的预计耗时
+DEFAULT_JOB_RUNTIME = 30.0        # 没有历史记录时估计重试等待用的单个任务耗时
+
+# 优先级
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+class QueueFullError(Exception):
+    """排队任务已达队列深度上限"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+@dataclass
+class Job:
+    """任务记录"""
+    id: str
+    kind: str
+    video_id: Optional[str]
+    params: Dict[str, Any]
+    priority: str = INTERACTIVE
+    expected_cost: float = DEFAULT_EXPECTED_COST  # 用于排序的预计耗时
+    status: str = QUEUED
+    progress: float = 0.0
+    message: str = ""
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    run_after: float = 0.0
+    cancel_requested: bool = False
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """按已用时间和进度估算的剩余秒数"""
+        if self.status != RUNNING or not self.started_at or self.progress <= 0:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed / self.progress * (1 - self.progress), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["eta_seconds"] = self.eta_seconds
+        return data
+
+_COLUMNS = [
+    "id", "kind", "video_id", "params", "priority", "expected_cost", "status", "progress", "message", "result", "error",
+    "attempts", "max_attempts", "created_at", "started_at", "finished_at", "run_after", "cancel_requested"
+]
+
+def _row_to_job(row: sqlite3.Row) -> Job:
+    data = dict(row)
+    data["params"] = json.loads(data["params"]) if data["params"] else {}
+    data["result"] = json.loads(data["result"]) if data["result"] else None
+    data["cancel_requested"] = bool(data["cancel_requested"])
+    return Job(**data)
+
+class JobContext:
+    """传给处理函数的任务上下文，用于报告进度和检查取消"""
+
+    def __init__(self, queue: "JobQueue", job: Job):
+        self._queue = queue
+        self.job = job
+
+    @property
+    def id(self) -> str:
+        return self.job.id
+
+    @property
+    def cancelled(self) -> bool:
+        return self._queue.is_cancel_requested(self.job.id)
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(f"任务已取消: {self.job.id}")
+
+    def report(self, progress: float, message: str = ""):
+        """更新进度（0~1），可在工作线程中调用；任务已取消时抛出JobCancelled"""
+        self.check_cancelled()
+        self._queue.update_progress(self.job.id, progress, message)
+
+JobHandler = Callable[..., Awaitable[Optional[Dict[str, Any]]]]
+
+class JobQueue:
+    """基于SQLite的任务队列和后台工作协程"""
+
+    def __init__(self, db_path: str = JOB_DB_PATH, workers: int = DEFAULT_WORKERS,
+                 retry_base_delay: float = RETRY_BASE_DELAY, max_depth: int = DEFAULT_QUEUE_DEPTH):
+        self.db_path = Path(db_path)
+        self.workers = workers
+        self.retry_base_delay = retry_base_delay
+        self.max_depth = max_depth
+        self._handlers: Dict[str, JobHandler] = {}
+        self._cost_factors: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._finished: Dict[str, List[asyncio.Event]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+
+    # ---- 存储 ----
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    video_id TEXT,
+                    params TEXT,
+                    priority TEXT DEFAULT 'interactive',
+                    expected_cost REAL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    progress REAL DEFAULT 0,
+                    message TEXT DEFAULT '',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    max_attempts INTEGER DEFAULT 1,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    run_after REAL DEFAULT 0,
+                    cancel_requested INTEGER DEFAULT 0
+                )
+            """)
+            # 旧版本的数据库没有调度字段
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in (("priority", "TEXT DEFAULT 'interactive'"), ("expected_cost", "REAL DEFAULT 0")):
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, run_after)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_video ON jobs (video_id, kind)")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, args: tuple = ()) -> int:
+        """执行写操作，返回影响的行数"""
+        with self._lock:
+            return self._connection().execute(sql, args).rowcount
+
+    def _query(self, sql: str, args: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._connection().execute(sql, args).fetchall()
+
+    def _update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def register(self, kind: str, handler: JobHandler, cost_factor: float = 1.0):
+        """
+        注册任务处理函数
+
+        处理函数签名为 async handler(context: JobContext, **params)，返回值（可JSON序列化的dict）保存为任务结果
+
+        Args:
+            cost_factor: 每秒媒体时长的相对耗时，用于短任务优先排序（转录、检测约为1，探测信息远小于1）
+        """
+        self._handlers[kind] = handler
+        self._cost_factors[kind] = cost_factor
+
+    def _estimate_retry_after(self, excess: int) -> int:
+        """按最近完成任务的平均耗时估算排队中的任务减少excess个需要的秒数"""
+        rows = self._query(
+            "SELECT AVG(finished_at - started_at) FROM "
+            "(SELECT finished_at, started_at FROM jobs WHERE status = ? ORDER BY finished_at DESC LIMIT 50)",
+            (COMPLETED,)
+        )
+        runtime = rows[0][0] if rows and rows[0][0] else DEFAULT_JOB_RUNTIME
+        return int(min(max(math.ceil(runtime * excess / self.workers), 1), 3600))
+
+    def admit(self, count: int = 1, priority: str = INTERACTIVE):
+        """
+        检查队列是否还能接收count个任务
+
+        Raises:
+            QueueFullError: 排队中的任务已达上限（batch任务的上限为max_depth×BATCH_DEPTH_RATIO）
+        """
+        limit = self.max_depth if priority == INTERACTIVE else max(1, int(self.max_depth * BATCH_DEPTH_RATIO))
+        queued = self._query("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,))[0][0]
+        if queued + count > limit:
+            retry_after = self._estimate_retry_after(queued + count - limit)
+            raise QueueFullError(f"任务队列已满（{queued}/{limit}），请{retry_after}秒后重试", retry_after)
+
+    def submit(self, kind: str, video_id: Optional[str] = None, params: Optional[Dict[str, Any]] = None,
+               max_attempts: Optional[int] = None, priority: str = INTERACTIVE,
+               media_duration: Optional[float] = None, admit: bool = True) -> Job:
+        """
+        提交任务（params需可JSON序列化）
+
+        Args:
+            priority: interactive 或 batch
+            media_duration: 媒体时长（秒），与任务类型系数相乘作为预计耗时
+            admit: 是否做准入检查（调用方已用admit()预先检查过时传False）
+
+        Raises:
+            QueueFullError: 队列已满
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"未注册的任务类型: {kind}")
+        if priority not in PRIORITIES:
+            raise ValueError(f"未知的优先级: {priority}")
+        if admit:
+            self.admit(priority=priority)
+
+        expected_cost = DEFAULT_EXPECTED_COST
+        if media_duration and media_duration > 0:
+            expected_cost = media_duration * self._cost_factors.get(kind, 1.0)
+
+        job = Job(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            video_id=video_id,
+            params=params or {},
+            priority=priority,
+            expected_cost=round(expected_cost, 3),
+            max_attempts=max_attempts or DEFAULT_MAX_ATTEMPTS,
+            created_at=time.time()
+        )
+        values = {**asdict(job), "params": json.dumps(job.params), "result": None,
+                  "cancel_requested": 0}
+        self._execute(
+            f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            tuple(values[column] for column in _COLUMNS)
+        )
+        logger.info(f"任务已提交: {kind} {job.id}")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return _row_to_job(rows[0]) if rows else None
+
+    def list_jobs(self, video_id: Optional[str] = None, kind: Optional[str] = None,
+                  status: Optional[str] = None, limit: int = 100) -> List[Job]:
+        """按提交时间倒序列出任务"""
+        conditions, args = [], []
+        for column, value in (("video_id", video_id), ("kind", kind), ("status", status)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                args.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._query(f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?", (*args, limit))
+        return [_row_to_job(row) for row in rows]
+
+    async def wait(self, job_id: str) -> Optional[Job]:
+        """等待任务结束（completed/failed/cancelled），返回结束时的任务记录，任务不存在时返回None"""
+        event = asyncio.Event()
+        waiters = self._finished.setdefault(job_id, [])
+        waiters.append(event)
+        try:
+            job = self.get(job_id)
+            # 失败后重新排队也会唤醒，状态仍为活动时继续等待
+            while job is not None and job.status in ACTIVE_STATES:
+                await event.wait()
+                event.clear()
+                job = self.get(job_id)
+            return job
+        finally:
+            waiters.remove(event)
+            if not waiters:
+                self._finished.pop(job_id, None)
+
+    def _notify_finished(self, job_id: str):
+        for event in self._finished.get(job_id, []):
+            event.set()
+
+    def latest(self, video_id: str, kind: str) -> Optional[Job]:
+        jobs = self.list_jobs(video_id=video_id, kind=kind, limit=1)
+        return jobs[0] if jobs else None
+
+    def find_active(self, video_id: str, kind: str) -> Optional[Job]:
+        """该视频同类型的排队中或运行中任务"""
+        rows = self._query(
+            "SELECT * FROM jobs WHERE video_id = ? AND kind = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+            (video_id, kind, *ACTIVE_STATES)
+        )
+        return _row_to_job(rows[0]) if rows else None
+
+    def update_progress(self, job_id: str, progress: float, message: str = ""):
+        self._update(job_id, progress=round(min(max(progress, 0.0), 1.0), 3), message=message)
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        rows = self._query("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,))
+        return bool(rows and rows[0][0])
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        取消任务
+
+        Returns:
+            更新后的任务记录，任务不存在时返回None；已结束的任务不受影响
+        """
+        job = self.get(job_id)
+        if job is None or job.status not in ACTIVE_STATES:
+            return job
+
+        if job.status == QUEUED:
+            self._update(job_id, status=CANCELLED, cancel_requested=1, finished_at=time.time(),
+                         message="已取消")
+            self._notify_finished(job_id)
+        else:
+            self._update(job_id, cancel_requested=1, message="正在取消")
+            task = self._running.get(job_id)
+            if task is not None:
+                task.cancel()
+        logger.info(f"任务取消: {job.kind} {job_id}")
+        return self.get(job_id)
+
+    def recover(self) -> int:
+        """
+        服务重启后把上次未完成的任务重新排队，并删除过期的已结束任务
+
+        运行中被中断也算一次尝试：已用完尝试次数的任务标记为failed而不是重新排队。
+
+        Returns:
+            重新排队的任务数
+        """
+        now = time.time()
+        failed = self._execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, message = '服务重启时任务未完成', "
+            "error = COALESCE(error, '服务重启时任务未完成，已达最大尝试次数') "
+            "WHERE status IN (?, ?) AND attempts >= max_attempts",
+            (FAILED, now, *ACTIVE_STATES)
+        )
+        requeued = self._execute(
+            "UPDATE jobs SET status = ?, progress = 0, message = '服务重启，重新排队', started_at = NULL, run_after = ? "
+            "WHERE status = ?",
+            (QUEUED, now, RUNNING)
+        )
+        self._execute(
+            "DELETE FROM jobs WHERE status NOT IN (?, ?) AND finished_at < ?",
+            (*ACTIVE_STATES, now - FINISHED_JOB_TTL)
+        )
+        if failed:
+            logger.warning(f"{failed} 个未完成的任务已达最大尝试次数，标记为失败")
+        if requeued:
+            logger.info(f"重新排队 {requeued} 个未完成的任务")
+        return requeued
+
+    def get_statistics(self) -> Dict[str, int]:
+        rows = self._query("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        counts = {status: 0 for status in (QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED)}
+        counts.update({row[0]: row[1] for row in rows})
+        counts["workers"] = self.workers
+        counts["max_depth"] = self.max_depth
+        return counts
+
+    # ---- 执行 ----
+
+    def _claim_next(self) -> Optional[Job]:
+        """按优先级、预计耗时、提交时间取出下一个可运行的任务并标记为running（跳过已用完尝试次数的任务）"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? AND run_after <= ? AND attempts < max_attempts "
+                "ORDER BY CASE WHEN priority = ? OR created_at <= ? THEN 0 ELSE 1 END, expected_cost, created_at "
+                "LIMIT 1",
+                (QUEUED, now, INTERACTIVE, now - BATCH_AGING_SECONDS)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, progress = 0 WHERE id = ?",
+                (RUNNING, now, row["id"])
+            )
+        return self.get(row["id"])
+
+    def _next_wakeup(self) -> Optional[float]:
+        """最早一个等待重试的任务还需等待的秒数"""
+        rows = self._query("SELECT MIN(run_after) FROM jobs WHERE status = ? AND attempts < max_attempts", (QUEUED,))
+        if not rows or rows[0][0] is None:
+            return None
+        return max(0.0, rows[0][0] - time.time())
+
+    async def _run_job(self, job: Job):
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            self._update(job.id, status=FAILED, error=f"未注册的任务类型: {job.kind}", finished_at=time.time())
+            return
+
+        logger.info(f"开始执行任务: {job.kind} {job.id} (第{job.attempts}次)")
+        task = asyncio.ensure_future(handler(JobContext(self, job), **job.params))
+        self._running[job.id] = task
+        try:
+            result = await task
+        except (asyncio.CancelledError, JobCancelled):
+            if not self.is_cancel_requested(job.id):
+                # 队列本身被停止，任务保持running，下次启动时重新排队
+                raise
+            self._update(job.id, status=CANCELLED, finished_at=time.time(), message="已取消")
+            logger.info(f"任务已取消: {job.kind} {job.id}")
+        except Exception as e:
+            if job.attempts < job.max_attempts and not self.is_cancel_requested(job.id):
+                delay = min(self.retry_base_delay * 2 ** (job.attempts - 1), RETRY_MAX_DELAY)
+                self._update(job.id, status=QUEUED, error=str(e), run_after=time.time() + delay,
+                             message=f"执行失败，{delay:.0f}秒后重试")
+                logger.warning(f"任务失败，{delay:.0f}秒后重试: {job.kind} {job.id}, {e}")
+            else:
+                self._update(job.id, status=FAILED, error=str(e), finished_at=time.time())
+                logger.error(f"任务失败: {job.kind} {job.id}, {e}")
+        else:
+            self._update(job.id, status=COMPLETED, progress=1.0, finished_at=time.time(),
+                         result=json.dumps(result) if result is not None else None, error=None)
+            logger.info(f"任务完成: {job.kind} {job.id}")
+        finally:
+            self._running.pop(job.id, None)
+            self._notify_finished(job.id)
+
+    async def _worker_loop(self):
+        while True:
+            job = self._claim_next()
+            if job is not None:
+                await self._run_job(job)
+                continue
+
+            self._wakeup.clear()
+            timeout = self._next_wakeup()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """恢复未完成的任务并启动工作协程（需在事件循环中调用）"""
+        if self._worker_tasks:
+            return
+        self.recover()
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._worker_tasks = [loop.create_task(self._worker_loop()) for _ in range(self.workers)]
+        logger.info(f"任务队列已启动: {self.db_path}, {self.workers} 个工作协程")
+
+    async def stop(self):
+        """停止工作协程，运行中的任务在下次启动时重新排队"""
+        tasks = self._worker_tasks + list(self._running.values())
+        self._worker_tasks = []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._wakeup = None
+
+# 全局任务队列实例
+job_queue = JobQueue()
@@ -0,0 +1,230 @@
+"""
+视频关键帧/时间戳索引
+
+通过一次ffmpeg解复用（-c copy，不解码）获得每一帧的真实显示时间戳和关键帧位置，
+持久化后供缩略图和单帧读取使用：先跳到目标之前最近的关键帧，再只解码少量帧。
+对手机拍摄的可变帧率视频，按真实时间戳定位比按 帧号/平均帧率 换算准确得多。
+"""
+
+import hashlib
+import logging
+import subprocess
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 索引文件格式版本，结构变化时递增以使旧索引失效
+INDEX_VERSION = 2
+
+# AVPacket标志位
+PACKET_FLAG_KEY = 0x1
+PACKET_FLAG_DISCARD = 0x4
+
+@dataclass
+class KeyframeIndex:
+    """单个视频文件的帧时间戳索引"""
+    file_size: int
+    mtime: float
+    frame_times: np.ndarray  # 按显示顺序排列的帧时间戳（秒，相对首帧）
+    keyframes: np.ndarray    # 关键帧在frame_times中的下标（升序）
+    start_offset: float = 0.0  # 首帧相对容器起点的时间（秒）；ffmpeg -ss等按容器时间定位时需加上
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.frame_times)
+
+    @property
+    def duration(self) -> float:
+        if self.frame_count < 2:
+            return 0.0
+        # 最后一帧的持续时间按平均帧间隔估计
+        avg_interval = float(self.frame_times[-1] - self.frame_times[0]) / (self.frame_count - 1)
+        return float(self.frame_times[-1]) + avg_interval
+
+    def frame_at(self, timestamp: float) -> int:
+        """返回时间戳处正在显示的帧下标"""
+        index = int(np.searchsorted(self.frame_times, timestamp, side="right")) - 1
+        return min(max(index, 0), self.frame_count - 1)
+
+    def keyframe_before(self, frame: int) -> int:
+        """返回不晚于该帧的最近关键帧的帧下标（从这里开始解码即可得到该帧）"""
+        position = int(np.searchsorted(self.keyframes, frame, side="right")) - 1
+        return int(self.keyframes[max(position, 0)])
+
+    def is_valid_for(self, file_path: str) -> bool:
+        """检查索引是否仍与文件一致"""
+        stat = Path(file_path).stat()
+        return stat.st_size == self.file_size and abs(stat.st_mtime - self.mtime) < 1e-3
+
+def _parse_framecrc(output: str):
+    """解析ffmpeg framecrc输出，返回(时间基, pts列表, 关键帧标记列表)"""
+    time_base = None
+    pts_list = []
+    key_flags = []
+
+    for line in output.splitlines():
+        if line.startswith("#tb 0:"):
+            num, den = line.split(":", 1)[1].strip().split("/")
+            time_base = int(num) / int(den)
+            continue
+        if not line or line.startswith("#"):
+            continue
+
+        # 格式: stream_index, dts, pts, duration, size, crc[, F=0x..]
+        # 只有标志位不等于KEY的包才会带F=字段
+        fields = [field.strip() for field in line.split(",")]
+        if len(fields) < 6 or fields[0] != "0":
+            continue
+        flags = PACKET_FLAG_KEY
+        for field in fields[6:]:
+            if field.startswith("F="):
+                flags = int(field[2:], 16)
+        if flags & PACKET_FLAG_DISCARD:
+            # 编辑列表裁掉的帧不会显示
+            continue
+        pts_list.append(int(fields[2]))
+        key_flags.append(bool(flags & PACKET_FLAG_KEY))
+
+    if time_base is None:
+        raise ValueError("ffmpeg输出中缺少时间基信息")
+
+    return time_base, pts_list, key_flags
+
+def build_keyframe_index(file_path: str) -> KeyframeIndex:
+    """对视频做一次解复用（不解码），构建帧时间戳和关键帧索引"""
+    import imageio_ffmpeg
+
+    logger.info(f"构建关键帧索引: {file_path}")
+
+    cmd = [
+        imageio_ffmpeg.get_ffmpeg_exe(), "-v", "error", "-nostdin",
+        "-i", str(file_path),
+        "-map", "0:v:0", "-c", "copy",
+        "-f", "framecrc", "-"
+    ]
+    completed = subprocess.run(cmd, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise Exception(f"ffmpeg解复用失败: {completed.stderr.strip()[:200]}")
+
+    time_base, pts_list, key_flags = _parse_framecrc(completed.stdout)
+    if not pts_list:
+        raise Exception("视频中没有可索引的帧")
+
+    # 包按解码顺序输出，B帧的pts乱序，需要按显示顺序重排
+    pts = np.asarray(pts_list, dtype=np.int64)
+    order = np.argsort(pts, kind="stable")
+    frame_times = (pts[order] - pts[order[0]]) * time_base
+    # -c copy输出的时间戳已减去容器起点，首帧的pts即首帧相对容器起点的偏移
+    start_offset = float(pts[order[0]] * time_base)
+    keyframes = np.flatnonzero(np.asarray(key_flags, dtype=bool)[order])
+    if len(keyframes) == 0 or keyframes[0] != 0:
+        # 没有关键帧标记（或首帧不是关键帧）时至少保证能从头解码
+        keyframes = np.concatenate([[0], keyframes]).astype(np.int64)
+
+    stat = Path(file_path).stat()
+    index = KeyframeIndex(
+        file_size=stat.st_size,
+        mtime=stat.st_mtime,
+        frame_times=frame_times.astype(np.float64),
+        keyframes=keyframes.astype(np.int64),
+        start_offset=start_offset
+    )
+
+    logger.info(f"关键帧索引构建完成: {index.frame_count} 帧, {len(index.keyframes)} 个关键帧")
+    return index
+
+class KeyframeIndexStore:
+    """关键帧索引的内存+磁盘缓存"""
+
+    def __init__(self, index_dir: str = "data/keyframe_index", max_cached: int = 64):
+        self.index_dir = Path(index_dir)
+        self.max_cached = max_cached
+        self._indexes: "OrderedDict[str, KeyframeIndex]" = OrderedDict()
+        self._lock = Lock()
+
+    def _index_path(self, file_path: str) -> Path:
+        digest = hashlib.sha1(str(Path(file_path).resolve()).encode("utf-8")).hexdigest()
+        return self.index_dir / f"{digest}.npz"
+
+    def _load(self, file_path: str) -> Optional[KeyframeIndex]:
+        index_path = self._index_path(file_path)
+        if not index_path.exists():
+            return None
+
+        try:
+            with np.load(index_path) as data:
+                if int(data["version"]) != INDEX_VERSION:
+                    return None
+                index = KeyframeIndex(
+                    file_size=int(data["file_size"]),
+                    mtime=float(data["mtime"]),
+                    frame_times=data["frame_times"],
+                    keyframes=data["keyframes"],
+                    start_offset=float(data["start_offset"])
+                )
+        except Exception as e:
+            logger.warning(f"关键帧索引读取失败，将重新构建: {index_path}, {e}")
+            return None
+
+        return index if index.is_valid_for(file_path) else None
+
+    def _save(self, file_path: str, index: KeyframeIndex):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        index_path = self._index_path(file_path)
+        temp_path = index_path.with_suffix(".tmp.npz")
+        np.savez(
+            temp_path,
+            version=INDEX_VERSION,
+            file_size=index.file_size,
+            mtime=index.mtime,
+            frame_times=index.frame_times,
+            keyframes=index.keyframes,
+            start_offset=index.start_offset
+        )
+        temp_path.replace(index_path)
+
+    def get(self, file_path: str, build: bool = True) -> Optional[KeyframeIndex]:
+        """获取索引：内存缓存 -> 磁盘 -> （可选）重新构建"""
+        key = str(Path(file_path).resolve())
+
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+        if index is not None and index.is_valid_for(file_path):
+            return index
+
+        index = self._load(file_path)
+        if index is None:
+            if not build:
+                return None
+            index = build_keyframe_index(file_path)
+            try:
+                self._save(file_path, index)
+            except Exception as e:
+                logger.warning(f"关键帧索引保存失败: {e}")
+
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_cached:
+                self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, file_path: str):
+        """删除文件对应的索引"""
+        key = str(Path(file_path).resolve())
+        with self._lock:
+            self._indexes.pop(key, None)
+        self._index_path(file_path).unlink(missing_ok=True)
+
+# 全局关键帧索引存储实例
+keyframe_index_store = KeyframeIndexStore()
@@ -0,0 +1,177 @@
+"""
+运动能量时间轴
+
+在极小的灰度画面上（默认64像素宽、10fps）做一次顺序解码，相邻采样帧的平均绝对差
+即为该时刻的运动量，再按秒求平均得到每秒一个值（0~1）的运动能量曲线。
+无需姿态估计就能看出演员在哪些时间段走动。
+
+曲线以float32数组存为npz（附源文件签名，源文件变化后失效），计算在独立的工作进程中进行。
+读取时构建多分辨率金字塔（1、2、4、8…秒一格，每格记录平均值和峰值），
+时间轴任意缩放级别都可以直接取对应层级，不必重新计算。
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 存储格式版本，计算方式变化时递增以使旧结果失效
+MOTION_ENERGY_VERSION = 1
+
+@dataclass
+class MotionEnergyConfig:
+    """运动能量计算参数"""
+    sample_fps: float = 10.0   # 采样帧率
+    max_width: int = 64        # 解码后缩小到的最大宽度
+    batch_size: int = 128      # 每批帧数
+    noise_floor: int = 4       # 低于该灰度差的像素视为噪声（压缩噪点、轻微闪烁）
+
+def _source_signature(file_path: str) -> Tuple[int, float]:
+    stat = Path(file_path).stat()
+    return stat.st_size, stat.st_mtime
+
+def compute_motion_energy(file_path: str, output_path: str,
+                          config: Optional[MotionEnergyConfig] = None) -> Dict[str, float]:
+    """
+    计算每秒运动能量并保存（在工作进程中调用）
+
+    Args:
+        file_path: 视频文件路径（通常为代理文件）
+        output_path: 输出npz路径
+
+    Returns:
+        {seconds, mean, peak} 统计信息
+    """
+    from backend.core.video_processor import video_processor
+
+    config = config or MotionEnergyConfig()
+    logger.info(f"开始计算运动能量: {file_path}")
+
+    sums = np.zeros(0, dtype=np.float64)
+    counts = np.zeros(0, dtype=np.int64)
+    previous = None
+
+    for timestamps, frames in video_processor.iter_frame_batches(
+        file_path,
+        sample_fps=config.sample_fps,
+        batch_size=config.batch_size,
+        max_width=config.max_width,
+        color="gray"
+    ):
+        # 与上一批最后一帧衔接，第一帧没有前一帧，不计入
+        frames = frames.astype(np.int16)
+        if previous is None:
+            chained, timestamps = frames, timestamps[1:]
+        else:
+            chained = np.concatenate([previous, frames])
+        previous = frames[-1:]
+        if len(chained) < 2:
+            continue
+
+        difference = np.abs(np.diff(chained, axis=0))
+        difference[difference < config.noise_floor] = 0
+        energy = difference.mean(axis=(1, 2)) / 255.0
+
+        # 按秒累加，bincount一次完成整批
+        seconds = timestamps.astype(np.int64)
+        size = int(seconds[-1]) + 1
+        if size > len(sums):
+            sums = np.pad(sums, (0, size - len(sums)))
+            counts = np.pad(counts, (0, size - len(counts)))
+        sums[:size] += np.bincount(seconds, weights=energy, minlength=size)
+        counts[:size] += np.bincount(seconds, minlength=size)
+
+    energy = (sums / np.maximum(counts, 1)).astype(np.float32)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    file_size, mtime = _source_signature(file_path)
+    temp_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp.npz")
+    np.savez(temp_path, version=MOTION_ENERGY_VERSION, file_size=file_size, mtime=mtime, energy=energy)
+    os.replace(temp_path, output_path)
+
+    logger.info(f"运动能量计算完成: {len(energy)} 秒")
+    return {
+        "seconds": len(energy),
+        "mean": round(float(energy.mean()), 4) if len(energy) else 0.0,
+        "peak": round(float(energy.max()), 4) if len(energy) else 0.0
+    }
+
+def build_pyramid(energy: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    构建多分辨率金字塔
+
+    Returns:
+        第k层为 (mean, peak)，每格覆盖2^k秒；最后一格不满时按实际秒数求平均
+    """
+    levels = [(energy, energy)]
+    weights = np.ones(len(energy), dtype=np.float32)
+    while len(levels[-1][0]) > 1:
+        mean, peak = levels[-1]
+        if len(mean) % 2:
+            mean, peak, weights = np.append(mean, 0), np.append(peak, 0), np.append(weights, 0)
+        pair_weights = weights.reshape(-1, 2).sum(axis=1)
+        mean = (mean * weights).reshape(-1, 2).sum(axis=1) / np.maximum(pair_weights, 1)
+        peak = peak.reshape(-1, 2).max(axis=1)
+        levels.append((mean.astype(np.float32), peak))
+        weights = pair_weights
+    return levels
+
+class MotionEnergyStore:
+    """运动能量结果的读取和金字塔缓存"""
+
+    def __init__(self, data_dir: str = "data/motion_energy", max_cached: int = 64):
+        self.data_dir = Path(data_dir)
+        self.max_cached = max_cached
+        self._cache: "OrderedDict[str, Tuple[Tuple[int, float], List[Tuple[np.ndarray, np.ndarray]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path_for(self, video_id: str) -> Path:
+        return self.data_dir / f"{video_id}.npz"
+
+    def get_pyramid(self, video_id: str, file_path: str) -> Optional[List[Tuple[np.ndarray, np.ndarray]]]:
+        """读取金字塔，结果不存在、版本不符或源文件已变化时返回None"""
+        path = self.path_for(video_id)
+        if not path.exists():
+            return None
+
+        signature = _source_signature(file_path)
+        with self._lock:
+            cached = self._cache.get(video_id)
+            if cached is not None and cached[0] == signature:
+                self._cache.move_to_end(video_id)
+                return cached[1]
+
+        try:
+            with np.load(path) as data:
+                if (int(data["version"]) != MOTION_ENERGY_VERSION
+                        or (int(data["file_size"]), float(data["mtime"])) != signature):
+                    return None
+                energy = data["energy"]
+        except Exception as e:
+            logger.warning(f"运动能量读取失败: {path}, {e}")
+            return None
+
+        pyramid = build_pyramid(energy)
+        with self._lock:
+            self._cache[video_id] = (signature, pyramid)
+            self._cache.move_to_end(video_id)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return pyramid
+
+    def invalidate(self, video_id: str):
+        with self._lock:
+            self._cache.pop(video_id, None)
+
+# 全局运动能量存储实例
+motion_energy_store = MotionEnergyStore()
@@ -0,0 +1,280 @@
+"""
+演员位置提取流水线
+
+按固定帧率顺序采样视频帧，在CPU上检测画面中的演员，取脚部着地点作为位置，
+再按视频的舞台标定映射到舞台编辑器坐标系（800x500）。视频按时间切成若干段，由进程池并行处理，
+每个工作进程独立解码自己负责的时间段（按批次解码并缩放采样帧），检测结果汇总后由多人跟踪器连接成轨迹。
+推理逐帧进行：MediaPipe PoseLandmarker和HOG都没有批量推理接口，并行度来自分段的进程池。
+
+检测器优先使用MediaPipe PoseLandmarker（多人姿态，取两踝中点作为着地点），
+模型文件不存在或mediapipe不可用时退回OpenCV HOG行人检测（取检测框底边中点）。
+"""
+
+import os
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from .executors import get_process_context
+from .tracker import MultiPersonTracker
+from .stage_calibration import image_to_stage
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# MediaPipe姿态模型（由setup_models.py下载）
+POSE_MODEL_PATH = "models/pose_landmarker_lite.task"
+
+# MediaPipe姿态关键点编号
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+@dataclass
+class PoseConfig:
+    """位置提取参数"""
+    sample_fps: float = 5.0          # 采样帧率
+    max_width: int = 640             # 推理前缩小到的最大宽度
+    batch_size: int = 16             # 每批解码的帧数
+    segment_seconds: float = 60.0    # 每个并行任务负责的时长
+    max_people: int = 8              # 单帧最多检测人数
+    min_score: float = 0.5           # 检测置信度阈值
+    workers: Optional[int] = None    # 未传入执行器时自建进程池的进程数，None表示CPU核数
+
+class PersonDetector:
+    """单帧多人检测，输出归一化坐标"""
+
+    def __init__(self, model_path: str = POSE_MODEL_PATH, max_people: int = 8, min_score: float = 0.5):
+        self.max_people = max_people
+        self.min_score = min_score
+        self.landmarker = None
+        self.hog = None
+
+        if Path(model_path).exists():
+            try:
+                import mediapipe as mp
+                from mediapipe.tasks import python as mp_tasks
+                from mediapipe.tasks.python import vision
+
+                options = vision.PoseLandmarkerOptions(
+                    base_options=mp_tasks.BaseOptions(model_asset_path=model_path),
+                    running_mode=vision.RunningMode.IMAGE,
+                    num_poses=max_people,
+                    min_pose_detection_confidence=min_score
+                )
+                self.landmarker = vision.PoseLandmarker.create_from_options(options)
+                self._mp = mp
+            except ImportError:
+                logger.warning("mediapipe未安装，使用HOG行人检测")
+            except Exception as e:
+                logger.warning(f"MediaPipe姿态模型加载失败，使用HOG行人检测: {e}")
+        else:
+            logger.warning(f"姿态模型不存在: {model_path}，使用HOG行人检测（可运行setup_models.py下载）")
+
+        if self.landmarker is None:
+            self.hog = cv2.HOGDescriptor()
+            self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    @property
+    def backend(self) -> str:
+        return "mediapipe" if self.landmarker is not None else "hog"
+
+    def detect(self, frame_rgb: np.ndarray) -> np.ndarray:
+        """
+        检测单帧中的演员
+
+        Returns:
+            形状(K, 7)的数组，每行为 x1, y1, x2, y2, foot_x, foot_y, score，坐标归一化到[0, 1]
+        """
+        if self.landmarker is not None:
+            return self._detect_pose(frame_rgb)
+        return self._detect_hog(frame_rgb)
+
+    def _detect_pose(self, frame_rgb: np.ndarray) -> np.ndarray:
+        image = self._mp.Image(image_format=self._mp.ImageFormat.SRGB, data=frame_rgb)
+        result = self.landmarker.detect(image)
+
+        detections = []
+        for landmarks in result.pose_landmarks:
+            points = np.array([(lm.x, lm.y, lm.visibility or 0.0) for lm in landmarks], dtype=np.float32)
+            x1, y1 = points[:, :2].min(axis=0)
+            x2, y2 = points[:, :2].max(axis=0)
+            ankles = points[[LEFT_ANKLE, RIGHT_ANKLE]]
+            if ankles[:, 2].max() >= 0.3:
+                # 取可见度更高的踝点加权
+                weights = ankles[:, 2] / ankles[:, 2].sum()
+                foot_x, foot_y = (ankles[:, :2] * weights[:, None]).sum(axis=0)
+            else:
+                # 脚部被遮挡时用关键点包围盒底边中点
+                foot_x, foot_y = (x1 + x2) / 2, y2
+            score = float(points[:, 2].mean())
+            detections.append((x1, y1, x2, y2, foot_x, foot_y, score))
+
+        return self._finalize(detections)
+
+    def _detect_hog(self, frame_rgb: np.ndarray) -> np.ndarray:
+        height, width = frame_rgb.shape[:2]
+        gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
+        boxes, weights = self.hog.detectMultiScale(gray, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        if len(boxes) == 0:
+            return np.empty((0, 7), dtype=np.float32)
+
+        boxes = np.asarray(boxes, dtype=np.float32)
+        # SVM距离转换为0~1的置信度
+        scores = 1.0 / (1.0 + np.exp(-np.asarray(weights, dtype=np.float32).reshape(-1)))
+        keep = cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(), self.min_score, 0.45)
+        keep = np.asarray(keep, dtype=np.int64).reshape(-1)
+
+        detections = []
+        for i in keep:
+            x, y, w, h = boxes[i]
+            x1, y1, x2, y2 = x / width, y / height, (x + w) / width, (y + h) / height
+            detections.append((x1, y1, x2, y2, (x1 + x2) / 2, y2, scores[i]))
+
+        return self._finalize(detections)
+
+    def _finalize(self, detections: List[tuple]) -> np.ndarray:
+        if not detections:
+            return np.empty((0, 7), dtype=np.float32)
+        result = np.clip(np.asarray(detections, dtype=np.float32), 0.0, 1.0)
+        result = result[result[:, 6] >= self.min_score]
+        order = np.argsort(-result[:, 6])[:self.max_people]
+        return result[order]
+
+# 工作进程内复用的检测器（模型只加载一次）
+_worker_detector: Optional[PersonDetector] = None
+
+def _get_worker_detector(config: PoseConfig) -> PersonDetector:
+    global _worker_detector
+    if _worker_detector is None:
+        _worker_detector = PersonDetector(max_people=config.max_people, min_score=config.min_score)
+    return _worker_detector
+
+def detect_segment(file_path: str, start_time: float, end_time: float,
+                   config: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    检测一个时间段内的所有采样帧（在工作进程中调用）
+
+    Returns:
+        timestamps: (F,) 采样帧时间戳
+        frame_ids: (M,) 每个检测所属的帧在timestamps中的下标
+        detections: (M, 7) 检测结果
+    """
+    from backend.core.video_processor import video_processor
+
+    config = PoseConfig(**config)
+    detector = _get_worker_detector(config)
+
+    timestamps = []
+    frame_ids = []
+    detections = []
+
+    # 检测期间单线程推理，避免进程间线程数超订；共享的CPU进程池还运行其他任务，结束后恢复原设置
+    previous_threads = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+    try:
+        for batch_timestamps, frames in video_processor.iter_frame_batches(
+            file_path,
+            sample_fps=config.sample_fps,
+            batch_size=config.batch_size,
+            max_width=config.max_width,
+            color="rgb",
+            start_time=start_time,
+            end_time=end_time
+        ):
+            for timestamp, frame in zip(batch_timestamps, frames):
+                frame_detections = detector.detect(frame)
+                frame_ids.append(np.full(len(frame_detections), len(timestamps), dtype=np.int64))
+                detections.append(frame_detections)
+                timestamps.append(timestamp)
+    finally:
+        cv2.setNumThreads(previous_threads)
+
+    return {
+        "timestamps": np.asarray(timestamps, dtype=np.float64),
+        "frame_ids": np.concatenate(frame_ids) if frame_ids else np.empty(0, dtype=np.int64),
+        "detections": np.concatenate(detections) if detections else np.empty((0, 7), dtype=np.float32)
+    }
+
+class ActorPositionPipeline:
+    """演员位置提取流水线"""
+
+    def __init__(self, config: Optional[PoseConfig] = None, tracker: Optional[MultiPersonTracker] = None):
+        self.config = config or PoseConfig()
+        self.tracker = tracker or MultiPersonTracker()
+
+    def run(self, file_path: str, duration: float,
+            progress_callback: Optional[Callable[[float, str], None]] = None,
+            calibration: Optional[List[List[float]]] = None,
+            executor: Optional[Executor] = None) -> List[Dict[str, np.ndarray]]:
+        """
+        提取整段视频的演员轨迹
+
+        Args:
+            file_path: 视频文件路径
+            duration: 视频时长（秒）
+            progress_callback: 进度回调 (0~1进度, 描述)
+            calibration: 舞台四角的归一化画面坐标，None表示整幅画面对应整个舞台
+            executor: 提交各段检测的进程池（通常为共享的CPU执行器），None时自建临时进程池
+
+        Returns:
+            轨迹列表（见MultiPersonTracker.track），points已映射为舞台坐标，
+            image_points保留归一化画面坐标
+        """
+        config = self.config
+        segment_count = max(1, int(np.ceil(duration / config.segment_seconds)))
+        bounds = np.linspace(0.0, duration, segment_count + 1)
+
+        logger.info(f"开始提取演员位置: {file_path}, {segment_count} 段")
+
+        own_executor = None
+        if executor is None:
+            workers = min(config.workers or os.cpu_count() or 1, segment_count)
+            executor = own_executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context())
+
+        results: List[Optional[Dict[str, np.ndarray]]] = [None] * segment_count
+        futures = {}
+        try:
+            for i in range(segment_count):
+                future = executor.submit(detect_segment, file_path, float(bounds[i]), float(bounds[i + 1]), asdict(config))
+                futures[future] = i
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                if progress_callback:
+                    progress_callback(done / segment_count, f"已完成 {done}/{segment_count} 段检测")
+        finally:
+            # 中途失败或进度回调抛出异常（如任务被取消）时，撤回尚未开始的分段
+            for future in futures:
+                future.cancel()
+            if own_executor is not None:
+                own_executor.shutdown()
+
+        # 合并各段结果
+        timestamps = []
+        frame_ids = []
+        detections = []
+        offset = 0
+        for result in results:
+            timestamps.append(result["timestamps"])
+            frame_ids.append(result["frame_ids"] + offset)
+            detections.append(result["detections"])
+            offset += len(result["timestamps"])
+
+        tracks = self.tracker.track(
+            np.concatenate(timestamps),
+            np.concatenate(frame_ids),
+            np.concatenate(detections)
+        )
+        for track in tracks:
+            track["image_points"] = track["points"]
+            track["points"] = image_to_stage(track["points"], calibration)
+
+        logger.info(f"演员位置提取完成: {offset} 帧, {len(tracks)} 条轨迹")
+        return tracks
+
+# 全局位置提取流水线实例
+actor_position_pipeline = ActorPositionPipeline()
@@ -0,0 +1,144 @@
+"""
+场景/镜头切换检测
+
+对缩小后的视频做一次顺序解码（VideoProcessor.iter_frame_batches），每个批次内用NumPy
+一次算出所有帧的HSV颜色直方图，相邻采样帧直方图的差异（总变差距离，0~1）超过阈值
+且明显高于近期平均差异时记为场景边界。灯光切换、换景、剪辑点都会产生这样的跳变，
+而演员走动只改变少量像素，差异很小。
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from .video_processor import video_processor
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SceneDetectionConfig:
+    """场景检测参数"""
+    sample_fps: float = 5.0          # 采样帧率
+    max_width: int = 160             # 解码后缩小到的最大宽度
+    batch_size: int = 64             # 每批帧数
+    hue_bins: int = 16               # 直方图各通道的分箱数
+    saturation_bins: int = 4
+    value_bins: int = 4
+    threshold: float = 0.3           # 直方图距离阈值
+    contrast: float = 3.0            # 距离须达到近期平均差异的倍数
+    window_seconds: float = 5.0      # 计算近期平均差异的窗口
+    min_scene_seconds: float = 2.0   # 最短场景时长
+
+def batch_histograms(frames_bgr: np.ndarray, config: SceneDetectionConfig) -> np.ndarray:
+    """
+    一批BGR帧的归一化HSV联合直方图
+
+    Args:
+        frames_bgr: (N, H, W, 3) uint8
+
+    Returns:
+        (N, hue_bins * saturation_bins * value_bins) float32，每行和为1
+    """
+    count, height, width = frames_bgr.shape[:3]
+    # 颜色转换逐像素进行，整批帧拼成一张图一次转换
+    hsv = cv2.cvtColor(frames_bgr.reshape(count * height, width, 3), cv2.COLOR_BGR2HSV)
+    hsv = hsv.reshape(count, height * width, 3)
+
+    # OpenCV的8位H范围是0~179
+    h = hsv[..., 0].astype(np.int32) * config.hue_bins // 180
+    s = hsv[..., 1].astype(np.int32) * config.saturation_bins // 256
+    v = hsv[..., 2].astype(np.int32) * config.value_bins // 256
+    bins = config.hue_bins * config.saturation_bins * config.value_bins
+    codes = (h * config.saturation_bins + s) * config.value_bins + v
+
+    # 每帧的分箱编号加上帧偏移，一次bincount得到整批直方图
+    codes += np.arange(count, dtype=np.int32)[:, None] * bins
+    histograms = np.bincount(codes.ravel(), minlength=count * bins).reshape(count, bins)
+    return histograms.astype(np.float32) / (height * width)
+
+def find_boundaries(timestamps: np.ndarray, distances: np.ndarray,
+                    config: SceneDetectionConfig) -> List[Dict[str, float]]:
+    """
+    根据相邻帧差异序列选出场景边界
+
+    Args:
+        timestamps: (F,) 采样帧时间戳
+        distances: (F,) 每帧与前一帧的直方图距离（第0帧为0）
+
+    Returns:
+        [{timestamp, score}]，timestamp为新场景第一帧的时间
+    """
+    if len(distances) < 2:
+        return []
+
+    # 近期平均差异（不含当前帧），用累积和一次算出所有滑动窗口均值
+    step = np.median(np.diff(timestamps)) if len(timestamps) > 1 else 1.0
+    window = max(1, int(round(config.window_seconds / max(step, 1e-6))))
+    cumulative = np.concatenate([[0.0], np.cumsum(distances, dtype=np.float64)])
+    index = np.arange(len(distances))
+    start = np.maximum(index - window, 0)
+    baseline = (cumulative[index] - cumulative[start]) / np.maximum(index - start, 1)
+
+    candidates = np.flatnonzero(
+        (distances >= config.threshold) & (distances >= config.contrast * baseline)
+    )
+
+    boundaries = []
+    last_time = timestamps[0]
+    for i in candidates:
+        if timestamps[i] - last_time < config.min_scene_seconds:
+            # 距上一个边界太近：保留差异更大的那个
+            if boundaries and distances[i] > boundaries[-1]["score"]:
+                boundaries[-1] = {"timestamp": float(timestamps[i]), "score": float(distances[i])}
+                last_time = timestamps[i]
+            continue
+        boundaries.append({"timestamp": float(timestamps[i]), "score": float(distances[i])})
+        last_time = timestamps[i]
+
+    return boundaries
+
+def detect_scenes(file_path: str, config: Optional[SceneDetectionConfig] = None) -> Dict[str, Any]:
+    """
+    检测视频中的场景边界
+
+    Returns:
+        boundaries: [{timestamp, score}]
+        frames: 参与比较的采样帧数
+    """
+    config = config or SceneDetectionConfig()
+    logger.info(f"开始场景检测: {file_path}")
+
+    timestamps = []
+    distances = []
+    previous = None
+
+    for batch_timestamps, frames in video_processor.iter_frame_batches(
+        file_path,
+        sample_fps=config.sample_fps,
+        batch_size=config.batch_size,
+        max_width=config.max_width,
+        color="bgr"
+    ):
+        histograms = batch_histograms(frames, config)
+        # 与上一批最后一帧衔接，保证批次边界处的差异也被计算
+        if previous is None:
+            previous = histograms[:1]
+        chained = np.concatenate([previous, histograms])
+        distances.append(0.5 * np.abs(np.diff(chained, axis=0)).sum(axis=1))
+        timestamps.append(batch_timestamps)
+        previous = histograms[-1:]
+
+    if not timestamps:
+        return {"boundaries": [], "frames": 0}
+
+    timestamps = np.concatenate(timestamps)
+    distances = np.concatenate(distances)
+    boundaries = find_boundaries(timestamps, distances, config)
+
+    logger.info(f"场景检测完成: {len(timestamps)} 帧, {len(boundaries)} 个场景边界")
+    return {"boundaries": boundaries, "frames": len(timestamps)}
@@ -0,0 +1,105 @@
+"""
+共享内存音频
+
+解码后的音频（两小时16kHz单声道约440MB）放入multiprocessing.shared_memory交给ASR工作进程，
+任务参数里只有共享内存块的名字和长度，不再把整段数组pickle后经管道传输。
+
+创建方（API进程）拥有共享内存块，识别结束后release删除；工作进程attach_audio只映射、不复制，
+用完后关闭映射。
+"""
+
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterator, Optional
+
+import numpy as np
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class SharedAudioRef:
+    """传给工作进程的共享内存音频引用（可pickle）"""
+    name: str
+    length: int           # 采样数
+    sample_rate: int
+    offset: int = 0       # 在共享内存块中的起始采样
+
+    def slice(self, start: int, end: int) -> "SharedAudioRef":
+        """同一共享内存块中[start, end)采样的引用（不复制），用于分块并行识别"""
+        start = max(0, min(start, self.length))
+        end = max(start, min(end, self.length))
+        return SharedAudioRef(self.name, end - start, self.sample_rate, self.offset + start)
+
+class SharedAudio:
+    """API进程中持有的共享内存音频块"""
+
+    def __init__(self, memory: shared_memory.SharedMemory, length: int, sample_rate: int):
+        self._memory: Optional[shared_memory.SharedMemory] = memory
+        self.ref = SharedAudioRef(memory.name, length, sample_rate)
+
+    @classmethod
+    def create(cls, data: np.ndarray, sample_rate: int) -> "SharedAudio":
+        """把一维float32音频复制进新的共享内存块"""
+        data = np.asarray(data, dtype=np.float32)
+        memory = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+        np.ndarray(data.shape, dtype=np.float32, buffer=memory.buf)[:] = data
+        return cls(memory, len(data), sample_rate)
+
+    @property
+    def data(self) -> np.ndarray:
+        """创建方进程中的只读数组视图（release后不可再用）"""
+        if self._memory is None:
+            raise ValueError("共享内存音频已释放")
+        data = np.ndarray((self.ref.length,), dtype=np.float32, buffer=self._memory.buf)
+        data.flags.writeable = False
+        return data
+
+    def release(self):
+        """关闭并删除共享内存块"""
+        if self._memory is not None:
+            memory, self._memory = self._memory, None
+            memory.unlink()
+            try:
+                memory.close()
+            except BufferError:
+                # 仍有data视图未回收，映射在视图回收时释放
+                logger.warning(f"共享内存音频仍被引用，延迟关闭: {self.ref.name}")
+
+    def __enter__(self) -> "SharedAudio":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+def ensure_resource_tracker():
+    """
+    在创建工作进程之前启动resource_tracker
+
+    工作进程attach时Python会把共享内存块登记到resource_tracker。工作进程与创建方共用同一个
+    resource_tracker时重复登记无影响；否则工作进程会启动自己的tracker，并在退出时删除仍在使用的共享内存块。
+    """
+    resource_tracker.ensure_running()
+
+@contextmanager
+def attach_audio(ref: SharedAudioRef) -> Iterator[np.ndarray]:
+    """
+    在工作进程中映射共享内存音频（只读，不复制）
+
+    退出时关闭映射，使用方不能在退出后继续持有数组。
+    """
+    memory = shared_memory.SharedMemory(name=ref.name)
+    data = np.ndarray((ref.length,), dtype=np.float32, buffer=memory.buf, offset=ref.offset * 4)
+    data.flags.writeable = False
+    try:
+        yield data
+    finally:
+        del data
+        try:
+            memory.close()
+        except BufferError:
+            # 仍有数组引用该内存（如被模型内部缓存），映射在对象回收时释放
+            logger.warning(f"共享内存音频仍被引用，延迟关闭: {ref.name}")
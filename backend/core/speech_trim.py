@@ -0,0 +1,158 @@
+"""
+识别前去除静音和非语音段
+
+排练录音中有大段走位、换景和静音。识别前按帧能量（NumPy分帧，向量化计算）找出语音区间，
+前后各留padding后拼接成一段较短的音频交给模型，识别结果中的时间戳再映射回原始时间轴。
+
+- 阈值：噪声底（能量的10%分位）加margin_db，且不高于语音电平（95%分位）以下speech_margin_db，
+  整段都是语音时不会把语音当成噪声
+- 短于min_silence_ms的停顿并入语音，短于min_speech_ms的能量突起（敲击、脚步）丢弃
+- 跳过比例低于min_skipped时不裁剪，省去一次复制
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio_chunking import frame_energy_db
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRIM_ENABLED = os.environ.get("AI_STAGE_ASR_TRIM_SILENCE", "1") != "0"
+
+@dataclass
+class SpeechTrimConfig:
+    """语音区间检测参数"""
+    frame_ms: float = 20.0
+    noise_percentile: float = 10.0   # 噪声底分位数
+    margin_db: float = 12.0          # 阈值高于噪声底的分贝数
+    speech_percentile: float = 95.0  # 语音电平分位数
+    speech_margin_db: float = 30.0   # 阈值最多低于语音电平的分贝数
+    min_db: float = -60.0            # 低于此电平一律视为静音
+    min_silence_ms: float = 800.0    # 更短的停顿并入语音
+    min_speech_ms: float = 200.0     # 更短的能量突起丢弃
+    padding_ms: float = 300.0        # 语音区间前后保留
+    min_skipped: float = 0.05        # 跳过比例低于此值时不裁剪
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """布尔序列中连续True段的 (起点, 终点)（帧下标，终点不含）"""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def speech_regions(data: np.ndarray, sample_rate: int,
+                   config: Optional[SpeechTrimConfig] = None) -> List[Tuple[int, int]]:
+    """
+    语音区间（采样下标，已加padding并合并重叠）
+
+    Returns:
+        [(start, end), ...]，按时间排序、互不重叠
+    """
+    config = config or SpeechTrimConfig()
+    energy = frame_energy_db(data, sample_rate, config.frame_ms)
+    if len(energy) == 0:
+        return []
+
+    noise_floor, speech_level = np.percentile(energy, [config.noise_percentile, config.speech_percentile])
+    threshold = max(min(noise_floor + config.margin_db, speech_level - config.speech_margin_db), config.min_db)
+    speech = energy > threshold
+
+    # 填平短停顿
+    frames_per_ms = 1 / config.frame_ms
+    starts, ends = _runs(~speech)
+    short = (ends - starts) < config.min_silence_ms * frames_per_ms
+    inner = (starts > 0) & (ends < len(speech))
+    for start, end in zip(starts[short & inner], ends[short & inner]):
+        speech[start:end] = True
+
+    # 丢弃短突起
+    starts, ends = _runs(speech)
+    keep = (ends - starts) >= config.min_speech_ms * frames_per_ms
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return []
+
+    # 加padding后合并重叠区间
+    frame = max(1, int(sample_rate * config.frame_ms / 1000))
+    padding = int(config.padding_ms * sample_rate / 1000)
+    starts = np.maximum(starts * frame - padding, 0)
+    ends = np.minimum(ends * frame + padding, len(data))
+    regions = [(int(starts[0]), int(ends[0]))]
+    for start, end in zip(starts[1:], ends[1:]):
+        if start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], int(end))
+        else:
+            regions.append((int(start), int(end)))
+    return regions
+
+class TimeMap:
+    """拼接后音频时间 → 原始音频时间（毫秒）"""
+
+    def __init__(self, regions: List[Tuple[int, int]], sample_rate: int):
+        lengths = np.array([end - start for start, end in regions], dtype=np.int64)
+        self.sample_rate = sample_rate
+        self.original_ms = np.array([start for start, _ in regions], dtype=np.float64) * 1000 / sample_rate
+        self.compact_ms = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.float64) * 1000 / sample_rate
+
+    def map_ms(self, value: float, end: bool = False) -> int:
+        """映射一个时间点；end=True时区间终点落在拼接处的归入前一个区间"""
+        side = "left" if end else "right"
+        index = max(int(np.searchsorted(self.compact_ms, value, side=side)) - 1, 0)
+        return int(round(self.original_ms[index] + value - self.compact_ms[index]))
+
+    def map_pairs(self, pairs: List[List[float]]) -> List[List[int]]:
+        return [[self.map_ms(begin), self.map_ms(end, end=True)] for begin, end in pairs]
+
+    def map_sentence(self, sentence: Dict[str, Any]) -> Dict[str, Any]:
+        """映射一个句子的start、end和逐字时间戳（返回新字典）"""
+        mapped = dict(sentence)
+        if mapped.get("start") is not None:
+            mapped["start"] = self.map_ms(mapped["start"])
+        if mapped.get("end") is not None:
+            mapped["end"] = self.map_ms(mapped["end"], end=True)
+        if mapped.get("timestamp"):
+            mapped["timestamp"] = self.map_pairs(mapped["timestamp"])
+        return mapped
+
+    def map_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """映射识别结果中的句子和逐字时间戳（返回新字典，srt由调用方重新生成）"""
+        mapped = dict(result)
+        mapped["sentences"] = [self.map_sentence(sentence) for sentence in result.get("sentences") or []]
+        mapped["timestamp"] = self.map_pairs(result.get("timestamp") or [])
+        return mapped
+
+def compact_audio(data: np.ndarray, regions: List[Tuple[int, int]]) -> np.ndarray:
+    """把语音区间拼接成一段float32音频"""
+    compact = np.empty(sum(end - start for start, end in regions), dtype=np.float32)
+    position = 0
+    for start, end in regions:
+        compact[position:position + end - start] = data[start:end]
+        position += end - start
+    return compact
+
+def plan_trim(data: np.ndarray, sample_rate: int,
+              config: Optional[SpeechTrimConfig] = None) -> Tuple[Optional[List[Tuple[int, int]]], Dict[str, float]]:
+    """
+    检测语音区间并决定是否裁剪
+
+    Returns:
+        (语音区间，不裁剪时为None, 统计：总时长、语音时长、跳过比例)
+    """
+    config = config or SpeechTrimConfig()
+    total = len(data)
+    regions = speech_regions(data, sample_rate, config)
+    speech = sum(end - start for start, end in regions)
+    skipped = 1 - speech / total if total else 0.0
+    statistics = {
+        "total_seconds": round(total / sample_rate, 2),
+        "speech_seconds": round(speech / sample_rate, 2),
+        "skipped_fraction": round(skipped, 4)
+    }
+    if not regions or skipped < config.min_skipped:
+        statistics.update(speech_seconds=statistics["total_seconds"], skipped_fraction=0.0)
+        return None, statistics
+    return regions, statistics
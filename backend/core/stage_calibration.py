@@ -0,0 +1,97 @@
+"""
+画面坐标到舞台坐标的标定
+
+每个视频可标定舞台四个角在画面中的位置（归一化画面坐标，顺序为左上、右上、右下、左下，
+对应舞台编辑器画布800x500的四个角），由此计算透视变换（单应矩阵）。
+单应矩阵按标定点缓存，只计算一次；变换以NumPy对整组坐标一次完成。
+未标定时整幅画面线性对应整个舞台。
+"""
+
+import logging
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from backend.models.data_models import ActorTrack
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 舞台编辑器画布尺寸
+STAGE_WIDTH, STAGE_HEIGHT = 800, 500
+
+# 舞台四角在画布上的坐标（左上、右上、右下、左下）
+STAGE_CORNERS = np.array(
+    [[0, 0], [STAGE_WIDTH, 0], [STAGE_WIDTH, STAGE_HEIGHT], [0, STAGE_HEIGHT]],
+    dtype=np.float32
+)
+
+# 未标定时的默认变换：按画布尺寸缩放
+DEFAULT_HOMOGRAPHY = np.diag([STAGE_WIDTH, STAGE_HEIGHT, 1.0])
+DEFAULT_HOMOGRAPHY.setflags(write=False)
+
+@lru_cache(maxsize=256)
+def _compute_homography(corners: Tuple[Tuple[float, float], ...]) -> np.ndarray:
+    homography = cv2.getPerspectiveTransform(np.array(corners, dtype=np.float32), STAGE_CORNERS)
+    homography.setflags(write=False)
+    return homography
+
+def get_homography(calibration: Optional[Sequence[Sequence[float]]]) -> np.ndarray:
+    """
+    获取标定对应的单应矩阵（归一化画面坐标 -> 舞台坐标）
+
+    Args:
+        calibration: 舞台四角的归一化画面坐标，None表示未标定
+
+    Returns:
+        3x3只读矩阵，相同标定点复用缓存结果
+    """
+    if not calibration:
+        return DEFAULT_HOMOGRAPHY
+    return _compute_homography(tuple((float(x), float(y)) for x, y in calibration))
+
+def image_to_stage(points: np.ndarray, calibration: Optional[Sequence[Sequence[float]]] = None) -> np.ndarray:
+    """
+    将一组归一化画面坐标映射为舞台坐标
+
+    Args:
+        points: (N, 2) 归一化画面坐标
+        calibration: 舞台四角的归一化画面坐标，None表示整幅画面对应整个舞台
+
+    Returns:
+        (N, 2) 舞台坐标
+    """
+    homography = get_homography(calibration)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    projected = points @ homography[:, :2].T + homography[:, 2]
+    return projected[:, :2] / projected[:, 2:3]
+
+def reproject_tracks(tracks: List[ActorTrack], calibration: Optional[Sequence[Sequence[float]]]) -> int:
+    """
+    按新的标定重新计算轨迹的舞台坐标（原地修改，不重新检测）
+
+    所有轨迹的画面坐标拼接后一次变换。没有画面坐标的旧轨迹保持不变。
+
+    Returns:
+        重新投影的轨迹数
+    """
+    tracks = [track for track in tracks if track.image_x is not None and track.image_y is not None]
+    if not tracks:
+        return 0
+
+    image_points = np.column_stack([
+        np.concatenate([track.image_x for track in tracks]),
+        np.concatenate([track.image_y for track in tracks])
+    ])
+    stage_points = np.round(image_to_stage(image_points, calibration), 1)
+
+    offsets = np.cumsum([0] + [len(track.image_x) for track in tracks])
+    for track, start, end in zip(tracks, offsets[:-1], offsets[1:]):
+        track.x = stage_points[start:end, 0].tolist()
+        track.y = stage_points[start:end, 1].tolist()
+
+    logger.info(f"重新投影 {len(tracks)} 条轨迹, {len(image_points)} 个位置点")
+    return len(tracks)
@@ -0,0 +1,228 @@
+"""
+缩略图缓存 - 内存LRU + 磁盘两级缓存
+
+缓存键为 (video_id, 源文件版本, 时间桶, 宽度)：同一时间桶内的请求共享一张缩略图，
+不同时间戳/宽度的缩略图使用不同文件，并发请求不会互相覆盖。
+源文件版本由读取的文件（代理或原文件）路径、修改时间和大小计算，重新上传或重新生成代理后
+旧的缩略图不再命中（ETag也随之改变），由LRU淘汰。
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, int, int]  # (video_id, 源文件版本, 时间桶, 宽度)
+
+def source_version(file_path: str) -> str:
+    """源文件版本：路径、修改时间和大小的摘要，文件不存在时为空"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return ""
+    payload = f"{Path(file_path).resolve()}:{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+class ThumbnailCache:
+    """按字节预算淘汰的两级缩略图缓存"""
+
+    # 时间桶长度（秒）
+    BUCKET_SECONDS = 0.5
+    # 内存层预算 (32MB)
+    MEMORY_BUDGET = 32 * 1024 * 1024
+    # 磁盘层预算 (512MB)
+    DISK_BUDGET = 512 * 1024 * 1024
+
+    def __init__(self, cache_dir: str = "temp/thumbnails",
+                 memory_budget: int = MEMORY_BUDGET, disk_budget: int = DISK_BUDGET):
+        self.cache_dir = Path(cache_dir)
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+
+        self._memory: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None  # 首次写盘时统计
+        self._lock = threading.Lock()
+        self._key_locks: Dict[CacheKey, threading.Lock] = {}
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def make_key(self, video_id: str, timestamp: float, width: int, source: Optional[str] = None) -> CacheKey:
+        """计算缓存键（source: 生成缩略图读取的文件，用于计算源文件版本）"""
+        bucket = int(round(max(timestamp, 0.0) / self.BUCKET_SECONDS))
+        return video_id, source_version(source) if source else "", bucket, int(width)
+
+    def bucket_timestamp(self, key: CacheKey) -> float:
+        """缓存键对应的实际取帧时间"""
+        return key[2] * self.BUCKET_SECONDS
+
+    def etag(self, key: CacheKey) -> str:
+        """缓存键对应的HTTP ETag"""
+        video_id, version, bucket, width = key
+        return f'"{video_id}-{version}-{bucket}-{width}"'
+
+    def _disk_path(self, key: CacheKey) -> Path:
+        video_id, version, bucket, width = key
+        suffix = f"_{version}" if version else ""
+        return self.cache_dir / video_id / f"{bucket:08d}_w{width}{suffix}.jpg"
+
+    # 内存层
+
+    def _memory_get(self, key: CacheKey) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            return data
+
+    def _memory_put(self, key: CacheKey, data: bytes):
+        if len(data) > self.memory_budget:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_budget:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # 磁盘层
+
+    def _disk_get(self, key: CacheKey) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # 更新mtime作为磁盘层的LRU时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _disk_put(self, key: CacheKey, data: bytes):
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 先写同目录临时文件再原子替换，读者不会看到写了一半的图片
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_usage()
+            else:
+                self._disk_bytes += len(data)
+            over_budget = self._disk_bytes > self.disk_budget
+
+        if over_budget:
+            self._evict_disk()
+
+    def _scan_disk_usage(self) -> int:
+        if not self.cache_dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.cache_dir.rglob("*.jpg"))
+
+    def _evict_disk(self):
+        """按mtime从旧到新删除，直到降到预算的90%"""
+        files = []
+        for path in self.cache_dir.rglob("*.jpg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        target = int(self.disk_budget * 0.9)
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._disk_bytes = total
+        logger.info(f"缩略图磁盘缓存淘汰 {removed} 个文件，当前占用 {total / (1024 * 1024):.1f}MB")
+
+    # 对外接口
+
+    def get_or_create(self, key: CacheKey, render: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """
+        获取缩略图，未命中时调用render生成并写入两级缓存
+
+        同一个键的并发请求只会渲染一次。
+        """
+        data = self._memory_get(key)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                # 等锁期间可能已被其他请求生成
+                data = self._memory_get(key)
+                if data is not None:
+                    self.hits += 1
+                    return data
+
+                data = self._disk_get(key)
+                if data is not None:
+                    self.disk_hits += 1
+                    self._memory_put(key, data)
+                    return data
+
+                self.misses += 1
+                data = render()
+                if data is not None:
+                    self._memory_put(key, data)
+                    try:
+                        self._disk_put(key, data)
+                    except Exception as e:
+                        logger.warning(f"缩略图写入磁盘缓存失败: {e}")
+                return data
+        finally:
+            # 命中、渲染失败时同样移除；只移除自己用的锁（可能已被后来的请求替换）
+            with self._lock:
+                if self._key_locks.get(key) is key_lock:
+                    del self._key_locks[key]
+
+    def get_statistics(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes or 0,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses
+            }
+
+# 全局缩略图缓存实例
+thumbnail_cache = ThumbnailCache()
@@ -0,0 +1,283 @@
+"""
+多人跟踪 - 为逐帧检测分配稳定的演员ID
+
+每条轨迹用匀速卡尔曼滤波预测着地点位置，预测框与检测框的IoU和着地点距离组成代价矩阵，
+用匈牙利算法做全局最优匹配。所有轨迹的预测和更新都以NumPy批量完成。
+短暂遮挡时轨迹保持存活，结束后对缺失的采样时刻做线性插值。
+遮挡或离场超过max_age时轨迹会断成几段，结束后再按首尾的时间和位置把片段连接成同一名演员的轨迹
+（片段之间的空档不插值）。
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class TrackerConfig:
+    """跟踪参数（坐标均为归一化画面坐标）"""
+    max_age: float = 2.0          # 未匹配多久（秒）后结束轨迹
+    min_hits: int = 5             # 确认轨迹所需的最少检测次数
+    max_distance: float = 0.1     # 预测位置与检测着地点的最大距离
+    iou_weight: float = 0.5       # 代价中IoU项的权重，其余为距离项
+    process_noise: float = 1e-3   # 过程噪声（速度变化）
+    measurement_noise: float = 1e-4
+    interpolated_confidence: float = 0.5  # 插值点置信度相对相邻检测的比例
+    link_gap: float = 10.0        # 片段连接：前一段结束到后一段开始的最长间隔（秒）
+    link_distance: float = 0.2    # 片段连接：前一段终点与后一段起点的最大距离
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """两组 x1,y1,x2,y2 框两两之间的IoU，形状(A, B)"""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-12), 0.0)
+
+class MultiPersonTracker:
+    """卡尔曼+匈牙利多目标跟踪器"""
+
+    def __init__(self, config: TrackerConfig = None):
+        self.config = config or TrackerConfig()
+
+    def track(self, timestamps: np.ndarray, frame_ids: np.ndarray,
+              detections: np.ndarray) -> List[Dict[str, np.ndarray]]:
+        """
+        将逐帧检测连接成轨迹
+
+        Args:
+            timestamps: (F,) 采样帧时间戳
+            frame_ids: (M,) 每个检测所属帧在timestamps中的下标
+            detections: (M, 7) 每行为 x1, y1, x2, y2, foot_x, foot_y, score
+
+        Returns:
+            按起始时间排序的轨迹列表，每条包含 timestamps (n,), points (n, 2), scores (n,)，
+            其中缺失的采样时刻已插值补齐
+        """
+        config = self.config
+
+        # 卡尔曼状态 [x, y, vx, vy]，所有活动轨迹的状态堆叠在一起
+        states = np.empty((0, 4))
+        covariances = np.empty((0, 4, 4))
+        boxes = np.empty((0, 4))          # 最近一次匹配到的检测框
+        last_seen = np.empty(0)           # 最近一次匹配的时间
+        track_ids = np.empty(0, dtype=np.int64)
+        history: List[Dict[str, list]] = []
+
+        H = np.array([[1.0, 0, 0, 0], [0, 1.0, 0, 0]])
+        R = np.eye(2) * config.measurement_noise
+
+        # 检测按帧排序后用切片取每帧的检测
+        order = np.argsort(frame_ids, kind="stable")
+        frame_ids, detections = frame_ids[order], detections[order]
+        starts = np.searchsorted(frame_ids, np.arange(len(timestamps)), side="left")
+        ends = np.searchsorted(frame_ids, np.arange(len(timestamps)), side="right")
+
+        previous_time = None
+        for frame_index, timestamp in enumerate(timestamps):
+            frame_detections = detections[starts[frame_index]:ends[frame_index]]
+
+            # 预测
+            if len(states) and previous_time is not None:
+                dt = timestamp - previous_time
+                F = np.array([[1, 0, dt, 0], [0, 1, 0, dt], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=np.float64)
+                Q = np.diag([0.25 * dt ** 4, 0.25 * dt ** 4, dt ** 2, dt ** 2]) * config.process_noise
+                displacement = states[:, 2:] * dt
+                states = states @ F.T
+                covariances = F @ covariances @ F.T + Q
+                boxes = boxes + np.tile(displacement, 2)
+            previous_time = timestamp
+
+            matched_tracks = np.empty(0, dtype=np.int64)
+            matched_detections = np.empty(0, dtype=np.int64)
+
+            if len(states) and len(frame_detections):
+                distances = np.linalg.norm(states[:, None, :2] - frame_detections[None, :, 4:6], axis=2)
+                iou = box_iou(boxes, frame_detections[:, :4])
+                cost = config.iou_weight * (1 - iou) + (1 - config.iou_weight) * distances / config.max_distance
+                cost[distances > config.max_distance] = 1e6
+
+                rows, cols = linear_sum_assignment(cost)
+                valid = cost[rows, cols] < 1e6
+                matched_tracks, matched_detections = rows[valid], cols[valid]
+
+            # 更新匹配到的轨迹
+            if len(matched_tracks):
+                measurements = frame_detections[matched_detections, 4:6]
+                P = covariances[matched_tracks]
+                S = H @ P @ H.T + R
+                K = P @ H.T @ np.linalg.inv(S)
+                innovation = measurements - states[matched_tracks] @ H.T
+                states[matched_tracks] += np.einsum("nij,nj->ni", K, innovation)
+                covariances[matched_tracks] = (np.eye(4) - K @ H) @ P
+                boxes[matched_tracks] = frame_detections[matched_detections, :4]
+                last_seen[matched_tracks] = timestamp
+
+                for t, d in zip(matched_tracks, matched_detections):
+                    record = history[track_ids[t]]
+                    record["timestamps"].append(timestamp)
+                    record["points"].append(frame_detections[d, 4:6])
+                    record["scores"].append(frame_detections[d, 6])
+
+            # 未匹配的检测新建轨迹
+            unmatched = np.setdiff1d(np.arange(len(frame_detections)), matched_detections)
+            if len(unmatched):
+                new = frame_detections[unmatched]
+                new_states = np.zeros((len(new), 4))
+                new_states[:, :2] = new[:, 4:6]
+                new_covariances = np.tile(np.diag([config.measurement_noise] * 2 + [1e-2] * 2), (len(new), 1, 1))
+                states = np.concatenate([states, new_states])
+                covariances = np.concatenate([covariances, new_covariances])
+                boxes = np.concatenate([boxes, new[:, :4]])
+                last_seen = np.concatenate([last_seen, np.full(len(new), timestamp)])
+                track_ids = np.concatenate([track_ids, np.arange(len(history), len(history) + len(new))])
+                for detection in new:
+                    history.append({
+                        "timestamps": [timestamp],
+                        "points": [detection[4:6]],
+                        "scores": [detection[6]]
+                    })
+
+            # 结束长时间未匹配的轨迹
+            alive = timestamp - last_seen <= config.max_age
+            if not alive.all():
+                states, covariances, boxes = states[alive], covariances[alive], boxes[alive]
+                last_seen, track_ids = last_seen[alive], track_ids[alive]
+
+        confirmed = [record for record in history if len(record["timestamps"]) >= config.min_hits]
+        confirmed.sort(key=lambda record: record["timestamps"][0])
+        tracks = [
+            self._concatenate([self._interpolate(confirmed[i], timestamps) for i in chain])
+            for chain in self._link_fragments(confirmed)
+        ]
+        tracks.sort(key=lambda track: track["timestamps"][0])
+
+        logger.info(f"跟踪完成: {len(history)} 条候选轨迹, {len(confirmed)} 条确认片段, {len(tracks)} 条轨迹")
+        return tracks
+
+    def _link_fragments(self, records: List[Dict[str, list]]) -> List[List[int]]:
+        """
+        把同一人断开的轨迹片段连接起来
+
+        后一段在前一段结束后link_gap秒内开始、起点与前一段终点的距离不超过link_distance时可以连接，
+        所有候选按距离用匈牙利算法一次匹配（每段最多一个前驱和一个后继）。
+
+        Returns:
+            按起始时间排序的片段下标链
+        """
+        config = self.config
+        if len(records) < 2:
+            return [[i] for i in range(len(records))]
+
+        starts = np.array([record["timestamps"][0] for record in records])
+        ends = np.array([record["timestamps"][-1] for record in records])
+        start_points = np.array([record["points"][0] for record in records], dtype=np.float64)
+        end_points = np.array([record["points"][-1] for record in records], dtype=np.float64)
+
+        # 行为前一段，列为后一段
+        gaps = starts[None, :] - ends[:, None]
+        distances = np.linalg.norm(end_points[:, None, :] - start_points[None, :, :], axis=2)
+        cost = distances.copy()
+        cost[(gaps <= 0) | (gaps > config.link_gap) | (distances > config.link_distance)] = 1e6
+
+        rows, cols = linear_sum_assignment(cost)
+        valid = cost[rows, cols] < 1e6
+        successors = dict(zip(rows[valid].tolist(), cols[valid].tolist()))
+        linked = set(successors.values())
+
+        chains = []
+        for first in np.argsort(starts, kind="stable").tolist():
+            if first in linked:
+                continue
+            chain = [first]
+            while chain[-1] in successors:
+                chain.append(successors[chain[-1]])
+            chains.append(chain)
+        return chains
+
+    @staticmethod
+    def _concatenate(fragments: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        if len(fragments) == 1:
+            return fragments[0]
+        return {key: np.concatenate([fragment[key] for fragment in fragments]) for key in fragments[0]}
+
+    def _interpolate(self, record: Dict[str, list], timestamps: np.ndarray) -> Dict[str, np.ndarray]:
+        """在轨迹首末检测之间，对缺失的采样时刻做线性插值"""
+        observed_times = np.asarray(record["timestamps"], dtype=np.float64)
+        points = np.asarray(record["points"], dtype=np.float64)
+        scores = np.asarray(record["scores"], dtype=np.float64)
+
+        grid = timestamps[(timestamps >= observed_times[0]) & (timestamps <= observed_times[-1])]
+        observed = np.isin(grid, observed_times)
+
+        interpolated_scores = np.interp(grid, observed_times, scores)
+        interpolated_scores[~observed] *= self.config.interpolated_confidence
+
+        return {
+            "timestamps": grid,
+            "points": np.stack([
+                np.interp(grid, observed_times, points[:, 0]),
+                np.interp(grid, observed_times, points[:, 1])
+            ], axis=1).astype(np.float32),
+            "scores": interpolated_scores.astype(np.float32)
+        }
+
+def match_previous_tracks(tracks: List[Dict[str, Any]], previous: List[Dict[str, Any]],
+                          max_distance: float = 0.1, min_overlap: float = 0.3,
+                          time_tolerance: float = 0.05) -> List[Optional[int]]:
+    """
+    重新处理视频时，为新轨迹找出之前结果中对应的轨迹（沿用原来的演员）
+
+    只比较时间上重合的采样点（与最近的旧采样相差不超过time_tolerance秒），
+    以重合点上的平均距离为代价做匈牙利匹配；重合点数少于较短一方的min_overlap，
+    或平均距离超过max_distance的不匹配。
+
+    Args:
+        tracks: 新轨迹，timestamps (n,) 和 points (n, 2)
+        previous: 旧轨迹，格式同上（timestamps升序，同一演员的多段可合并为一条）
+
+    Returns:
+        每条新轨迹对应的previous下标，None表示没有对应的旧轨迹
+    """
+    matches: List[Optional[int]] = [None] * len(tracks)
+    if not tracks or not previous:
+        return matches
+
+    cost = np.full((len(tracks), len(previous)), 1e6)
+    for j, old in enumerate(previous):
+        old_times = np.asarray(old["timestamps"], dtype=np.float64)
+        old_points = np.asarray(old["points"], dtype=np.float64)
+        if len(old_times) == 0:
+            continue
+        for i, track in enumerate(tracks):
+            times = np.asarray(track["timestamps"], dtype=np.float64)
+            # 每个新采样时刻最近的旧采样
+            right = np.clip(np.searchsorted(old_times, times), 0, len(old_times) - 1)
+            left = np.maximum(right - 1, 0)
+            nearest = np.where(np.abs(old_times[left] - times) < np.abs(old_times[right] - times), left, right)
+            overlap = np.abs(old_times[nearest] - times) <= time_tolerance
+            if not overlap.any() or overlap.sum() < min_overlap * min(len(times), len(old_times)):
+                continue
+            points = np.asarray(track["points"], dtype=np.float64)[overlap]
+            distance = float(np.linalg.norm(points - old_points[nearest[overlap]], axis=1).mean())
+            if distance <= max_distance:
+                cost[i, j] = distance
+
+    rows, cols = linear_sum_assignment(cost)
+    for i, j in zip(rows, cols):
+        if cost[i, j] < 1e6:
+            matches[i] = int(j)
+    return matches
+
+# 全局跟踪器实例
+multi_person_tracker = MultiPersonTracker()
@@ -0,0 +1,203 @@
+"""
+识别结果缓存 - 磁盘缓存，按字节预算淘汰
+
+缓存键为 解码后音频（16kHz单声道float32）的sha256 + 识别参数（语言、说话人分离、热词及该语言的模型配置）。
+重新上传同一段录音、修改元数据后重新转录时直接返回上次的识别结果，不再运行FunASR。
+
+另外记录 上传文件内容的sha256 → 音频sha256 的映射，同一个文件再次识别时不必先用ffmpeg解码整段音频。
+缓存值为识别结果的JSON（text、srt、sentences、raw_text、timestamp、speech_trim）。
+
+磁盘预算可用环境变量 AI_STAGE_TRANSCRIPT_CACHE_MB（默认256）配置。
+"""
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .asr_config import asr_config
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def file_digest(file_path: str) -> str:
+    """文件内容的sha256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def audio_digest(data: np.ndarray) -> str:
+    """解码后音频采样的sha256"""
+    return hashlib.sha256(np.ascontiguousarray(data, dtype=np.float32)).hexdigest()
+
+def params_digest(language: str = "zh", enable_speaker_diarization: bool = False, hotwords: str = "") -> str:
+    """识别参数（含模型配置，换模型后旧结果不再命中）的摘要"""
+    params = asr_config.get_recognition_params(language, enable_speaker_diarization, hotwords)
+    params.pop("cache", None)
+    payload = json.dumps(
+        {"models": asr_config.get_funasr_models_config(language), "params": params},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def _json_default(value: Any) -> Any:
+    """识别结果中的numpy数值/数组转为Python类型"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+class TranscriptCache:
+    """按字节预算淘汰（按mtime从旧到新）的识别结果磁盘缓存"""
+
+    # 磁盘预算 (256MB)
+    DISK_BUDGET = int(os.environ.get("AI_STAGE_TRANSCRIPT_CACHE_MB", 256)) * 1024 * 1024
+
+    def __init__(self, cache_dir: str = "data/transcript_cache", disk_budget: int = DISK_BUDGET):
+        self.cache_dir = Path(cache_dir)
+        self.disk_budget = disk_budget
+
+        self._disk_bytes: Optional[int] = None  # 首次写盘时统计
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.file_hits = 0
+        self.misses = 0
+
+    def _path(self, audio_key: str, params_key: str) -> Path:
+        return self.cache_dir / audio_key[:2] / f"{audio_key}_{params_key}.json"
+
+    def _alias_path(self, file_key: str) -> Path:
+        return self.cache_dir / "files" / f"{file_key}.txt"
+
+    def _write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 先写同目录临时文件再原子替换，读者不会看到写了一半的结果
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            result = json.loads(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning(f"识别结果缓存损坏，已删除: {path}")
+            path.unlink(missing_ok=True)
+            return None
+        # 更新mtime作为LRU时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    # 对外接口
+
+    def get(self, audio_key: str, params_key: str) -> Optional[Dict[str, Any]]:
+        """按音频摘要查找识别结果"""
+        result = self._read(self._path(audio_key, params_key))
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def get_by_file(self, file_key: str, params_key: str) -> Optional[Dict[str, Any]]:
+        """按文件摘要查找识别结果（不需要解码音频），未记录该文件时返回None且不计入未命中"""
+        try:
+            audio_key = self._alias_path(file_key).read_text().strip()
+        except FileNotFoundError:
+            return None
+        result = self._read(self._path(audio_key, params_key))
+        if result is not None:
+            with self._lock:
+                self.file_hits += 1
+        return result
+
+    def remember_file(self, file_key: str, audio_key: str):
+        """记录文件摘要对应的音频摘要"""
+        try:
+            self._write(self._alias_path(file_key), audio_key.encode("ascii"))
+        except Exception as e:
+            logger.warning(f"识别结果缓存写入失败: {e}")
+
+    def put(self, audio_key: str, params_key: str, result: Dict[str, Any]):
+        """写入识别结果，超出预算时淘汰最久未使用的结果"""
+        try:
+            data = json.dumps(result, ensure_ascii=False, default=_json_default).encode("utf-8")
+            if len(data) > self.disk_budget:
+                return
+            self._write(self._path(audio_key, params_key), data)
+        except Exception as e:
+            logger.warning(f"识别结果缓存写入失败: {e}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_usage()
+            else:
+                self._disk_bytes += len(data)
+            over_budget = self._disk_bytes > self.disk_budget
+
+        if over_budget:
+            self._evict_disk()
+
+    def _scan_disk_usage(self) -> int:
+        if not self.cache_dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*/*.json"))
+
+    def _evict_disk(self):
+        """按mtime从旧到新删除，直到降到预算的90%（文件映射指向已删除的结果时自然失效）"""
+        files = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        target = int(self.disk_budget * 0.9)
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._disk_bytes = total
+        logger.info(f"识别结果缓存淘汰 {removed} 个结果，当前占用 {total / (1024 * 1024):.1f}MB")
+
+    def get_statistics(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "disk_bytes": self._disk_bytes or 0,
+                "hits": self.hits,
+                "file_hits": self.file_hits,
+                "misses": self.misses
+            }
+
+# 全局识别结果缓存实例
+transcript_cache = TranscriptCache()
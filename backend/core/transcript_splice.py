@@ -0,0 +1,51 @@
+"""
+转录片段的局部替换
+
+只重新识别一个时间区间时，用新片段替换该区间内的旧片段，区间外的片段（含ID和手动指定的说话人）保持不变：
+
+- 区间扩展到与之相交的旧片段的边界，不会只替换半句话
+- 新片段继承与其时间重合最长的旧片段的说话人（保留手动指定的说话人），没有重合时不指定说话人
+"""
+
+import logging
+from typing import List, Tuple
+
+from backend.models.data_models import TranscriptSegment
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _overlaps(segment: TranscriptSegment, start: float, end: float) -> bool:
+    return segment.start_time < end and segment.end_time > start
+
+def expand_range(transcripts: List[TranscriptSegment], start: float, end: float) -> Tuple[float, float]:
+    """把区间扩展到与之相交的片段的边界"""
+    for segment in transcripts:
+        if _overlaps(segment, start, end):
+            start = min(start, segment.start_time)
+            end = max(end, segment.end_time)
+    return start, end
+
+def splice_transcripts(transcripts: List[TranscriptSegment], new_segments: List[TranscriptSegment],
+                       start: float, end: float) -> Tuple[List[TranscriptSegment], List[TranscriptSegment]]:
+    """
+    用new_segments替换与[start, end)相交的旧片段
+
+    Returns:
+        (按开始时间排序的新片段列表, 被替换的旧片段)
+    """
+    kept = [segment for segment in transcripts if not _overlaps(segment, start, end)]
+    replaced = [segment for segment in transcripts if _overlaps(segment, start, end)]
+
+    for segment in new_segments:
+        best, best_overlap = None, 0.0
+        for old in replaced:
+            overlap = min(segment.end_time, old.end_time) - max(segment.start_time, old.start_time)
+            if overlap > best_overlap:
+                best, best_overlap = old, overlap
+        segment.speaker_id = best.speaker_id if best is not None else None
+
+    spliced = sorted(kept + new_segments, key=lambda segment: (segment.start_time, segment.end_time))
+    logger.info(f"替换 {start:.2f}s~{end:.2f}s: 删除 {len(replaced)} 个片段，新增 {len(new_segments)} 个片段")
+    return spliced, replaced
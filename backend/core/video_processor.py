@@ -5,10 +5,17 @@
 import os
 import cv2
 import logging
-from typing import Dict, Any, Optional, Tuple, List
+import subprocess
+import uuid
+import numpy as np
+from typing import Dict, Any, Optional, Tuple, List, Iterator, Sequence
 from pathlib import Path
 import mimetypes
 
+from .frame_reader import frame_reader_pool
+from .keyframe_index import keyframe_index_store
+from .workspace import TempWorkspace, workspace_manager
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,9 +37,49 @@ class VideoProcessor:
     # 最大文件大小 (200MB)
     MAX_FILE_SIZE = 200 * 1024 * 1024
     
-    def __init__(self):
-        self.temp_dir = Path("temp")
-        self.temp_dir.mkdir(exist_ok=True)
+    # 顺序采样时两个采样点间距超过该帧数才改用seek（约为常见GOP长度的两倍）
+    MAX_GRAB_GAP = 300
+    
+    # 分析用代理文件：最大宽度和关键帧间隔（秒）
+    PROXY_WIDTH = 640
+    PROXY_KEYFRAME_INTERVAL = 0.5
+    
+    def _iter_sampled_frames(self, cap: cv2.VideoCapture, frame_indices: Sequence[int],
+                             max_grab_gap: Optional[int] = None) -> Iterator[Tuple[int, Optional[np.ndarray]]]:
+        """
+        顺序解码采样帧
+        
+        跳过的帧只调用grab()（解复用+解码，不做颜色转换），采样帧才调用retrieve()；
+        只有当两个采样点相距超过max_grab_gap帧时才执行一次seek，避免每个样本都从关键帧重新解码。
+        
+        Args:
+            cap: 已打开的VideoCapture，读取位置应在第0帧
+            frame_indices: 升序的采样帧号
+            max_grab_gap: 改用seek的间距阈值，默认使用MAX_GRAB_GAP
+            
+        Yields:
+            (帧号, 帧图像)，读取失败时帧图像为None
+        """
+        if max_grab_gap is None:
+            max_grab_gap = self.MAX_GRAB_GAP
+        
+        position = 0  # 下一次grab()将读取的帧号
+        for index in frame_indices:
+            if index < position or index - position > max_grab_gap:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                position = index
+            
+            while position < index:
+                cap.grab()
+                position += 1
+            
+            ok = cap.grab()
+            position += 1
+            frame = None
+            if ok:
+                ok, frame = cap.retrieve()
+            
+            yield index, (frame if ok else None)
     
     def validate_video_file(self, file_path: str, file_size: int = None) -> Dict[str, Any]:
         """验证视频文件"""
@@ -144,15 +191,13 @@ class VideoProcessor:
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             result["total_frames"] = total_frames
             
-            # 采样检查帧（每10帧检查一次，最多检查100帧）
+            # 采样检查帧（均匀采样，最多检查约100帧）
             check_interval = max(1, total_frames // 100)
+            frame_indices = range(0, total_frames, check_interval)
             readable_frames = 0
             
-            for i in range(0, total_frames, check_interval):
-                cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-                ret, frame = cap.read()
-                
-                if ret and frame is not None:
+            for i, frame in self._iter_sampled_frames(cap, frame_indices):
+                if frame is not None:
                     readable_frames += 1
                 else:
                     logger.warning(f"帧 {i} 读取失败")
@@ -160,7 +205,7 @@ class VideoProcessor:
             cap.release()
             
             result["readable_frames"] = readable_frames
-            checked_frames = min(100, total_frames // check_interval)
+            checked_frames = len(frame_indices)
             
             # 如果超过10%的帧无法读取，认为视频可能损坏
             if readable_frames < checked_frames * 0.9:
@@ -177,53 +222,140 @@ class VideoProcessor:
             result["errors"].append(f"验证过程出错: {str(e)}")
             return result
     
-    def extract_thumbnail(self, file_path: str, timestamp: float = 1.0) -> Optional[str]:
-        """提取视频缩略图"""
-        logger.info(f"提取缩略图: {file_path} at {timestamp}s")
+    def build_keyframe_index(self, file_path: str) -> Dict[str, Any]:
+        """构建并持久化关键帧索引（上传入库时调用一次）"""
+        index = keyframe_index_store.get(file_path)
+        return {
+            "frame_count": index.frame_count,
+            "keyframe_count": len(index.keyframes),
+            "duration": round(index.duration, 2)
+        }
+    
+    def read_frame_at(self, file_path: str, timestamp: float) -> Optional[np.ndarray]:
+        """
+        读取指定时间戳处的帧
         
+        有关键帧索引时把时间戳对齐到真实帧，由常驻的解码器跳到之前最近的关键帧，
+        只解码到目标帧为止（同一GOP内向后拖动时不再seek，也不为每一帧启动进程）。
+        OpenCV按 帧号/平均帧率 换算的seek在可变帧率视频上会定位错帧甚至失败，
+        因此只在索引不可用时作为退路。
+        """
         try:
+            index = keyframe_index_store.get(file_path)
+        except Exception as e:
+            logger.warning(f"关键帧索引不可用，使用帧号seek: {e}")
+            index = None
+        
+        if index is None:
             cap = cv2.VideoCapture(file_path)
-            
             if not cap.isOpened():
                 raise Exception("无法打开视频文件")
-            
-            # 设置到指定时间戳
             fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_number = int(timestamp * fps)
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(timestamp * fps))
             ret, frame = cap.read()
             cap.release()
+            return frame if ret else None
+        
+        return frame_reader_pool.read(file_path, index, index.frame_at(timestamp))
+    
+    def render_thumbnail(self, file_path: str, timestamp: float = 1.0, width: int = 320) -> Optional[bytes]:
+        """生成缩略图JPEG数据（不落盘），宽度不超过width且不放大"""
+        frame = self.read_frame_at(file_path, timestamp)
+        
+        if frame is None:
+            raise Exception("无法读取指定时间戳的帧")
+        
+        height, frame_width = frame.shape[:2]
+        if frame_width > width:
+            new_height = max(1, int(height * width / frame_width))
+            frame = cv2.resize(frame, (width, new_height), interpolation=cv2.INTER_AREA)
+        
+        success, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not success:
+            raise Exception("缩略图编码失败")
+        
+        return buffer.tobytes()
+    
+    def extract_thumbnail(self, file_path: str, timestamp: float = 1.0, width: int = 320,
+                          workspace: Optional[TempWorkspace] = None) -> Optional[str]:
+        """提取视频缩略图（写入workspace，None时新建一个，由调用方或清理任务回收）"""
+        logger.info(f"提取缩略图: {file_path} at {timestamp}s")
+        
+        try:
+            data = self.render_thumbnail(file_path, timestamp, width)
             
-            if not ret or frame is None:
-                raise Exception("无法读取指定时间戳的帧")
-            
-            # 保存缩略图
+            workspace = workspace or workspace_manager.create("thumbnail", detach=True)
             file_stem = Path(file_path).stem
-            thumbnail_path = self.temp_dir / f"{file_stem}_thumbnail.jpg"
-            
-            # 调整大小（最大宽度320px）
-            height, width = frame.shape[:2]
-            if width > 320:
-                scale = 320 / width
-                new_width = 320
-                new_height = int(height * scale)
-                frame = cv2.resize(frame, (new_width, new_height))
+            thumbnail_path = workspace.file(f"{file_stem}_thumbnail_{int(timestamp * 1000)}_w{width}.jpg")
+            thumbnail_path.write_bytes(data)
             
-            success = cv2.imwrite(str(thumbnail_path), frame)
-            
-            if success:
-                logger.info(f"缩略图保存成功: {thumbnail_path}")
-                return str(thumbnail_path)
-            else:
-                raise Exception("缩略图保存失败")
+            logger.info(f"缩略图保存成功: {thumbnail_path}")
+            return str(thumbnail_path)
                 
         except Exception as e:
             logger.error(f"缩略图提取失败: {e}")
             return None
     
-    def get_video_frames_sample(self, file_path: str, sample_count: int = 10) -> List[Tuple[float, str]]:
-        """获取视频帧样本（用于后续分析）"""
+    def create_proxy(self, file_path: str, output_path: str) -> Optional[Dict[str, Any]]:
+        """
+        转码生成分析用的低分辨率代理文件
+        
+        代理文件缩小到PROXY_WIDTH宽、每PROXY_KEYFRAME_INTERVAL秒一个关键帧、去掉音轨，
+        时间戳原样保留（可变帧率也不重采样），因此按时间戳读到的帧与原文件一致。
+        缩略图、帧采样、位置提取等分析读取都可以改读代理，解码量降为原来的几分之一，
+        取帧seek也最多只需解码半秒。原文件保留用于播放和导出。
+        
+        Returns:
+            代理文件信息；原视频不大于代理尺寸时不需要代理，返回None
+        """
+        import imageio_ffmpeg
+        
+        cap = cv2.VideoCapture(file_path)
+        if not cap.isOpened():
+            raise Exception("无法打开视频文件")
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        cap.release()
+        
+        if width <= self.PROXY_WIDTH:
+            logger.info(f"视频宽度{width}不超过代理尺寸，直接使用原文件分析: {file_path}")
+            return None
+        
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = output_path.with_name(f"{output_path.stem}.{uuid.uuid4().hex}.tmp{output_path.suffix}")
+        
+        cmd = [
+            imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-v", "error", "-nostdin",
+            "-i", str(file_path), "-map", "0:v:0", "-an", "-sn",
+            "-vf", f"scale={self.PROXY_WIDTH}:-2:flags=area",
+            "-fps_mode", "passthrough",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "28", "-pix_fmt", "yuv420p",
+            "-force_key_frames", f"expr:gte(t,n_forced*{self.PROXY_KEYFRAME_INTERVAL})",
+            "-sc_threshold", "0",
+            "-movflags", "+faststart",
+            str(temp_path)
+        ]
+        
+        logger.info(f"开始生成代理文件: {file_path} -> {output_path}")
+        try:
+            completed = subprocess.run(cmd, capture_output=True)
+            if completed.returncode != 0:
+                raise Exception(f"代理转码失败: {completed.stderr.decode(errors='ignore').strip()[:200]}")
+            os.replace(temp_path, output_path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        
+        info = self.extract_video_info(str(output_path))
+        logger.info(f"代理文件生成完成: {output_path}, {info['resolution']}, {info['file_size']} 字节")
+        return {
+            "proxy_path": str(output_path),
+            "resolution": info["resolution"],
+            "file_size": info["file_size"]
+        }
+    
+    def get_video_frames_sample(self, file_path: str, sample_count: int = 10,
+                                workspace: Optional[TempWorkspace] = None) -> List[Tuple[float, str]]:
+        """获取视频帧样本（用于后续分析），帧图像写入workspace，None时新建一个"""
         logger.info(f"获取视频帧样本: {file_path}, 样本数: {sample_count}")
         
         samples = []
@@ -242,17 +374,13 @@ class VideoProcessor:
             interval = max(1, total_frames // sample_count)
             
             file_stem = Path(file_path).stem
+            frame_indices = range(0, total_frames, interval)[:sample_count]
+            workspace = workspace or workspace_manager.create("frames", detach=True)
             
-            for i in range(0, total_frames, interval):
-                if len(samples) >= sample_count:
-                    break
-                
-                cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-                ret, frame = cap.read()
-                
-                if ret and frame is not None:
+            for i, frame in self._iter_sampled_frames(cap, frame_indices):
+                if frame is not None:
                     timestamp = i / fps
-                    frame_path = self.temp_dir / f"{file_stem}_frame_{i:06d}.jpg"
+                    frame_path = workspace.file(f"{file_stem}_frame_{i:06d}.jpg")
                     
                     if cv2.imwrite(str(frame_path), frame):
                         samples.append((timestamp, str(frame_path)))
@@ -266,20 +394,109 @@ class VideoProcessor:
             logger.error(f"帧样本提取失败: {e}")
             return []
     
+    # iter_frame_batches支持的颜色空间 -> (OpenCV转换码, 通道数)
+    COLOR_CONVERSIONS = {
+        "bgr": (None, 3),
+        "rgb": (cv2.COLOR_BGR2RGB, 3),
+        "gray": (cv2.COLOR_BGR2GRAY, 1)
+    }
+    
+    def iter_frame_batches(self, file_path: str, sample_fps: Optional[float] = None,
+                           batch_size: int = 32, max_width: Optional[int] = None,
+                           color: str = "bgr", start_time: float = 0.0,
+                           end_time: Optional[float] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        按批次顺序解码视频帧，直接返回内存中的NumPy数组（不落盘）
+        
+        每个批次分配一块新的连续数组，内存占用上限约为 batch_size * 单帧大小，
+        适合直接喂给姿态估计等批量推理。缩放和颜色转换直接写入批次数组，
+        不为每帧分配中间图像。时间戳取解码帧自身的显示时间（CAP_PROP_POS_MSEC），
+        可变帧率视频上同样准确；采样位置仍按平均帧率换算帧号。
+        
+        Args:
+            file_path: 视频文件路径
+            sample_fps: 采样帧率，None表示每一帧都取
+            batch_size: 每批帧数
+            max_width: 输出最大宽度，超过时等比缩小
+            color: 颜色空间 bgr/rgb/gray
+            start_time: 起始时间（秒）
+            end_time: 结束时间（秒），None表示到视频结尾
+            
+        Yields:
+            (timestamps, frames)：timestamps形状(N,)，单位秒；
+            frames形状(N, H, W, 3)或gray时为(N, H, W)，dtype为uint8
+        """
+        if color not in self.COLOR_CONVERSIONS:
+            raise ValueError(f"不支持的颜色空间: {color}")
+        conversion, channels = self.COLOR_CONVERSIONS[color]
+        
+        cap = cv2.VideoCapture(file_path)
+        if not cap.isOpened():
+            raise Exception("无法打开视频文件")
+        
+        try:
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if fps <= 0 or width <= 0:
+                raise Exception("无法读取视频帧率或尺寸")
+            
+            out_width, out_height = width, height
+            if max_width and width > max_width:
+                out_width = max_width
+                out_height = max(1, int(round(height * max_width / width)))
+            resize = (out_width, out_height) != (width, height)
+            frame_shape = (out_height, out_width) if channels == 1 else (out_height, out_width, channels)
+            
+            step = 1 if not sample_fps else max(1, int(round(fps / sample_fps)))
+            start_frame = max(0, int(round(start_time * fps)))
+            end_frame = total_frames if end_time is None else min(total_frames, int(round(end_time * fps)))
+            frame_indices = range(start_frame, end_frame, step)
+            
+            batch = np.empty((batch_size,) + frame_shape, dtype=np.uint8)
+            timestamps = np.empty(batch_size, dtype=np.float64)
+            # 既要缩放又要转换颜色时，缩放结果先写入这块复用的缓冲区
+            scaled = np.empty((out_height, out_width, 3), dtype=np.uint8) if resize and conversion is not None else None
+            count = 0
+            
+            for frame_number, frame in self._iter_sampled_frames(cap, frame_indices):
+                if frame is None:
+                    continue
+                
+                if resize and conversion is None:
+                    cv2.resize(frame, (out_width, out_height), dst=batch[count], interpolation=cv2.INTER_AREA)
+                elif resize:
+                    cv2.resize(frame, (out_width, out_height), dst=scaled, interpolation=cv2.INTER_AREA)
+                    cv2.cvtColor(scaled, conversion, dst=batch[count])
+                elif conversion is None:
+                    batch[count] = frame
+                else:
+                    cv2.cvtColor(frame, conversion, dst=batch[count])
+                timestamps[count] = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                count += 1
+                
+                if count == batch_size:
+                    yield timestamps, batch
+                    batch = np.empty((batch_size,) + frame_shape, dtype=np.uint8)
+                    timestamps = np.empty(batch_size, dtype=np.float64)
+                    count = 0
+            
+            if count:
+                yield timestamps[:count], batch[:count]
+        finally:
+            cap.release()
+    
     def cleanup_temp_files(self, pattern: str = None):
         """清理临时文件"""
         try:
             if pattern:
-                # 清理特定模式的文件
-                for file_path in self.temp_dir.glob(pattern):
-                    file_path.unlink()
-                    logger.debug(f"删除临时文件: {file_path}")
+                # 清理空闲工作区中特定模式的文件，正在使用的工作区不受影响
+                removed = workspace_manager.remove_files(pattern)
+                logger.debug(f"删除临时文件: {removed} 个")
             else:
-                # 清理所有临时文件
-                for file_path in self.temp_dir.iterdir():
-                    if file_path.is_file():
-                        file_path.unlink()
-                        logger.debug(f"删除临时文件: {file_path}")
+                # 清理所有空闲的工作区
+                workspace_manager.cleanup(max_age=0)
                         
             logger.info("临时文件清理完成")
             
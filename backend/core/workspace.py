@@ -0,0 +1,288 @@
+"""
+临时工作区管理
+
+每个任务在 temp/workspaces/ 下获得一个独立的目录（前缀+随机ID），任务内的中间文件
+（提取的音频、帧样本、上传的临时文件等）都写在自己的目录里，同名源文件的并发任务不会互相覆盖。
+用上下文管理器创建的工作区在任务结束时整体删除。
+
+所有工作区共享一个磁盘配额：创建新工作区前超出配额会先清理，清理后仍超出则拒绝创建。
+后台清理任务定期删除超过存活时间的工作区，并在总占用超过配额时从最旧的开始删除，
+正在使用中的工作区不会被清理：使用中的工作区内有记录创建进程pid的标记文件，
+其他进程（如在ASR工作进程中创建的工作区）的清理任务同样会跳过，创建进程已退出时标记失效。
+
+create、cleanup、get_statistics会遍历整个临时目录，在事件循环中应经由run_io调用。
+
+配额和存活时间可用环境变量 AI_STAGE_TEMP_QUOTA_MB、AI_STAGE_TEMP_MAX_AGE_HOURS 配置。
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORKSPACE_ROOT = "temp/workspaces"
+DEFAULT_QUOTA_BYTES = int(float(os.environ.get("AI_STAGE_TEMP_QUOTA_MB", 2048)) * 1024 * 1024)
+DEFAULT_MAX_AGE = float(os.environ.get("AI_STAGE_TEMP_MAX_AGE_HOURS", 6)) * 3600
+JANITOR_INTERVAL = 600
+IN_USE_MARKER = ".in_use"  # 使用中标记文件，内容为创建进程的pid
+
+class WorkspaceQuotaExceeded(Exception):
+    """临时目录超出磁盘配额且无法清理出空间"""
+
+class TempWorkspace:
+    """单个任务的临时目录"""
+
+    def __init__(self, path: Path, manager: "WorkspaceManager"):
+        self.path = path
+        self._manager = manager
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    def file(self, filename: str) -> Path:
+        """工作区内的文件路径（只取文件名部分，不允许写到工作区之外）"""
+        return self.path / Path(filename).name
+
+    def release(self):
+        """删除工作区"""
+        self._manager.release(self)
+
+    def __enter__(self) -> "TempWorkspace":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def __repr__(self) -> str:
+        return f"TempWorkspace({self.path})"
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _in_use(path: Path) -> bool:
+    """工作区是否有创建进程仍在运行的使用中标记"""
+    try:
+        pid = int((path / IN_USE_MARKER).read_text().strip())
+    except (OSError, ValueError):
+        return False
+    return _pid_alive(pid)
+
+def _directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+class WorkspaceManager:
+    """临时工作区的创建、配额和过期清理"""
+
+    def __init__(self, root: str = WORKSPACE_ROOT, quota_bytes: int = DEFAULT_QUOTA_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self.max_age = max_age
+        self._active: Dict[str, TempWorkspace] = {}
+        self._lock = threading.Lock()
+        self._janitor_task: Optional[asyncio.Task] = None
+
+    def create(self, prefix: str = "job", detach: bool = False) -> TempWorkspace:
+        """
+        创建新的工作区
+
+        Args:
+            prefix: 目录名前缀（任务类型）
+            detach: False时登记为使用中，release之前不会被清理；
+                True时不登记，用于把结果文件交给调用方，超过存活时间后由清理任务回收
+
+        Raises:
+            WorkspaceQuotaExceeded: 清理后仍超出配额
+        """
+        if self.disk_usage() >= self.quota_bytes:
+            self.cleanup()
+            usage = self.disk_usage()
+            if usage >= self.quota_bytes:
+                raise WorkspaceQuotaExceeded(
+                    f"临时目录占用 {usage / 1024 / 1024:.0f}MB，超出配额 {self.quota_bytes / 1024 / 1024:.0f}MB"
+                )
+
+        path = self.root / f"{prefix}_{uuid.uuid4().hex[:12]}"
+        path.mkdir(parents=True)
+        workspace = TempWorkspace(path, self)
+        if not detach:
+            # 其他进程的清理任务看不到_active，在磁盘上标记使用中
+            (path / IN_USE_MARKER).write_text(str(os.getpid()))
+            with self._lock:
+                self._active[path.name] = workspace
+        logger.debug(f"创建工作区: {path}")
+        return workspace
+
+    @contextmanager
+    def workspace(self, prefix: str = "job") -> Iterator[TempWorkspace]:
+        """创建工作区，退出时删除"""
+        workspace = self.create(prefix)
+        try:
+            yield workspace
+        finally:
+            workspace.release()
+
+    def release(self, workspace: TempWorkspace):
+        with self._lock:
+            self._active.pop(workspace.name, None)
+        shutil.rmtree(workspace.path, ignore_errors=True)
+        logger.debug(f"删除工作区: {workspace.path}")
+
+    def _list_workspaces(self) -> List[Tuple[float, int, Path]]:
+        """所有工作区的 (最后修改时间, 大小, 路径)，按修改时间升序"""
+        if not self.root.exists():
+            return []
+        entries = []
+        for path in self.root.iterdir():
+            try:
+                if path.is_dir():
+                    mtime = max([path.stat().st_mtime] + [p.stat().st_mtime for p in path.rglob("*")])
+                    entries.append((mtime, _directory_size(path), path))
+                else:
+                    stat = path.stat()
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    def disk_usage(self) -> int:
+        """所有工作区的总字节数"""
+        if not self.root.exists():
+            return 0
+        return _directory_size(self.root)
+
+    def _is_idle(self, path: Path, prefix: Optional[str] = None) -> bool:
+        """工作区是否空闲（本进程未登记、其他进程也未标记使用中）且匹配前缀"""
+        with self._lock:
+            if path.name in self._active:
+                return False
+        if prefix is not None and not path.name.startswith(f"{prefix}_"):
+            return False
+        return not _in_use(path)
+
+    def remove_files(self, pattern: str, prefix: Optional[str] = None) -> int:
+        """
+        删除空闲工作区中文件名匹配pattern的文件，使用中的工作区不受影响
+
+        Returns:
+            删除的文件数
+        """
+        if not self.root.exists():
+            return 0
+        removed = 0
+        for path in self.root.iterdir():
+            if not path.is_dir() or not self._is_idle(path, prefix):
+                continue
+            for file_path in path.glob(pattern):
+                if file_path.is_file() and file_path.name != IN_USE_MARKER:
+                    file_path.unlink(missing_ok=True)
+                    removed += 1
+        return removed
+
+    def cleanup(self, max_age: Optional[float] = None, prefix: Optional[str] = None) -> Dict[str, int]:
+        """
+        清理不在使用中的工作区
+
+        先删除超过max_age未修改的工作区，总占用仍超过配额时再从最旧的开始删除，直到降到配额的90%。
+
+        Args:
+            max_age: 存活时间（秒），默认使用管理器配置，0表示删除全部空闲工作区
+            prefix: 只清理该前缀的工作区
+
+        Returns:
+            {removed, freed_bytes, usage_bytes}
+        """
+        max_age = self.max_age if max_age is None else max_age
+        now = time.time()
+
+        entries = [entry for entry in self._list_workspaces() if self._is_idle(entry[2], prefix)]
+        usage = self.disk_usage()
+        removed = 0
+        freed = 0
+
+        def remove(size: int, path: Path):
+            nonlocal removed, freed, usage
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            removed += 1
+            freed += size
+            usage -= size
+
+        remaining = []
+        for mtime, size, path in entries:
+            if now - mtime >= max_age:
+                remove(size, path)
+            else:
+                remaining.append((mtime, size, path))
+
+        target = self.quota_bytes * 0.9
+        for mtime, size, path in remaining:
+            if usage <= target:
+                break
+            remove(size, path)
+
+        if removed:
+            logger.info(f"临时目录清理: 删除 {removed} 个工作区, 释放 {freed / 1024 / 1024:.1f}MB")
+        return {"removed": removed, "freed_bytes": freed, "usage_bytes": max(usage, 0)}
+
+    def get_statistics(self) -> Dict[str, float]:
+        """临时目录使用情况"""
+        with self._lock:
+            active = len(self._active)
+        usage = self.disk_usage()
+        return {
+            "workspaces": len(self._list_workspaces()),
+            "active_workspaces": active,
+            "usage_mb": round(usage / 1024 / 1024, 2),
+            "quota_mb": round(self.quota_bytes / 1024 / 1024, 2),
+            "usage_ratio": round(usage / self.quota_bytes, 4) if self.quota_bytes else 0.0
+        }
+
+    async def _janitor_loop(self, interval: float):
+        while True:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.cleanup)
+            except Exception as e:
+                logger.error(f"临时目录清理失败: {e}")
+            await asyncio.sleep(interval)
+
+    def start_janitor(self, interval: float = JANITOR_INTERVAL):
+        """启动后台清理任务（需在事件循环中调用）"""
+        if self._janitor_task is None or self._janitor_task.done():
+            self._janitor_task = asyncio.get_running_loop().create_task(self._janitor_loop(interval))
+            logger.info(f"临时目录清理任务已启动: {self.root}, 配额 {self.quota_bytes / 1024 / 1024:.0f}MB")
+
+    def stop_janitor(self):
+        if self._janitor_task is not None:
+            self._janitor_task.cancel()
+            self._janitor_task = None
+
+# 全局工作区管理器实例
+workspace_manager = WorkspaceManager()
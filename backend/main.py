@@ -6,6 +6,7 @@ from fastapi import FastAPI, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
+import asyncio
 import os
 from pathlib import Path
 
@@ -14,7 +15,12 @@ from backend.api.stage_management import router as stage_router
 from backend.api.ai_suggestions import router as ai_router
 from backend.api.dialogue_extraction import router as dialogue_router
 from backend.api.ai_analysis import router as ai_analysis_router
+from backend.api.jobs import router as jobs_router
 from backend.core.data_store import InMemoryDataStore
+from backend.core.workspace import workspace_manager
+from backend.core.executors import get_executor_statistics, run_io, shutdown_executors, start_asr_workers
+from backend.core.transcript_cache import transcript_cache
+from backend.core.job_queue import job_queue
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -44,6 +50,7 @@ app.include_router(stage_router, prefix="/api/stage", tags=["舞台管理"])
 app.include_router(ai_router, prefix="/api/ai", tags=["AI建议"])
 app.include_router(dialogue_router, tags=["台词提取"])
 app.include_router(ai_analysis_router, tags=["AI分析"])
+app.include_router(jobs_router, prefix="/api/jobs", tags=["任务队列"])
 
 @app.on_event("startup")
 async def startup_event():
@@ -54,6 +61,9 @@ async def startup_event():
     Path("temp").mkdir(exist_ok=True)
     Path("data").mkdir(exist_ok=True)
     
+    # 启动临时目录清理任务（按存活时间和磁盘配额回收任务工作区）
+    workspace_manager.start_janitor()
+    
     # 尝试加载已有数据
     try:
         data_store.load_from_json("data/project_data.json")
@@ -61,15 +71,35 @@ async def startup_event():
     except FileNotFoundError:
         print("📝 创建新的项目数据存储")
     
+    # 启动任务队列（数据加载之后，重启前未完成的任务会重新排队）
+    job_queue.start()
+    
+    # 后台启动ASR工作进程并预加载、预热模型，第一个转录请求不再等待模型加载
+    app.state.asr_startup = asyncio.get_running_loop().create_task(start_asr_workers())
+    
     print("🎭 AI舞台系统启动成功!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时停止后台任务"""
+    await job_queue.stop()
+    workspace_manager.stop_janitor()
+    shutdown_executors()
+
 @app.get("/")
 async def root():
     return {"message": "AI舞台系统API", "version": "1.0.0", "status": "running"}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "data_store": "connected"}
+    return {
+        "status": "healthy",
+        "data_store": "connected",
+        "temp_storage": await run_io(workspace_manager.get_statistics),
+        "jobs": job_queue.get_statistics(),
+        "executors": get_executor_statistics(),
+        "transcript_cache": transcript_cache.get_statistics()
+    }
 
 if __name__ == "__main__":
     uvicorn.run(
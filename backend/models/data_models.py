@@ -2,7 +2,7 @@
 AI舞台系统核心数据模型
 """
 
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 import uuid
@@ -78,6 +78,46 @@ class ActorPosition:
             confidence=confidence
         )
 
+@dataclass
+class ActorTrack:
+    """单个演员在一段视频中的紧凑轨迹（按列存储，替代逐点的ActorPosition列表）"""
+    id: str
+    actor_id: str
+    timestamps: List[float]
+    x: List[float]  # 舞台坐标
+    y: List[float]
+    confidence: List[float]
+    image_x: Optional[List[float]] = None  # 归一化画面坐标，重新标定时据此重新投影
+    image_y: Optional[List[float]] = None
+    
+    @classmethod
+    def create(cls, actor_id: str, timestamps: List[float], x: List[float], y: List[float],
+               confidence: List[float], image_x: Optional[List[float]] = None,
+               image_y: Optional[List[float]] = None):
+        return cls(
+            id=str(uuid.uuid4()),
+            actor_id=actor_id,
+            timestamps=timestamps,
+            x=x,
+            y=y,
+            confidence=confidence,
+            image_x=image_x,
+            image_y=image_y
+        )
+    
+    def to_positions(self) -> List[ActorPosition]:
+        """展开为逐点的ActorPosition（ID由轨迹ID和序号派生，多次展开保持一致）"""
+        return [
+            ActorPosition(
+                id=f"{self.id}:{i}",
+                actor_id=self.actor_id,
+                timestamp=timestamp,
+                position_2d=Position2D(x, y),
+                confidence=confidence
+            )
+            for i, (timestamp, x, y, confidence) in enumerate(zip(self.timestamps, self.x, self.y, self.confidence))
+        ]
+
 @dataclass
 class Waypoint:
     position: Position2D
@@ -149,6 +189,23 @@ class Actor:
             color=color
         )
 
+@dataclass
+class SceneMarker:
+    """视频时间轴上的场景边界标记"""
+    id: str
+    timestamp: float  # 新场景开始的时间
+    score: float = 0.0  # 边界两侧画面的差异程度（0~1）
+    label: str = ""
+    
+    @classmethod
+    def create(cls, timestamp: float, score: float = 0.0, label: str = ""):
+        return cls(
+            id=str(uuid.uuid4()),
+            timestamp=timestamp,
+            score=score,
+            label=label
+        )
+
 @dataclass
 class Video:
     id: str
@@ -159,6 +216,11 @@ class Video:
     resolution: str = "1920x1080"
     status: str = "uploaded"  # uploaded, processing, processed, error
     created_at: str = ""
+    # 舞台四角（左上、右上、右下、左下）的归一化画面坐标，None表示未标定
+    stage_calibration: Optional[List[List[float]]] = None
+    # 分析用低分辨率代理文件，None表示尚未生成或不需要（分析直接读原文件）
+    proxy_path: Optional[str] = None
+    scene_markers: List[SceneMarker] = field(default_factory=list)
     
     @classmethod
     def create(cls, filename: str, file_path: str):
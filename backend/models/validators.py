@@ -134,6 +134,76 @@ def validate_actor_position(data: Dict[str, Any]) -> List[str]:
     
     return errors
 
+def validate_actor_track(data: Dict[str, Any]) -> List[str]:
+    """验证演员轨迹数据"""
+    errors = []
+    
+    # 必需字段
+    required_fields = ['actor_id', 'timestamps', 'x', 'y', 'confidence']
+    for field in required_fields:
+        if field not in data:
+            errors.append(f"缺少必需字段: {field}")
+    
+    # 验证actor_id
+    if 'actor_id' in data and not isinstance(data['actor_id'], str):
+        errors.append("actor_id必须是字符串")
+    
+    # 验证各列长度一致
+    columns = [data[field] for field in ['timestamps', 'x', 'y', 'confidence'] if field in data]
+    if any(not isinstance(column, list) for column in columns):
+        errors.append("timestamps、x、y、confidence必须是列表")
+    elif len(set(len(column) for column in columns)) > 1:
+        errors.append("timestamps、x、y、confidence长度必须一致")
+    
+    # 验证时间戳单调递增
+    timestamps = data.get('timestamps')
+    if isinstance(timestamps, list):
+        if not all(validate_timestamp(t) for t in timestamps):
+            errors.append("timestamps必须是非负数")
+        elif any(b < a for a, b in zip(timestamps, timestamps[1:])):
+            errors.append("timestamps必须按时间递增")
+    
+    # 验证置信度
+    confidence = data.get('confidence')
+    if isinstance(confidence, list) and not all(validate_confidence(c) for c in confidence):
+        errors.append("confidence必须在0.0到1.0之间")
+    
+    # 验证画面坐标（可选，存在时须与时间戳等长）
+    image_columns = [data.get('image_x'), data.get('image_y')]
+    if any(column is not None for column in image_columns):
+        if not all(isinstance(column, list) for column in image_columns):
+            errors.append("image_x和image_y必须同时提供且为列表")
+        elif isinstance(timestamps, list) and any(len(column) != len(timestamps) for column in image_columns):
+            errors.append("image_x、image_y长度必须与timestamps一致")
+    
+    return errors
+
+def validate_stage_calibration(points: Any) -> List[str]:
+    """验证舞台标定点（四个角的归一化画面坐标，顺序为左上、右上、右下、左下）"""
+    errors = []
+    
+    if not isinstance(points, list) or len(points) != 4:
+        return ["舞台标定必须包含4个角点"]
+    
+    for point in points:
+        if (not isinstance(point, (list, tuple)) or len(point) != 2
+                or not all(isinstance(v, (int, float)) for v in point)):
+            return ["每个角点必须是[x, y]数值对"]
+        if not all(-1.0 <= v <= 2.0 for v in point):
+            errors.append("角点坐标超出画面范围")
+            break
+    
+    # 四边形必须是凸的且按同一方向排列，否则透视变换无意义
+    if not errors:
+        crosses = []
+        for i in range(4):
+            (x0, y0), (x1, y1), (x2, y2) = points[i], points[(i + 1) % 4], points[(i + 2) % 4]
+            crosses.append((x1 - x0) * (y2 - y1) - (y1 - y0) * (x2 - x1))
+        if not (all(c > 1e-6 for c in crosses) or all(c < -1e-6 for c in crosses)):
+            errors.append("角点必须构成凸四边形且按顺序排列")
+    
+    return errors
+
 def validate_lighting_cue(data: Dict[str, Any]) -> List[str]:
     """验证灯光提示数据"""
     errors = []
@@ -276,6 +346,21 @@ def validate_video(data: Dict[str, Any]) -> List[str]:
         if not isinstance(data['fps'], int) or data['fps'] <= 0:
             errors.append("fps必须是正整数")
     
+    # 验证代理文件路径
+    if data.get('proxy_path') is not None and not isinstance(data['proxy_path'], str):
+        errors.append("proxy_path必须是字符串")
+    
+    # 验证场景标记
+    if 'scene_markers' in data:
+        if not isinstance(data['scene_markers'], list):
+            errors.append("scene_markers必须是列表")
+        elif not all(isinstance(m, dict) and validate_timestamp(m.get('timestamp')) for m in data['scene_markers']):
+            errors.append("scene_markers的timestamp必须是非负数")
+    
+    # 验证舞台标定
+    if data.get('stage_calibration') is not None:
+        errors.extend(validate_stage_calibration(data['stage_calibration']))
+    
     # 验证状态
     valid_statuses = ['uploaded', 'processing', 'processed', 'error']
     if 'status' in data:
@@ -11,6 +11,7 @@ import {
 import { InboxOutlined, PlayCircleOutlined } from "@ant-design/icons";
 import { useAppActions } from "../../contexts/AppContext";
 import { videoApi, stageApi } from "../../services/api";
+import { expandActorTracks } from "../../utils/dataUtils";
 
 const { Dragger } = Upload;
 const { Title, Text } = Typography;
@@ -83,7 +84,10 @@ const VideoUpload: React.FC = () => {
         // 更新应用状态
         actions.setCurrentVideo(analysisData);
         actions.setTranscripts(analysisData.transcripts || []);
-        actions.setActorPositions(analysisData.actor_positions || []);
+        actions.setActorPositions([
+          ...(analysisData.actor_positions || []),
+          ...expandActorTracks(analysisData.actor_tracks || []),
+        ]);
 
         // 获取时间轴数据
         const timelineData = await stageApi.getTimelineData(videoId);
@@ -35,6 +35,17 @@ export interface ActorPosition {
   confidence: number;
 }
 
+export interface ActorTrack {
+  id: string;
+  actor_id: string;
+  timestamps: number[];
+  x: number[];
+  y: number[];
+  confidence: number[];
+  image_x?: number[];
+  image_y?: number[];
+}
+
 export interface Waypoint {
   position: Position2D;
   timestamp: number;
@@ -110,6 +121,7 @@ export interface AnalysisResult {
   video: Video;
   transcripts: TranscriptSegment[];
   actor_positions: ActorPosition[];
+  actor_tracks?: ActorTrack[];
   analysis_status: string;
 }
 
@@ -117,6 +129,7 @@ export interface TimelineData {
   video: Video;
   transcripts: TranscriptSegment[];
   actor_positions: ActorPosition[];
+  actor_tracks?: ActorTrack[];
   lighting_cues: LightingCue[];
   music_cues: MusicCue[];
 }
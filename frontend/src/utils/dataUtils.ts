@@ -7,6 +7,7 @@ import {
   RGB, 
   TranscriptSegment, 
   ActorPosition, 
+  ActorTrack,
   LightingCue, 
   MusicCue,
   Actor,
@@ -116,6 +117,19 @@ export const sortMusicCuesByTime = (cues: MusicCue[]): MusicCue[] => {
   return [...cues].sort((a, b) => a.timestamp - b.timestamp);
 };
 
+// 轨迹展开为逐点位置（后端按轨迹只返回一份检测数据）
+export const expandActorTracks = (tracks: ActorTrack[]): ActorPosition[] => {
+  return tracks.flatMap(track =>
+    track.timestamps.map((timestamp, i) => ({
+      id: `${track.id}:${i}`,
+      actor_id: track.actor_id,
+      timestamp,
+      position_2d: { x: track.x[i], y: track.y[i] },
+      confidence: track.confidence[i]
+    }))
+  );
+};
+
 // 数据过滤工具函数
 export const filterPositionsByActor = (positions: ActorPosition[], actorId: string): ActorPosition[] => {
   return positions.filter(p => p.actor_id === actorId);
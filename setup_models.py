@@ -99,6 +99,29 @@ def download_models():
         print(f"❌ 模型下载失败: {e}")
         return False
 
+def download_pose_model():
+    """下载MediaPipe姿态模型（演员位置提取使用）"""
+    print("\n🕺 下载MediaPipe姿态模型...")
+    
+    import urllib.request
+    
+    url = "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_lite/float16/latest/pose_landmarker_lite.task"
+    target = Path("models") / "pose_landmarker_lite.task"
+    
+    if target.exists():
+        print(f"✅ 姿态模型已存在: {target}")
+        return True
+    
+    try:
+        target.parent.mkdir(exist_ok=True)
+        urllib.request.urlretrieve(url, str(target))
+        print(f"✅ 姿态模型下载成功: {target}")
+        return True
+    except Exception as e:
+        print(f"❌ 姿态模型下载失败: {e}")
+        print("未下载模型时位置提取会退回OpenCV HOG行人检测")
+        return False
+
 def main():
     """主函数"""
     print("🎭 FunASR模型设置工具")
@@ -117,6 +140,9 @@ def main():
         print("\n✅ 依赖安装完成，请重新运行脚本下载模型")
         return
     
+    # 下载姿态模型（失败不影响台词提取）
+    download_pose_model()
+    
     # 下载模型
     if download_models():
         print("\n🎉 模型设置完成！")
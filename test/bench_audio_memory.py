@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+"""
+识别前预处理的峰值内存对比：原float64流程 vs float32流程（prepare_audio）
+
+输入为两小时16kHz单声道录音（int16 PCM 和 float32 两种格式），
+用tracemalloc统计预处理期间新分配内存的峰值（不含输入本身）。
+
+使用方法:
+  python test/bench_audio_memory.py              # 默认两小时
+  python test/bench_audio_memory.py --hours 0.5  # 指定录音时长（小时）
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.audio_processor import prepare_audio, ASR_SAMPLE_RATE
+
+def legacy_prepare_audio(audio_data):
+    """原流程：所有输入先转为float64"""
+    sr, data = audio_data
+    if data.dtype == np.float32:
+        data = data.astype(np.float64)
+    elif data.dtype == np.int16:
+        data = data.astype(np.float64) / 32768.0
+    if len(data.shape) == 2:
+        data = data[:, 0]
+    return data
+
+def measure(func, audio_data):
+    """返回 (结果dtype, 峰值新分配MB, 耗时s)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(audio_data)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    dtype = result.dtype
+    del result
+    return dtype, peak / 1024 / 1024, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="音频预处理内存对比")
+    parser.add_argument("--hours", type=float, default=2.0, help="录音时长（小时）")
+    args = parser.parse_args()
+
+    samples = int(args.hours * 3600 * ASR_SAMPLE_RATE)
+    rng = np.random.default_rng(0)
+    pcm = rng.integers(-8000, 8000, size=samples, dtype=np.int16)
+    inputs = {
+        "int16 PCM": pcm,
+        "float32": pcm.astype(np.float32) / 32768.0
+    }
+
+    print(f"🎙️ 测试录音: {args.hours:g} 小时, {ASR_SAMPLE_RATE}Hz 单声道, {samples:,} 个采样")
+    print(f"{'输入':>10} | {'流程':>8} | {'输出':>8} | {'峰值新分配 (MB)':>15} | {'耗时 (s)':>8}")
+    print("-" * 64)
+
+    for name, data in inputs.items():
+        size = data.nbytes / 1024 / 1024
+        results = {}
+        for label, func in (("float64", legacy_prepare_audio), ("float32", prepare_audio)):
+            dtype, peak, elapsed = measure(func, (ASR_SAMPLE_RATE, data))
+            results[label] = peak
+            print(f"{name:>10} | {label:>8} | {str(dtype):>8} | {peak:>15.1f} | {elapsed:>8.2f}")
+        print(f"{'':>10}   输入 {size:.0f}MB, 新分配内存减少 {results['float64'] - results['float32']:.0f}MB")
+
+if __name__ == "__main__":
+    main()
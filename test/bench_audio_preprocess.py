@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+"""
+识别前预处理性能对比：原流程（float64、逐声道librosa重采样后丢弃其余声道） vs prepare_audio（先混音再用soxr重采样）
+
+使用方法:
+  python test/bench_audio_preprocess.py               # 默认10分钟立体声
+  python test/bench_audio_preprocess.py --minutes 30  # 指定录音时长（分钟）
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.audio_processor import prepare_audio, ASR_SAMPLE_RATE
+
+def legacy_prepare_audio(audio_data):
+    """原流程：转为float64，每个声道都重采样，最后只保留第一个声道"""
+    import librosa
+
+    sr, data = audio_data
+    data = data.astype(np.float64) / 32768.0
+    if sr != ASR_SAMPLE_RATE:
+        data = librosa.resample(data, orig_sr=sr, target_sr=ASR_SAMPLE_RATE, axis=0)
+    return data[:, 0]
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="音频预处理性能对比")
+    parser.add_argument("--minutes", type=float, default=10.0, help="录音时长（分钟）")
+    parser.add_argument("--channels", type=int, default=2, help="声道数")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"🎙️ 测试录音: {args.minutes:g} 分钟, {args.channels} 声道 int16")
+    print(f"{'输入采样率':>10} | {'原流程 (s)':>10} | {'新流程 (s)':>10} | {'加速比':>8} | {'输出长度':>10}")
+    print("-" * 62)
+
+    for sr in (48000, 44100, 32000):
+        samples = int(args.minutes * 60 * sr)
+        t = np.arange(samples, dtype=np.float32) / sr
+        tone = (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16)
+        del t
+        data = np.stack([tone] + [
+            (tone + rng.integers(-100, 100, samples, dtype=np.int16)) for _ in range(args.channels - 1)
+        ], axis=1)
+
+        legacy, legacy_time = timed(legacy_prepare_audio, (sr, data))
+        result, new_time = timed(prepare_audio, (sr, data))
+        assert result.dtype == np.float32 and abs(len(result) - len(legacy)) <= 1
+        print(f"{sr:>10} | {legacy_time:>10.2f} | {new_time:>10.2f} | {legacy_time / new_time:>7.1f}x | {len(result):>10,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+"""
+分析解码性能对比：原文件（1080p长GOP） vs 低分辨率短GOP代理文件（VideoProcessor.create_proxy）
+
+使用方法:
+  python test/bench_proxy_decode.py                 # 默认生成60秒1080p测试视频
+  python test/bench_proxy_decode.py --duration 120  # 指定测试视频时长（秒）
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.video_processor import VideoProcessor
+
+def create_source_video(output_path: str, duration: int, fps: int = 30, gop: int = 250):
+    """使用imageio-ffmpeg生成1080p长GOP的H.264测试视频"""
+    import imageio_ffmpeg
+
+    cmd = [
+        imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate={fps}",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", str(gop), "-keyint_min", str(gop),
+        "-pix_fmt", "yuv420p",
+        output_path
+    ]
+    subprocess.run(cmd, check=True)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def sample_batches(processor: VideoProcessor, file_path: str) -> int:
+    """位置提取使用的读取方式：5fps采样，缩小到640宽"""
+    return sum(len(timestamps) for timestamps, _ in processor.iter_frame_batches(
+        file_path, sample_fps=5, batch_size=16, max_width=640, color="rgb"
+    ))
+
+def render_thumbnails(processor: VideoProcessor, file_path: str, timestamps) -> int:
+    """时间轴缩略图：随机位置取帧"""
+    return sum(1 for t in timestamps if processor.render_thumbnail(file_path, t, 320))
+
+def main():
+    parser = argparse.ArgumentParser(description="代理文件解码性能对比")
+    parser.add_argument("--duration", type=int, default=60, help="测试视频时长（秒）")
+    parser.add_argument("--thumbnails", type=int, default=20, help="缩略图数量")
+    args = parser.parse_args()
+
+    processor = VideoProcessor()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, "source.mp4")
+        proxy_path = os.path.join(temp_dir, "proxy.mp4")
+
+        print(f"🎬 生成测试视频: {args.duration}秒, 1920x1080, GOP=250")
+        create_source_video(video_path, args.duration)
+
+        proxy_info, proxy_time = timed(processor.create_proxy, video_path, proxy_path)
+        print(f"📦 代理文件: {proxy_info['resolution']}, "
+              f"{proxy_info['file_size'] / 1024 / 1024:.1f}MB, 转码 {proxy_time:.2f}s（每个视频只做一次）")
+
+        # 关键帧索引提前建好，只比较取帧本身
+        processor.build_keyframe_index(video_path)
+        processor.build_keyframe_index(proxy_path)
+
+        step = args.duration / args.thumbnails
+        thumbnail_times = [(i + 0.37) * step for i in range(args.thumbnails)]
+
+        print(f"{'任务':>14} | {'原文件 (s)':>10} | {'代理 (s)':>10} | {'加速比':>8}")
+        print("-" * 54)
+
+        for name, func, extra in [
+            ("5fps批量采样", sample_batches, ()),
+            (f"{args.thumbnails}张缩略图", render_thumbnails, (thumbnail_times,))
+        ]:
+            source_count, source_time = timed(func, processor, video_path, *extra)
+            proxy_count, proxy_time = timed(func, processor, proxy_path, *extra)
+            assert source_count == proxy_count, f"帧数不一致: {source_count} vs {proxy_count}"
+            print(f"{name:>14} | {source_time:>10.2f} | {proxy_time:>10.2f} | {source_time / proxy_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+"""
+识别前去除静音的开销和收益
+
+输入为模拟排练录音（16kHz单声道）：说话段之间穿插走位、换景的长时间静音。
+统计语音区间检测和拼接的耗时（相对录音时长的实时率），以及跳过的比例——
+模型耗时大致与输入时长成正比，跳过比例即可节省的识别时间。
+
+使用方法:
+  python test/bench_speech_trim.py                  # 默认两小时，约一半为静音
+  python test/bench_speech_trim.py --hours 0.5 --silence 0.3
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.audio_processor import ASR_SAMPLE_RATE
+from backend.core.speech_trim import compact_audio, plan_trim
+
+def make_rehearsal(hours: float, silence: float, seed: int = 0) -> np.ndarray:
+    """交替生成说话段（2~20s）和静音段，静音段时长按比例缩放"""
+    rng = np.random.default_rng(seed)
+    total = int(hours * 3600 * ASR_SAMPLE_RATE)
+    data = (rng.standard_normal(total) * 1e-4).astype(np.float32)
+    position = 0
+    while position < total:
+        speech = int(rng.uniform(2, 20) * ASR_SAMPLE_RATE)
+        end = min(position + speech, total)
+        data[position:end] = rng.standard_normal(end - position).astype(np.float32) * 0.2
+        position = end + int(speech * silence / (1 - silence) * rng.uniform(0.5, 1.5))
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description="去除静音的开销和收益")
+    parser.add_argument("--hours", type=float, default=2.0, help="录音时长（小时）")
+    parser.add_argument("--silence", type=float, default=0.5, help="静音占比")
+    args = parser.parse_args()
+
+    data = make_rehearsal(args.hours, args.silence)
+    seconds = len(data) / ASR_SAMPLE_RATE
+    print(f"🎙️ 测试录音: {args.hours:g} 小时, 静音占比约 {args.silence:.0%}")
+
+    start = time.perf_counter()
+    regions, statistics = plan_trim(data, ASR_SAMPLE_RATE)
+    detect = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compact = compact_audio(data, regions) if regions else data
+    copy = time.perf_counter() - start
+
+    print(f"语音区间检测: {detect:.2f}s (实时率 {detect / seconds:.5f}), {len(regions or [])} 个区间")
+    print(f"拼接语音区间: {copy:.2f}s, {compact.nbytes / 1024 / 1024:.0f}MB")
+    print(f"跳过 {statistics['skipped_fraction']:.1%}: 交给模型 {statistics['speech_seconds']:.0f}s / "
+          f"{statistics['total_seconds']:.0f}s, 识别耗时预计降为 {1 - statistics['skipped_fraction']:.1%}")
+
+if __name__ == "__main__":
+    main()
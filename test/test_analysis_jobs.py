@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+测试视频分析接口经由任务队列执行：场景检测、运动能量
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api import video_analysis
+from backend.core.data_store import InMemoryDataStore
+from backend.core.job_queue import JobQueue
+from backend.core.motion_energy import MotionEnergyStore
+
+FPS, WIDTH, HEIGHT = 10, 160, 120
+
+def make_scene_video(path: str):
+    """三段不同颜色的画面（第4秒、第7秒切换），共10秒"""
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    for i in range(10 * FPS):
+        color = (40, 40, 200) if i < 4 * FPS else (200, 80, 40) if i < 7 * FPS else (60, 180, 60)
+        frame = np.full((HEIGHT, WIDTH, 3), color, dtype=np.uint8)
+        x = (i * 3) % (WIDTH - 20)
+        frame[50:90, x:x + 20] = 255
+        out.write(frame)
+    out.release()
+
+def make_app(root: str, data_store: InMemoryDataStore):
+    """视频分析路由 + 临时任务队列（应用启动时启动）"""
+    queue = JobQueue(os.path.join(root, "jobs.db"), workers=1)
+    queue.register("scene_detection", video_analysis.scene_detection_task)
+    queue.register("motion_energy", video_analysis.motion_energy_task)
+    app = FastAPI()
+    app.include_router(video_analysis.router, prefix="/api/video")
+    app.dependency_overrides[video_analysis.get_data_store] = lambda: data_store
+    app.add_event_handler("startup", queue.start)
+    app.add_event_handler("shutdown", queue.stop)
+    return app, queue
+
+async def request_twice(app: FastAPI, url: str):
+    """在应用的事件循环里并发发出两个相同的请求"""
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        return await asyncio.gather(client.get(url), client.get(url))
+
+def test_scene_detection_job():
+    """测试场景检测作为任务提交，完成后保存标记；未处理的视频按探测到的时长收尾"""
+    print("🔍 测试场景检测任务...")
+
+    data_store = InMemoryDataStore()
+    data_store.save_to_json = lambda path: None
+    originals = (video_analysis.job_queue, video_analysis.get_data_store)
+    with tempfile.TemporaryDirectory() as root:
+        app, queue = make_app(root, data_store)
+        video_analysis.job_queue = queue
+        video_analysis.get_data_store = lambda: data_store
+        try:
+            path = os.path.join(root, "rehearsal.mp4")
+            make_scene_video(path)
+            video = data_store.add_video("rehearsal.mp4", path)
+            assert video.duration == 0.0
+
+            with TestClient(app) as client:
+                empty = client.get(f"/api/video/{video.id}/scenes").json()
+                assert empty["detection"] is None and empty["scenes"] == [
+                    {"index": 0, "start_time": 0.0, "end_time": 10.0}
+                ], empty
+
+                submitted = client.post(f"/api/video/{video.id}/scenes", params={"min_scene_seconds": 1.0})
+                assert submitted.status_code == 200, submitted.text
+                job_id = submitted.json()["job_id"]
+                job = client.portal.call(queue.wait, job_id)
+                assert job.status == "completed", job.to_dict()
+                assert job.result["boundaries"] == 2
+
+                response = client.get(f"/api/video/{video.id}/scenes").json()
+                queue.max_depth = 0
+                full = client.post(f"/api/video/{video.id}/scenes")
+        finally:
+            video_analysis.job_queue, video_analysis.get_data_store = originals
+
+    assert response["detection"]["job_id"] == job_id and response["detection"]["status"] == "completed"
+    timestamps = [marker["timestamp"] for marker in response["markers"]]
+    assert np.allclose(timestamps, [4.0, 7.0], atol=0.21), timestamps
+    scenes = response["scenes"]
+    assert len(scenes) == 3 and scenes[0]["start_time"] == 0.0 and scenes[-1]["end_time"] == 10.0, scenes
+    assert all(a["end_time"] == b["start_time"] for a, b in zip(scenes, scenes[1:]))
+    assert full.status_code == 429 and "Retry-After" in full.headers, "队列已满时应拒绝提交"
+    print(f"✅ 场景检测任务完成: 边界 {timestamps}")
+
+def test_motion_energy_job():
+    """测试运动能量尚未计算时提交任务并返回202，重复请求不重复提交，完成后返回曲线"""
+    print("\n🔍 测试运动能量任务...")
+
+    data_store = InMemoryDataStore()
+    originals = (video_analysis.job_queue, video_analysis.get_data_store, video_analysis.motion_energy_store)
+    with tempfile.TemporaryDirectory() as root:
+        app, queue = make_app(root, data_store)
+        video_analysis.job_queue = queue
+        video_analysis.get_data_store = lambda: data_store
+        video_analysis.motion_energy_store = MotionEnergyStore(os.path.join(root, "motion_energy"))
+        try:
+            path = os.path.join(root, "rehearsal.mp4")
+            make_scene_video(path)
+            video = data_store.add_video("rehearsal.mp4", path)
+            url = f"/api/video/{video.id}/motion-energy"
+
+            with TestClient(app) as client:
+                # 两个请求同时发现尚未计算，只应提交一个任务
+                first, second = client.portal.call(request_twice, app, url)
+                assert first.status_code == 202 and second.status_code == 202, (first.text, second.text)
+                job_id = first.json()["job_id"]
+                assert second.json()["job_id"] == job_id, "同一视频只应提交一个计算任务"
+
+                job = client.portal.call(queue.wait, job_id)
+                assert job.status == "completed" and job.result["seconds"] == 10, job.to_dict()
+                response = client.get(url, params={"max_points": 4})
+        finally:
+            video_analysis.job_queue, video_analysis.get_data_store, video_analysis.motion_energy_store = originals
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["duration"] == 10 and body["bin_seconds"] == 4 and len(body["values"]) == 3, body
+    assert len(queue.list_jobs(kind="motion_energy")) == 1
+    print(f"✅ 运动能量任务完成: {body['values']}")
+
+if __name__ == "__main__":
+    test_scene_detection_job()
+    test_motion_energy_job()
+    print("\n🎉 分析任务测试通过！")
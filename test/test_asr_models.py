@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+测试FunASR模型注册表：按语言缓存、LRU淘汰、并发只加载一次和预热
+"""
+
+import os
+import sys
+import time
+import types
+import threading
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.asr_models import ASRModelRegistry
+
+class FakeAutoModel:
+    """代替funasr.AutoModel，记录加载和推理次数"""
+    loads = []
+
+    fail = False
+
+    def __init__(self, model, **kwargs):
+        time.sleep(0.05)
+        FakeAutoModel.loads.append(model)
+        if FakeAutoModel.fail:
+            raise RuntimeError("模型文件损坏")
+        self.model = model
+        self.generated = 0
+
+    def generate(self, audio, **params):
+        self.generated += 1
+        return [{"text": ""}]
+
+@contextmanager
+def fake_funasr():
+    """临时用FakeAutoModel代替funasr模块"""
+    module = types.ModuleType("funasr")
+    module.AutoModel = FakeAutoModel
+    original = sys.modules.get("funasr")
+    sys.modules["funasr"] = module
+    FakeAutoModel.loads = []
+    FakeAutoModel.fail = False
+    try:
+        yield
+    finally:
+        if original is None:
+            sys.modules.pop("funasr", None)
+        else:
+            sys.modules["funasr"] = original
+
+def test_model_cache():
+    """测试语言切换不重新加载，超出上限时淘汰最久未使用的模型"""
+    print("🔍 测试模型缓存...")
+
+    with fake_funasr():
+        registry = ASRModelRegistry(max_models=2)
+        zh = registry.get("zh")
+        en = registry.get("en")
+        assert registry.get("zh") is zh and registry.get("en") is en
+        assert len(FakeAutoModel.loads) == 2, "中英文交替时不应重新加载"
+
+        registry = ASRModelRegistry(max_models=1)
+        registry.get("zh")
+        registry.get("en")
+        assert registry.is_loaded("en") and not registry.is_loaded("zh")
+        registry.get("zh")
+        assert len(FakeAutoModel.loads) == 5 and not registry.is_loaded("en")
+    print("✅ 模型缓存和淘汰正确")
+
+def test_concurrent_load_and_warm_up():
+    """测试并发请求同一语言只加载一次，预加载会做预热推理"""
+    print("\n🔍 测试并发加载和预热...")
+
+    with fake_funasr():
+        registry = ASRModelRegistry(max_models=2)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("zh"))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(FakeAutoModel.loads) == 1 and all(model is results[0] for model in results)
+
+        registry.preload(["en"])
+        assert registry.get("en").generated == 1, "预加载的模型应当做过一次预热推理"
+        assert results[0].generated == 0
+    print("✅ 并发加载和预热正确")
+
+def test_failed_load():
+    """测试加载失败时等待中的请求收到同一异常，加载状态被清除，之后可以重新加载"""
+    print("\n🔍 测试加载失败...")
+
+    with fake_funasr():
+        registry = ASRModelRegistry(max_models=2)
+        FakeAutoModel.fail = True
+        errors = []
+
+        def load():
+            try:
+                registry.get("zh")
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=load) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        assert len(FakeAutoModel.loads) == 1, "等待中的请求不应各自重新加载"
+        assert len(errors) == 4 and all(e is errors[0] for e in errors), errors
+        assert registry._loading == {} and not registry.is_loaded("zh")
+
+        FakeAutoModel.fail = False
+        assert registry.get("zh") is not None and len(FakeAutoModel.loads) == 2
+    print("✅ 加载失败后状态已清除")
+
+if __name__ == "__main__":
+    test_model_cache()
+    test_concurrent_load_and_warm_up()
+    test_failed_load()
+    print("\n🎉 模型注册表测试通过！")
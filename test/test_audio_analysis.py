@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+测试音频分析：音频属性、语音片段检测，以及提取音频任务和音频信息接口
+"""
+
+import os
+import sys
+import asyncio
+import subprocess
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api import video_analysis
+from backend.core.audio_processor import audio_processor, decode_audio
+from backend.core.data_store import InMemoryDataStore
+
+# 1.0-2.5秒和4.0-5.0秒有声音，其余为静音
+SPEECH = [(1.0, 2.5), (4.0, 5.0)]
+SECONDS = 6
+
+class FakeJob:
+    def __init__(self):
+        self.reports = []
+
+    def report(self, progress, message=""):
+        self.reports.append((progress, message))
+
+def make_speech_video(path: str):
+    """用ffmpeg生成只在SPEECH区间内有正弦音的测试视频"""
+    import imageio_ffmpeg
+
+    gate = "+".join(f"between(t\\,{start}\\,{end})" for start, end in SPEECH)
+    subprocess.run([
+        imageio_ffmpeg.get_ffmpeg_exe(), "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size=160x120:rate=10:duration={SECONDS}",
+        "-f", "lavfi", "-i", f"aevalsrc=0.5*sin(2*PI*440*t)*({gate}):s=48000:d={SECONDS}",
+        "-c:v", "libx264", "-c:a", "aac", "-shortest", path
+    ], check=True)
+
+def check_segments(segments):
+    """语音片段应覆盖SPEECH区间，前后各多出padding（0.3秒）"""
+    assert len(segments) == len(SPEECH), segments
+    for segment, (start, end) in zip(segments, SPEECH):
+        assert abs(segment["start_time"] - (start - 0.3)) < 0.1, segments
+        assert abs(segment["end_time"] - (end + 0.3)) < 0.1, segments
+        assert abs(segment["duration"] - (segment["end_time"] - segment["start_time"])) < 1e-3
+
+def test_analyze_audio():
+    """测试音频属性和语音片段，文件路径和已解码的采样结果相同"""
+    print("🔍 测试音频属性和语音片段...")
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "rehearsal.mp4")
+        make_speech_video(path)
+
+        properties = audio_processor.analyze_audio_properties(path)
+        assert abs(properties["duration"] - SECONDS) < 0.1 and properties["sample_rate"] == 16000, properties
+        assert -7.5 < properties["peak_db"] < -5.0, properties
+        # 有声部分占 2.5/6，有效值约为 -9dB + 10*log10(2.5/6)
+        assert abs(properties["rms_db"] - (-9.0 + 10 * np.log10(2.5 / 6))) < 1.0, properties
+        assert abs(properties["silence_ratio"] - 3.5 / 6) < 0.05, properties
+
+        segments = audio_processor.detect_speech_segments(path)
+        check_segments(segments)
+
+        data = decode_audio(path)
+        assert audio_processor.analyze_audio_properties(data) == properties
+        assert audio_processor.detect_speech_segments(data) == segments
+
+    silent = np.zeros(16000, dtype=np.float32)
+    assert audio_processor.detect_speech_segments(silent) == []
+    assert audio_processor.analyze_audio_properties(silent)["silence_ratio"] == 1.0
+    print(f"✅ 音频属性 {properties}, 语音片段 {[(s['start_time'], s['end_time']) for s in segments]}")
+
+def test_extract_audio_task_and_info():
+    """测试提取音频任务返回音频属性，音频信息接口返回属性和语音片段"""
+    print("\n🔍 测试提取音频任务和音频信息接口...")
+
+    data_store = InMemoryDataStore()
+    app = FastAPI()
+    app.include_router(video_analysis.router, prefix="/api/video")
+    app.dependency_overrides[video_analysis.get_data_store] = lambda: data_store
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "rehearsal.mp4")
+        make_speech_video(path)
+        video = data_store.add_video("rehearsal.mp4", path)
+
+        job = FakeJob()
+        result = asyncio.run(video_analysis.extract_audio_task(job, video.id, path))
+        assert job.reports == [(0.5, "音频已提取")]
+        assert abs(result["audio_properties"]["duration"] - SECONDS) < 0.1, result
+
+        with TestClient(app) as client:
+            response = client.get(f"/api/video/{video.id}/audio-info")
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["audio_properties"] == result["audio_properties"]
+    check_segments(body["speech_segments"])
+    print(f"✅ 音频信息: {len(body['speech_segments'])} 个语音片段")
+
+if __name__ == "__main__":
+    test_analyze_audio()
+    test_extract_audio_task_and_info()
+    print("\n🎉 音频分析测试通过！")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+测试长音频分块识别：静音处切分、时间戳拼接和说话人编号对齐
+"""
+
+import os
+import sys
+import asyncio
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.audio_chunking import ChunkingConfig, ChunkStitcher, find_split_points, plan_chunks
+from backend.core.shared_audio import SharedAudio, attach_audio
+from backend.core import asr_pool
+
+SR = 16000
+CONFIG = ChunkingConfig(chunk_seconds=20.0, search_seconds=8.0, overlap_seconds=12.0)
+
+# 整段录音中的句子：(开始ms, 结束ms, 说话人)，句间有0.6~1.5s停顿
+UTTERANCES = []
+_time, _speaker = 500, 0
+while _time < 95000:
+    length = 1500 + (_time * 7) % 2500
+    UTTERANCES.append((_time, _time + length, _speaker))
+    _time += length + 600 + (_time * 13) % 900
+    _speaker = (_speaker + 1) % 3
+
+def make_recording() -> np.ndarray:
+    """句子处为噪声，停顿处为极低电平"""
+    rng = np.random.default_rng(0)
+    data = (rng.standard_normal(SR * 100) * 1e-4).astype(np.float32)
+    for begin, end, _ in UTTERANCES:
+        data[begin * SR // 1000:end * SR // 1000] = rng.standard_normal((end - begin) * SR // 1000) * 0.3
+    return data
+
+def is_silent(sample: int) -> bool:
+    ms = sample * 1000 // SR
+    return all(not (begin <= ms < end) for begin, end, _ in UTTERANCES)
+
+def fake_recognize(ref, language, enable_speaker_diarization, hotwords):
+    """代替识别：返回落在该区间内的句子（块内时间），说话人编号按块随机打乱"""
+    with attach_audio(ref) as data:
+        assert len(data) == ref.length
+    begin_ms = ref.offset * 1000 // SR
+    end_ms = (ref.offset + ref.length) * 1000 // SR
+    permutation = np.random.default_rng(ref.offset).permutation(3)
+    sentences = [
+        {
+            "text": f"句{start}",
+            "start": start - begin_ms,
+            "end": end - begin_ms,
+            "timestamp": [[start - begin_ms, end - begin_ms]],
+            "spk": int(permutation[speaker])
+        }
+        for start, end, speaker in UTTERANCES if start >= begin_ms and end <= end_ms
+    ]
+    return {"text": "", "sentences": sentences, "raw_text": "", "timestamp": []}
+
+def test_split_on_silence():
+    """测试切分点落在停顿处，块长有上限"""
+    print("🔍 测试静音处切分...")
+
+    data = make_recording()
+    points = find_split_points(data, SR, CONFIG)
+    assert len(points) >= 3, f"切分点太少: {points}"
+    for point in points:
+        assert is_silent(point), f"切分点 {point / SR:.2f}s 不在停顿处"
+
+    chunks = plan_chunks(data, SR, CONFIG)
+    assert chunks[0].start == 0 and chunks[-1].end == len(data)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.end == chunk.cut and chunk.start == chunk.cut - int(CONFIG.overlap_seconds * SR)
+    assert max(chunk.end - chunk.cut for chunk in chunks) <= CONFIG.chunk_seconds * 1.5 * SR
+
+    assert len(plan_chunks(data[:SR * 25], SR, CONFIG)) == 1, "短音频不分块"
+    print(f"✅ {len(chunks)} 块，切分点都在停顿处")
+
+def test_stitch_speakers():
+    """测试拼接后时间戳连续、重叠区句子不重复、说话人编号一致"""
+    print("\n🔍 测试结果拼接...")
+
+    data = make_recording()
+    with SharedAudio.create(data, SR) as shared:
+        original = asr_pool.run_asr, asr_pool.TRIM_ENABLED
+
+        async def run_asr(func, ref, *args):
+            return fake_recognize(ref, *args)
+
+        # 模拟识别按原始时间轴生成句子，不去除静音
+        asr_pool.run_asr, asr_pool.TRIM_ENABLED = run_asr, False
+        try:
+            result = asyncio.run(asr_pool.recognize_shared(shared, "zh", True, "", CONFIG))
+        finally:
+            asr_pool.run_asr, asr_pool.TRIM_ENABLED = original
+
+    sentences = result["sentences"]
+    # 切分点都在停顿处，每句都完整地落在某一块的保留区间内
+    expected = UTTERANCES
+    assert [s["timestamp"][0][0] for s in sentences] == [u[0] for u in expected], "句子缺失或重复"
+    assert [s["end"] for s in sentences] == [u[1] for u in expected]
+
+    # 全局编号与真实说话人一一对应
+    pairs = {(s["spk"], u[2]) for s, u in zip(sentences, expected)}
+    assert len(pairs) == 3, f"说话人编号不一致: {pairs}"
+    assert result["srt"].count("-->") == len(sentences)
+    print(f"✅ {len(sentences)} 句拼接正确，说话人编号一致")
+
+def test_in_flight_limit():
+    """测试同时提交到进程池的块不超过ASR工作进程数，完成一块再提交下一块"""
+    print("\n🔍 测试并行块数上限...")
+
+    data = make_recording()
+    running, peaks = [0], []
+
+    async def run_asr(func, ref, *args):
+        running[0] += 1
+        peaks.append(running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return fake_recognize(ref, *args)
+
+    original = asr_pool.run_asr, asr_pool.TRIM_ENABLED, asr_pool.POOL_LIMITS["asr"]
+    asr_pool.run_asr, asr_pool.TRIM_ENABLED = run_asr, False
+    try:
+        for limit in (1, 2):
+            asr_pool.POOL_LIMITS["asr"] = limit
+            peaks.clear()
+            with SharedAudio.create(data, SR) as shared:
+                result = asyncio.run(asr_pool.recognize_shared(shared, "zh", True, "", CONFIG))
+            assert len(peaks) == len(plan_chunks(data, SR, CONFIG)) and max(peaks) == limit, (limit, peaks)
+            assert len(result["sentences"]) == len(UTTERANCES)
+    finally:
+        asr_pool.run_asr, asr_pool.TRIM_ENABLED, asr_pool.POOL_LIMITS["asr"] = original
+    print(f"✅ {len(peaks)} 块，同时识别不超过ASR工作进程数")
+
+def test_stitch_order():
+    """测试必须按顺序拼接"""
+    chunks = plan_chunks(make_recording(), SR, CONFIG)
+    stitcher = ChunkStitcher(SR)
+    try:
+        stitcher.add(chunks[1], {"sentences": []})
+        assert False, "乱序拼接应当报错"
+    except ValueError:
+        pass
+
+if __name__ == "__main__":
+    test_split_on_silence()
+    test_stitch_speakers()
+    test_in_flight_limit()
+    test_stitch_order()
+    print("\n🎉 长音频分块测试通过！")
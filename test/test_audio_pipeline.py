@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+测试音频解码和识别前的预处理
+"""
+
+import os
+import sys
+import subprocess
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.audio_processor import (
+    decode_audio, convert_pcm_to_float, downmix_to_mono, prepare_audio, ASR_SAMPLE_RATE
+)
+
+def make_media(path: str, audio: bool = True, seconds: float = 3.0, frequency: int = 440):
+    """用ffmpeg生成带立体声48kHz正弦音轨（或无音轨）的测试视频"""
+    import imageio_ffmpeg
+
+    cmd = [imageio_ffmpeg.get_ffmpeg_exe(), "-v", "error", "-y",
+           "-f", "lavfi", "-i", f"testsrc=size=160x120:rate=10:duration={seconds}"]
+    if audio:
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=48000:duration={seconds}",
+                "-ac", "2", "-c:a", "aac", "-shortest"]
+    cmd += ["-c:v", "libx264", path]
+    subprocess.run(cmd, check=True)
+
+def test_decode_audio():
+    """测试从视频直接解码为16kHz单声道float32"""
+    print("🔍 测试音频管道解码...")
+
+    with tempfile.TemporaryDirectory() as root:
+        video_path = os.path.join(root, "tone.mp4")
+        make_media(video_path)
+
+        data = decode_audio(video_path)
+        assert data.dtype == np.float32 and data.ndim == 1
+        assert abs(len(data) / ASR_SAMPLE_RATE - 3.0) < 0.05, f"时长错误: {len(data) / ASR_SAMPLE_RATE}"
+
+        spectrum = np.abs(np.fft.rfft(data[:ASR_SAMPLE_RATE]))
+        assert spectrum.argmax() == 440, f"主频错误: {spectrum.argmax()}"
+        print("✅ 解码结果正确")
+
+        silent_path = os.path.join(root, "silent.mp4")
+        make_media(silent_path, audio=False)
+        try:
+            decode_audio(silent_path)
+            assert False, "没有音轨时应当报错"
+        except Exception as e:
+            assert "没有音频" in str(e)
+        print("✅ 无音轨检测正确")
+
+def test_float32_preprocessing():
+    """测试预处理全程保持float32，float32输入不复制"""
+    print("\n🔍 测试float32预处理...")
+
+    pcm = np.array([0, 16384, -32768, 32767], dtype=np.int16)
+    converted = convert_pcm_to_float(pcm)
+    assert converted.dtype == np.float32
+    assert np.allclose(converted, [0.0, 0.5, -1.0, 32767 / 32768])
+
+    data = np.zeros(ASR_SAMPLE_RATE, dtype=np.float32)
+    assert convert_pcm_to_float(data) is data
+    assert prepare_audio((ASR_SAMPLE_RATE, data)) is data
+    assert convert_pcm_to_float(data.astype(np.float64)).dtype == np.float32
+    assert prepare_audio((48000, np.zeros(48000, dtype=np.int16))).dtype == np.float32
+    print("✅ float32预处理正确")
+
+def test_downmix_and_resample():
+    """测试先混音再重采样"""
+    print("\n🔍 测试混音和重采样...")
+
+    sr = 48000
+    tone = np.sin(2 * np.pi * 440 * np.arange(sr) / sr).astype(np.float32)
+    stereo = np.stack([tone, np.zeros_like(tone)], axis=1)
+    original = stereo.copy()
+
+    assert np.allclose(downmix_to_mono(stereo), tone / 2)
+    assert np.allclose(downmix_to_mono(stereo, channel=1), 0)
+    assert np.allclose(downmix_to_mono(stereo.T), tone / 2), "(声道数, 采样数) 布局"
+    assert np.array_equal(stereo, original), "输入不应被修改"
+
+    pcm = (stereo * 16384).astype(np.int16)
+    assert np.allclose(downmix_to_mono(pcm), tone / 4, atol=1e-4)
+
+    for rate in (48000, 44100):
+        data = np.stack([np.sin(2 * np.pi * 440 * np.arange(rate) / rate)] * 2, axis=1).astype(np.float32)
+        mono = prepare_audio((rate, data))
+        assert mono.dtype == np.float32 and mono.ndim == 1
+        assert abs(len(mono) - ASR_SAMPLE_RATE) <= 1, f"{rate}Hz 重采样长度错误: {len(mono)}"
+        assert np.abs(np.fft.rfft(mono)).argmax() == 440
+    print("✅ 混音和重采样正确")
+
+if __name__ == "__main__":
+    test_decode_audio()
+    test_float32_preprocessing()
+    test_downmix_and_resample()
+    print("\n🎉 音频管道测试通过！")
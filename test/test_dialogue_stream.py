@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试台词流式提取：分块完成即推送segment事件，最后推送summary
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api import dialogue_extraction
+from backend.core import asr_pool
+from backend.core.data_store import InMemoryDataStore
+from backend.core.job_queue import JobQueue
+from backend.core.transcript_cache import TranscriptCache
+from test_audio_pipeline import make_media
+
+def fake_recognize(ref, language, enable_speaker_diarization, hotwords):
+    """代替识别：每5秒一句，说话人按句交替（后续块的局部编号与第一块相反）"""
+    begin_ms = ref.offset * 1000 // ref.sample_rate
+    end_ms = (ref.offset + ref.length) * 1000 // ref.sample_rate
+    sentences = []
+    for index in range(end_ms // 5000 + 1):
+        start = index * 5000 + 500
+        if start >= begin_ms and start + 2000 <= end_ms:
+            sentences.append({
+                "text": f"第{index}句",
+                "start": start - begin_ms,
+                "end": start + 2000 - begin_ms,
+                "timestamp": [[start - begin_ms, start + 2000 - begin_ms]],
+                "spk": index % 2 if begin_ms == 0 else 1 - index % 2
+            })
+    return {"text": "", "sentences": sentences, "raw_text": "", "timestamp": []}
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def make_app(root: str, data_store: InMemoryDataStore):
+    """台词提取路由 + 临时任务队列（应用启动时启动）"""
+    queue = JobQueue(os.path.join(root, "jobs.db"), workers=1)
+    queue.register("dialogue_extraction", dialogue_extraction.dialogue_extraction_task)
+    app = FastAPI()
+    app.include_router(dialogue_extraction.router)
+    app.dependency_overrides[dialogue_extraction.get_data_store] = lambda: data_store
+    app.add_event_handler("startup", queue.start)
+    app.add_event_handler("shutdown", queue.stop)
+    return app, queue
+
+def run_extraction(path: str, seconds: float):
+    """用模拟识别上传一段录音，返回 (数据存储, 任务队列, 流式响应, 普通响应, 队列满时的响应)"""
+    data_store = InMemoryDataStore()
+    originals = (asr_pool.run_asr, asr_pool.transcript_cache, dialogue_extraction.job_queue,
+                 dialogue_extraction.get_data_store)
+
+    async def run_asr(func, ref, *args):
+        return fake_recognize(ref, *args)
+
+    with tempfile.TemporaryDirectory() as root:
+        app, queue = make_app(root, data_store)
+        asr_pool.run_asr = run_asr
+        asr_pool.transcript_cache = TranscriptCache(os.path.join(root, "cache"))
+        dialogue_extraction.job_queue = queue
+        dialogue_extraction.get_data_store = lambda: data_store
+        try:
+            video_path = os.path.join(root, "rehearsal.mp4")
+            make_media(video_path, seconds=seconds)
+            with TestClient(app) as client, open(video_path, "rb") as video:
+                upload = {"file": ("rehearsal.mp4", video.read(), "video/mp4")}
+                form = {"language": "zh", "enable_speaker_diarization": "true"}
+                streamed = client.post(path + "/stream", files=upload, data=form)
+                plain = client.post(path, files=upload, data=form)
+
+                bad = client.post(path + "/stream", files={"file": ("notes.txt", b"hello", "text/plain")})
+                assert bad.status_code == 400
+
+                queue.max_depth = 0
+                full = client.post(path, files=upload, data=form)
+        finally:
+            (asr_pool.run_asr, asr_pool.transcript_cache, dialogue_extraction.job_queue,
+             dialogue_extraction.get_data_store) = originals
+    return data_store, queue, streamed, plain, full
+
+def test_stream_segments():
+    """测试按块推送台词，summary包含说话人统计和SRT，结果已保存；识别经由任务队列"""
+    print("🔍 测试流式台词提取...")
+
+    data_store, queue, response, plain, full = run_extraction("/api/dialogue/upload-video", 70.0)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "job" and kinds[-1] == "summary" and set(kinds[1:-1]) == {"segment"}, kinds
+    segments = [data for kind, data in events if kind == "segment"]
+    assert [s["text"] for s in segments] == [f"第{i}句" for i in range(14)], "句子缺失、重复或乱序"
+    assert set(segments[0]) == {"id", "text", "start_time", "end_time", "speaker_id", "confidence", "emotion"}
+    assert segments[3]["start_time"] == 15.5
+    assert {s["speaker_id"] for s in segments} == {"spk_0", "spk_1"}
+    assert all(a["speaker_id"] != b["speaker_id"] for a, b in zip(segments, segments[1:])), "跨块说话人编号不一致"
+    print(f"✅ 推送 {len(segments)} 个片段")
+
+    summary = events[-1][1]
+    assert summary["total_segments"] == len(segments)
+    assert summary["speaker_statistics"]["total_speakers"] == 2
+    assert summary["srt_content"].count("-->") == len(segments)
+    saved = data_store.get_video_data(summary["video_id"])
+    assert [t["id"] for t in saved["transcripts"]] == [s["id"] for s in segments], "保存的片段应与推送的一致"
+    print("✅ 汇总和保存正确")
+
+    # 普通上传同样作为任务执行，等待完成后返回全部台词
+    assert plain.status_code == 200, plain.text
+    body = plain.json()
+    assert [t["text"] for t in body["transcripts"]] == [f"第{i}句" for i in range(14)]
+    assert body["total_segments"] == 14
+
+    jobs = queue.list_jobs(kind="dialogue_extraction")
+    assert [job.status for job in jobs] == ["completed", "completed"], [job.to_dict() for job in jobs]
+    assert jobs[-1].id == events[0][1]["job_id"] and jobs[0].result["video_id"] == body["video_id"]
+    assert full.status_code == 429 and "Retry-After" in full.headers, "队列已满时应拒绝提交"
+    print("✅ 台词提取经由任务队列")
+
+if __name__ == "__main__":
+    test_stream_segments()
+    print("\n🎉 流式台词提取测试通过！")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+测试执行器层：run_io/run_cpu/run_asr 分别在I/O线程池、CPU进程池、ASR进程池中执行，
+进程池不以fork方式启动，关闭后工作进程退出
+"""
+
+import os
+import sys
+import asyncio
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import executors
+from backend.core.asr_models import get_asr_worker_status
+
+def where():
+    """返回执行所在的进程、线程和推理线程数设置"""
+    return os.getpid(), threading.current_thread().name, os.environ.get("OMP_NUM_THREADS")
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+async def run_everywhere():
+    return await asyncio.gather(
+        executors.run_io(where),
+        executors.run_cpu(where),
+        executors.run_asr(where),
+        executors.run_asr(get_asr_worker_status)
+    )
+
+def test_pools_and_shutdown():
+    """测试三类工作各自进入对应的执行器，关闭后执行器被移除、工作进程退出，之后可重新创建"""
+    print("🔍 测试执行器分派...")
+
+    executors.shutdown_executors(wait=True)
+    assert not any(stats["started"] for stats in executors.get_executor_statistics().values())
+
+    io, cpu, asr, asr_status = asyncio.run(run_everywhere())
+    pid = os.getpid()
+    assert io[0] == pid and io[1].startswith("io"), f"run_io应在本进程的I/O线程中执行: {io}"
+    assert cpu[0] != pid and cpu[1] == "MainThread", f"run_cpu应在CPU工作进程中执行: {cpu}"
+    assert asr[0] not in (pid, cpu[0]), f"run_asr应在独立的ASR工作进程中执行: {asr}"
+    assert asr[2] == str(executors.ASR_THREADS), "ASR工作进程应已执行初始化函数"
+    assert asr_status["pid"] == asr[0] and asr_status["loaded_models"] == []
+    statistics = executors.get_executor_statistics()
+    assert all(statistics[kind]["started"] for kind in ("io", "cpu", "asr")), statistics
+    for kind in ("cpu", "asr"):
+        method = executors._executors[kind]._mp_context.get_start_method()
+        assert method == executors.PROCESS_START_METHOD and method != "fork", f"{kind}工作进程不应由fork创建: {method}"
+    print(f"✅ io线程 {io[1]}, cpu进程 {cpu[0]}, asr进程 {asr[0]}")
+
+    print("\n🔍 测试执行器关闭...")
+    executors.shutdown_executors(wait=True)
+    assert executors._executors == {}
+    assert not pid_alive(cpu[0]) and not pid_alive(asr[0]), "关闭后工作进程应已退出"
+
+    io, cpu, _, _ = asyncio.run(run_everywhere())
+    assert cpu[0] != pid, "关闭后再次使用应重新创建执行器"
+    executors.shutdown_executors(wait=True)
+    print("✅ 执行器关闭正确")
+
+if __name__ == "__main__":
+    test_pools_and_shutdown()
+    print("\n🎉 执行器测试通过！")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+测试时间轴胶片条：雪碧图尺寸、图块数量、时间戳与图块坐标，以及接口生成后移除生成锁
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.api import video_analysis
+from backend.core.data_store import InMemoryDataStore
+from backend.core.filmstrip import FILMSTRIP_VERSION, generate_filmstrip, load_filmstrip_index
+
+FPS, WIDTH, HEIGHT = 10, 320, 240
+
+def make_video(path: str, seconds: int = 10):
+    """每秒换一种亮度（第s秒为 20*s），便于核对图块取自哪一帧"""
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    for i in range(seconds * FPS):
+        out.write(np.full((HEIGHT, WIDTH, 3), 20 * (i // FPS), dtype=np.uint8))
+    out.release()
+
+def test_generate_filmstrip():
+    """测试图块按间隔取帧、缩到图块尺寸，雪碧图按行列排布，最后一张只保留用到的行"""
+    print("🔍 测试胶片条生成...")
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "rehearsal.mp4")
+        make_video(path)
+        output_dir = os.path.join(root, "filmstrip")
+        index = generate_filmstrip(path, output_dir, interval=2.0, tile_width=80, columns=2, rows=2)
+
+        assert index["version"] == FILMSTRIP_VERSION and index["duration"] == 10.0
+        assert (index["tile_width"], index["tile_height"]) == (80, 60), index
+        tiles = index["tiles"]
+        assert [tile["timestamp"] for tile in tiles] == [0.0, 2.0, 4.0, 6.0, 8.0], tiles
+        assert [(tile["sheet"], tile["x"], tile["y"]) for tile in tiles] == [
+            (0, 0, 0), (0, 80, 0), (0, 0, 60), (0, 80, 60), (1, 0, 0)
+        ], tiles
+        assert index["sheets"] == ["sheet_000.jpg", "sheet_001.jpg"]
+
+        sheets = [cv2.imread(os.path.join(output_dir, name)) for name in index["sheets"]]
+        assert sheets[0].shape == (120, 160, 3), sheets[0].shape
+        assert sheets[1].shape == (60, 160, 3), "最后一张只保留实际用到的行"
+        for tile in tiles:
+            block = sheets[tile["sheet"]][tile["y"]:tile["y"] + 60, tile["x"]:tile["x"] + 80]
+            expected = 20 * tile["timestamp"]
+            assert abs(float(block.mean()) - expected) < 6, f"{tile['timestamp']}s 的图块取错了帧: {block.mean()}"
+        assert sorted(os.listdir(output_dir)) == ["index.json", "sheet_000.jpg", "sheet_001.jpg"], "不应留下临时文件"
+
+        assert load_filmstrip_index(output_dir, path) == index
+        os.utime(path, (0, 0))
+        assert load_filmstrip_index(output_dir, path) is None, "源文件变化后缓存应失效"
+    print(f"✅ {len(tiles)} 个图块, {len(index['sheets'])} 张雪碧图")
+
+def test_filmstrip_endpoint():
+    """测试接口生成胶片条后返回雪碧图地址，生成锁被移除，再次请求直接读缓存"""
+    print("\n🔍 测试胶片条接口...")
+
+    data_store = InMemoryDataStore()
+    app = FastAPI()
+    app.include_router(video_analysis.router, prefix="/api/video")
+    app.dependency_overrides[video_analysis.get_data_store] = lambda: data_store
+
+    original = video_analysis._filmstrip_dir
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "rehearsal.mp4")
+        make_video(path, seconds=4)
+        video = data_store.add_video("rehearsal.mp4", path)
+        video_analysis._filmstrip_dir = lambda video_id, interval, tile_width: Path(root) / video_id / f"{interval:g}"
+        try:
+            with TestClient(app) as client:
+                response = client.get(f"/api/video/{video.id}/filmstrip", params={"interval": 1, "tile_width": 64})
+                assert response.status_code == 200, response.text
+                index = response.json()
+                assert len(index["tiles"]) == 4 and index["tile_height"] == 48, index
+                assert video_analysis._filmstrip_locks == {}, "生成结束后应移除生成锁"
+
+                sheet = client.get(index["sheets"][0])
+                assert sheet.status_code == 200 and sheet.headers["content-type"] == "image/jpeg"
+                image = cv2.imdecode(np.frombuffer(sheet.content, np.uint8), cv2.IMREAD_COLOR)
+                assert image.shape == (48, 640, 3), "默认每行10个图块，只用到一行"
+
+                assert client.get(f"/api/video/{video.id}/filmstrip", params={"interval": 1, "tile_width": 64}).json() == index
+                assert video_analysis._filmstrip_locks == {}
+        finally:
+            video_analysis._filmstrip_dir = original
+    print("✅ 接口返回正确，生成锁已移除")
+
+if __name__ == "__main__":
+    test_generate_filmstrip()
+    test_filmstrip_endpoint()
+    print("\n🎉 胶片条测试通过！")
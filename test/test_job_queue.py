@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+测试持久化任务队列：并发上限、重试、取消和重启恢复
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.job_queue import JobQueue, JobContext, QueueFullError
+
+async def wait_until(condition, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("等待超时")
+
+def test_concurrency_and_retry():
+    """测试工作协程数限制并发，失败的任务按退避重试"""
+    print("🔍 测试任务并发和重试...")
+
+    async def scenario(db_path):
+        queue = JobQueue(db_path=db_path, workers=2, retry_base_delay=0.05)
+        running = 0
+        peak = 0
+
+        async def sleep_job(job: JobContext, seconds: float):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            job.report(0.5, "进行中")
+            await asyncio.sleep(seconds)
+            running -= 1
+            return {"slept": seconds}
+
+        attempts = []
+
+        async def flaky_job(job: JobContext):
+            attempts.append(job.job.attempts)
+            if len(attempts) < 3:
+                raise RuntimeError("临时错误")
+            return {"attempts": len(attempts)}
+
+        queue.register("sleep", sleep_job)
+        queue.register("flaky", flaky_job)
+        queue.start()
+
+        jobs = [queue.submit("sleep", params={"seconds": 0.05}) for _ in range(5)]
+        flaky = queue.submit("flaky", max_attempts=3)
+        await wait_until(lambda: all(queue.get(job.id).status == "completed" for job in jobs + [flaky]))
+
+        assert peak == 2, f"并发数超过上限: {peak}"
+        assert queue.get(jobs[0].id).result == {"slept": 0.05}
+        assert queue.get(flaky.id).attempts == 3 and attempts == [1, 2, 3]
+
+        failing = queue.submit("flaky", max_attempts=1)
+        attempts.clear()
+        await wait_until(lambda: queue.get(failing.id).status == "failed")
+        assert queue.get(failing.id).error == "临时错误"
+
+        # wait在任务结束时返回，失败后重新排队时继续等待
+        attempts.clear()
+        retried = queue.submit("flaky", max_attempts=3)
+        finished = await asyncio.wait_for(queue.wait(retried.id), 5)
+        assert finished.status == "completed" and finished.result == {"attempts": 3}
+        assert (await queue.wait(retried.id)).status == "completed", "已结束的任务应立即返回"
+        assert await queue.wait("missing") is None
+        await queue.stop()
+
+    with tempfile.TemporaryDirectory() as root:
+        asyncio.run(scenario(os.path.join(root, "jobs.db")))
+    print("✅ 并发限制和重试正确")
+
+def test_cancel_and_recover():
+    """测试取消排队中和运行中的任务，以及重启后重新排队"""
+    print("\n🔍 测试任务取消和恢复...")
+
+    async def scenario(db_path):
+        queue = JobQueue(db_path=db_path, workers=1)
+        started = asyncio.Event()
+
+        async def long_job(job: JobContext):
+            started.set()
+            await asyncio.sleep(10)
+
+        queue.register("long", long_job)
+        queue.start()
+
+        first = queue.submit("long")
+        second = queue.submit("long")
+        await asyncio.wait_for(started.wait(), 5)
+
+        waiters = [asyncio.ensure_future(queue.wait(job.id)) for job in (first, second, second)]
+        assert queue.cancel(second.id).status == "cancelled"
+        queue.cancel(first.id)
+        finished = await asyncio.wait_for(asyncio.gather(*waiters), 5)
+        assert [job.status for job in finished] == ["cancelled"] * 3
+
+        # 停止时运行中的任务保持running，重启后重新排队
+        started.clear()
+        third = queue.submit("long")
+        await asyncio.wait_for(started.wait(), 5)
+        await queue.stop()
+        assert queue.get(third.id).status == "running"
+
+        restarted = JobQueue(db_path=db_path, workers=1)
+        restarted.register("long", long_job)
+        assert restarted.recover() == 1
+        assert restarted.get(third.id).status == "queued"
+        assert restarted.get(second.id).status == "cancelled"
+
+    with tempfile.TemporaryDirectory() as root:
+        asyncio.run(scenario(os.path.join(root, "jobs.db")))
+    print("✅ 取消和恢复正确")
+
+def test_recover_exhausted():
+    """测试重启时已用完尝试次数的任务标记为失败，取任务时也跳过这类任务"""
+    print("\n🔍 测试重启恢复的尝试次数限制...")
+
+    async def scenario(db_path):
+        queue = JobQueue(db_path=db_path, workers=1)
+        started = asyncio.Event()
+        runs = []
+
+        async def long_job(job: JobContext):
+            runs.append(job.job.id)
+            started.set()
+            await asyncio.sleep(10)
+
+        queue.register("long", long_job)
+        queue.start()
+
+        # 只允许执行一次的任务（等待结果的请求随重启断开）在运行中被中断
+        once = queue.submit("long", max_attempts=1)
+        await asyncio.wait_for(started.wait(), 5)
+        await queue.stop()
+
+        # 已经崩溃过max_attempts次的任务（模拟：尝试次数已用完但仍为running）
+        crashing = queue.submit("long", max_attempts=3)
+        queue._update(crashing.id, status="running", attempts=3)
+        retrying = queue.submit("long", max_attempts=3)
+        queue._update(retrying.id, status="running", attempts=1)
+        exhausted = queue.submit("long", max_attempts=2)
+        queue._update(exhausted.id, attempts=2)
+
+        restarted = JobQueue(db_path=db_path, workers=1)
+        assert restarted._claim_next() is None, "已用完尝试次数的排队任务不应被取出"
+        assert restarted.recover() == 1
+        assert restarted.get(retrying.id).status == "queued"
+        for job_id in (once.id, crashing.id, exhausted.id):
+            job = restarted.get(job_id)
+            assert job.status == "failed" and job.finished_at is not None, job.to_dict()
+            assert "最大尝试次数" in job.error
+
+        claimed = restarted._claim_next()
+        assert claimed.id == retrying.id and claimed.attempts == 2
+        assert restarted._claim_next() is None
+        assert runs == [once.id]
+
+    with tempfile.TemporaryDirectory() as root:
+        asyncio.run(scenario(os.path.join(root, "jobs.db")))
+    print("✅ 用完尝试次数的任务不再重新执行")
+
+def test_priority_and_admission():
+    """测试interactive优先、短任务优先，以及队列满时拒绝提交"""
+    print("\n🔍 测试任务调度和准入控制...")
+
+    async def scenario(db_path):
+        queue = JobQueue(db_path=db_path, workers=1, max_depth=5)
+        order = []
+
+        async def record_job(job: JobContext, name: str):
+            order.append(name)
+
+        queue.register("transcribe", record_job)
+        queue.register("info", record_job, cost_factor=0.01)
+
+        # 提交时工作协程尚未启动，启动后按调度顺序执行
+        queue.submit("transcribe", params={"name": "batch_clip"}, priority="batch", media_duration=20)
+        queue.submit("transcribe", params={"name": "hour_long"}, media_duration=3600)
+        queue.submit("transcribe", params={"name": "clip"}, media_duration=20)
+        queue.submit("info", params={"name": "hour_long_info"}, media_duration=3600)
+
+        # batch任务只能占用队列深度的80%（4个），interactive可以用满
+        try:
+            queue.submit("transcribe", params={"name": "rejected"}, priority="batch")
+            assert False, "batch任务应当被拒绝"
+        except QueueFullError as e:
+            assert e.retry_after >= 1
+        queue.submit("transcribe", params={"name": "unknown_length"})
+        try:
+            queue.submit("transcribe", params={"name": "rejected"})
+            assert False, "队列已满时应当拒绝"
+        except QueueFullError:
+            pass
+
+        queue.start()
+        await wait_until(lambda: len(order) == 5)
+        await queue.stop()
+
+        assert order == ["clip", "hour_long_info", "unknown_length", "hour_long", "batch_clip"], order
+
+    with tempfile.TemporaryDirectory() as root:
+        asyncio.run(scenario(os.path.join(root, "jobs.db")))
+    print("✅ 调度顺序和准入控制正确")
+
+if __name__ == "__main__":
+    test_concurrency_and_retry()
+    test_cancel_and_recover()
+    test_recover_exhausted()
+    test_priority_and_admission()
+    print("\n🎉 任务队列测试通过！")
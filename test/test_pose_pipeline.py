@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+测试演员位置提取流水线：HOG检测（无姿态模型时的退回路径）、分段检测结果合并和帧下标偏移
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import cv2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.pose_pipeline import ActorPositionPipeline, PersonDetector, PoseConfig, detect_segment
+from backend.core.tracker import MultiPersonTracker
+
+FPS, WIDTH, HEIGHT = 10, 640, 360
+CONFIG = PoseConfig(sample_fps=2.0, batch_size=3, segment_seconds=4.0, workers=2)
+
+def draw_figure(frame: np.ndarray, cx: int, top: int, scale: float = 1.3):
+    """在浅色背景上画一个站立的人形（头、躯干、四肢）"""
+    color = (40, 40, 40)
+    point = lambda dx, dy: (int(cx + dx * scale), int(top + dy * scale))
+    cv2.circle(frame, point(0, 12), int(11 * scale), color, -1)
+    cv2.ellipse(frame, point(0, 55), (int(16 * scale), int(32 * scale)), 0, 0, 360, color, -1)
+    for side in (-1, 1):
+        cv2.line(frame, point(6 * side, 80), point(14 * side, 140), color, int(9 * scale))
+        cv2.line(frame, point(14 * side, 35), point(26 * side, 85), color, int(7 * scale))
+
+def make_video(path: str, seconds: int = 8):
+    """两名演员在画面两侧缓慢走动"""
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    for i in range(seconds * FPS):
+        frame = np.full((HEIGHT, WIDTH, 3), 200, dtype=np.uint8)
+        draw_figure(frame, 150 + i, 100)
+        draw_figure(frame, 480 - i, 90)
+        out.write(frame)
+    out.release()
+
+class RecordingTracker(MultiPersonTracker):
+    """记录流水线合并后交给跟踪器的输入"""
+
+    def track(self, timestamps, frame_ids, detections):
+        self.inputs = (timestamps, frame_ids, detections)
+        return super().track(timestamps, frame_ids, detections)
+
+def test_hog_detect_segment():
+    """测试没有姿态模型时退回HOG，单段检测结果的时间戳和帧下标正确，不改变进程的OpenCV线程数"""
+    print("🔍 测试HOG分段检测...")
+
+    assert PersonDetector(model_path="missing.task").backend == "hog"
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "stage.mp4")
+        make_video(path)
+        threads = cv2.getNumThreads()
+        cv2.setNumThreads(3)
+        try:
+            result = detect_segment(path, 4.0, 8.0, vars(CONFIG))
+            assert cv2.getNumThreads() == 3, "检测结束后应恢复进程原有的OpenCV线程数"
+        finally:
+            cv2.setNumThreads(threads)
+
+    timestamps = result["timestamps"]
+    assert len(timestamps) == 8 and timestamps[0] >= 4.0 and timestamps[-1] < 8.0, timestamps
+    assert np.all(np.diff(timestamps) > 0)
+    assert result["detections"].shape[1] == 7 and len(result["detections"]) == len(result["frame_ids"])
+    assert np.all(result["frame_ids"][:-1] <= result["frame_ids"][1:]) and result["frame_ids"].max() < len(timestamps)
+    counts = np.bincount(result["frame_ids"], minlength=len(timestamps))
+    assert np.median(counts) == 2, f"每帧应检测到两名演员: {counts}"
+    print(f"✅ {len(timestamps)} 帧, {len(result['detections'])} 个检测")
+
+def test_pipeline_merge():
+    """测试各段结果按顺序合并、帧下标加上前面各段的帧数，轨迹映射到舞台坐标"""
+    print("\n🔍 测试分段合并...")
+
+    tracker = RecordingTracker()
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "stage.mp4")
+        make_video(path)
+        segments = [detect_segment(path, start, start + 4.0, vars(CONFIG)) for start in (0.0, 4.0)]
+        progress = []
+        tracks = ActorPositionPipeline(CONFIG, tracker).run(
+            path, 8.0, progress_callback=lambda fraction, message: progress.append(fraction)
+        )
+
+    timestamps, frame_ids, detections = tracker.inputs
+    first = len(segments[0]["timestamps"])
+    assert np.array_equal(timestamps, np.concatenate([s["timestamps"] for s in segments]))
+    assert np.array_equal(frame_ids, np.concatenate([segments[0]["frame_ids"], segments[1]["frame_ids"] + first]))
+    assert np.array_equal(detections, np.concatenate([s["detections"] for s in segments]))
+    assert np.all(timestamps[frame_ids[frame_ids >= first]] >= 4.0), "第二段的检测应指向第二段的帧"
+    assert progress == [0.5, 1.0]
+
+    assert len(tracks) == 2, f"应得到两条轨迹: {len(tracks)}"
+    for track in tracks:
+        assert track["timestamps"][0] < 1.0 and track["timestamps"][-1] > 7.0, "轨迹应跨越两段"
+        assert np.all((track["points"] >= 0) & (track["points"] <= [800, 500]))
+        assert np.allclose(track["points"], track["image_points"] * [800, 500])
+    left, right = sorted(tracks, key=lambda track: track["image_points"][0, 0])
+    assert left["image_points"][-1, 0] > left["image_points"][0, 0], "左侧演员应向右走"
+    assert right["image_points"][-1, 0] < right["image_points"][0, 0], "右侧演员应向左走"
+    print(f"✅ {len(timestamps)} 帧合并正确, {len(tracks)} 条轨迹")
+
+if __name__ == "__main__":
+    test_hog_detect_segment()
+    test_pipeline_merge()
+    print("\n🎉 演员位置提取测试通过！")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+测试分析用代理文件转码：输出分辨率、关键帧间隔、时长和帧时间戳
+"""
+
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.keyframe_index import KeyframeIndexStore
+from backend.core.video_processor import VideoProcessor
+
+FPS, SECONDS = 25, 6
+
+def make_video(path: str, width: int, height: int):
+    """一个方块在画面中匀速移动"""
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (width, height))
+    for i in range(SECONDS * FPS):
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        x = i * (width - 100) // (SECONDS * FPS)
+        frame[height // 3:height // 3 + 100, x:x + 100] = 230
+        out.write(frame)
+    out.release()
+
+def test_create_proxy():
+    """测试代理缩小到PROXY_WIDTH、关键帧间隔不超过PROXY_KEYFRAME_INTERVAL、时长和帧时间与原文件一致"""
+    print("🔍 测试代理转码...")
+
+    processor = VideoProcessor()
+    with tempfile.TemporaryDirectory() as root:
+        source = os.path.join(root, "rehearsal.mp4")
+        make_video(source, 1280, 720)
+        output = os.path.join(root, "proxies", "rehearsal.mp4")
+
+        info = processor.create_proxy(source, output)
+        assert info["proxy_path"] == output and info["resolution"] == "640x360", info
+        assert sorted(os.listdir(os.path.dirname(output))) == ["rehearsal.mp4"], "不应留下临时文件"
+
+        proxy_info = processor.extract_video_info(output)
+        assert abs(proxy_info["duration"] - SECONDS) < 0.05, proxy_info
+        cap = cv2.VideoCapture(output)
+        ok, frame = cap.read()
+        cap.release()
+        assert ok and frame.shape == (360, 640, 3)
+
+        store = KeyframeIndexStore(os.path.join(root, "index"))
+        original, proxy = store.get(source), store.get(output)
+        assert proxy.frame_count == SECONDS * FPS
+        assert np.allclose(proxy.frame_times, original.frame_times, atol=1e-3), "代理应保留原始帧时间"
+        # 关键帧落在每个间隔点之后的第一帧上，间隔最多多出一帧
+        keyframe_times = proxy.frame_times[proxy.keyframes]
+        gaps = np.diff(np.append(keyframe_times, proxy.duration))
+        assert len(keyframe_times) == SECONDS / processor.PROXY_KEYFRAME_INTERVAL, keyframe_times
+        assert keyframe_times[0] == 0 and gaps.max() <= processor.PROXY_KEYFRAME_INTERVAL + 1 / FPS + 1e-3, keyframe_times
+        print(f"✅ 代理 {info['resolution']}, {len(keyframe_times)} 个关键帧, 最大间隔 {gaps.max():.2f}s")
+
+def test_small_video_needs_no_proxy():
+    """测试不大于代理尺寸的视频不生成代理"""
+    print("\n🔍 测试小尺寸视频...")
+
+    with tempfile.TemporaryDirectory() as root:
+        source = os.path.join(root, "small.mp4")
+        make_video(source, 320, 240)
+        output = os.path.join(root, "proxies", "small.mp4")
+        assert VideoProcessor().create_proxy(source, output) is None
+        assert not os.path.exists(output)
+    print("✅ 小尺寸视频直接使用原文件")
+
+if __name__ == "__main__":
+    test_create_proxy()
+    test_small_video_needs_no_proxy()
+    print("\n🎉 代理转码测试通过！")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+测试共享内存音频：API进程解码后交给工作进程，工作进程只映射不复制
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.shared_audio import SharedAudio, attach_audio, ensure_resource_tracker
+from backend.core.audio_processor import decode_audio_shared, ASR_SAMPLE_RATE
+
+def summarize(ref):
+    """工作进程入口：返回音频长度、采样率、和与是否只读"""
+    with attach_audio(ref) as data:
+        return len(data), ref.sample_rate, float(data.sum()), data.flags.writeable
+
+def test_worker_handoff():
+    """测试通过进程池传递共享内存音频并在结束后删除"""
+    print("🔍 测试共享内存音频交接...")
+
+    ensure_resource_tracker()
+    data = np.linspace(-1, 1, ASR_SAMPLE_RATE * 30, dtype=np.float32)
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        with SharedAudio.create(data, ASR_SAMPLE_RATE) as shared:
+            for _ in range(2):
+                length, sample_rate, total, writeable = executor.submit(summarize, shared.ref).result()
+                assert length == len(data) and sample_rate == ASR_SAMPLE_RATE
+                assert abs(total - float(data.sum())) < 1e-2
+                assert not writeable, "工作进程中的音频应当只读"
+            ref = shared.ref
+        print("✅ 工作进程读取到完整音频")
+
+        try:
+            executor.submit(summarize, ref).result()
+            assert False, "release后共享内存应当已删除"
+        except FileNotFoundError:
+            pass
+        print("✅ release后共享内存已删除")
+
+def test_decode_audio_shared():
+    """测试解码结果直接放入共享内存"""
+    print("\n🔍 测试解码到共享内存...")
+    from test_audio_pipeline import make_media
+
+    with tempfile.TemporaryDirectory() as root:
+        video_path = os.path.join(root, "tone.mp4")
+        make_media(video_path, seconds=2.0)
+
+        shared = decode_audio_shared(video_path)
+        try:
+            with attach_audio(shared.ref) as data:
+                assert abs(len(data) / ASR_SAMPLE_RATE - 2.0) < 0.05
+                assert np.abs(np.fft.rfft(data[:ASR_SAMPLE_RATE])).argmax() == 440
+        finally:
+            shared.release()
+        shared.release()
+        print("✅ 解码到共享内存正确")
+
+if __name__ == "__main__":
+    test_worker_handoff()
+    test_decode_audio_shared()
+    print("\n🎉 共享内存音频测试通过！")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+测试识别前去除静音：语音区间检测、拼接后时间戳映射回原始时间轴、跳过比例统计
+"""
+
+import os
+import sys
+import wave
+import asyncio
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import asr_pool
+from backend.core.audio_chunking import ChunkStitcher, frame_energy_db
+from backend.core.shared_audio import SharedAudio, attach_audio
+from backend.core.speech_trim import TimeMap, compact_audio, plan_trim, speech_regions
+from backend.core.transcript_cache import TranscriptCache
+
+SR = 16000
+
+# 句子：(开始ms, 结束ms)，句间有长时间的走位和静音
+UTTERANCES = [(2000, 5000), (5400, 7000), (20000, 24000), (41000, 42500), (55000, 58000)]
+
+def make_recording(seconds: int = 60) -> np.ndarray:
+    """句子处为噪声，其余为极低电平，另有一个很短的敲击声"""
+    rng = np.random.default_rng(0)
+    data = (rng.standard_normal(SR * seconds) * 1e-4).astype(np.float32)
+    for begin, end in UTTERANCES:
+        data[begin * SR // 1000:end * SR // 1000] = rng.standard_normal((end - begin) * SR // 1000) * 0.3
+    data[30 * SR:30 * SR + SR // 20] = 0.5  # 50ms的敲击
+    return data
+
+def fake_recognize(ref, language, enable_speaker_diarization, hotwords):
+    """代替识别：按能量找出交给模型的音频中的句子（该音频自身的时间）"""
+    with attach_audio(ref) as data:
+        loud = frame_energy_db(data, ref.sample_rate, 10.0) > -30
+    edges = np.diff(np.concatenate(([0], loud.view(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1) * 10, np.flatnonzero(edges == -1) * 10
+    sentences = [
+        {"text": f"句{index}", "start": int(start), "end": int(end), "timestamp": [[int(start), int(end)]], "spk": 0}
+        for index, (start, end) in enumerate(zip(starts, ends))
+    ]
+    return {"text": "", "sentences": sentences, "raw_text": "", "timestamp": [[int(starts[0]), int(ends[-1])]]}
+
+def test_regions_and_time_map():
+    """测试语音区间覆盖所有句子、短停顿不切开、敲击声被丢弃，时间映射正确"""
+    print("🔍 测试语音区间检测...")
+
+    data = make_recording()
+    regions = speech_regions(data, SR)
+    assert len(regions) == 4, f"0.4s的停顿不应切开，敲击声应被丢弃: {regions}"
+    for begin, end in UTTERANCES:
+        assert any(start <= begin * SR // 1000 and end * SR // 1000 <= stop for start, stop in regions), \
+            f"句子 {begin}~{end}ms 未被覆盖"
+
+    regions, statistics = plan_trim(data, SR)
+    # 语音 + 并入的0.4s停顿 + 每个区间前后各0.3s
+    speech = sum(end - begin for begin, end in UTTERANCES) / 1000 + 0.4 + 4 * 0.6
+    assert statistics["total_seconds"] == 60
+    assert abs(statistics["speech_seconds"] - speech) <= 0.1, statistics
+    assert statistics["skipped_fraction"] > 0.7, statistics
+
+    compact = compact_audio(data, regions)
+    time_map = TimeMap(regions, SR)
+    assert len(compact) == sum(end - start for start, end in regions)
+    # 拼接后每个区间的第一个采样映射回原始起点，且与原始采样相同
+    position = 0
+    for start, end in regions:
+        assert time_map.map_ms(position * 1000 / SR) == round(start * 1000 / SR)
+        assert compact[position] == data[start]
+        # 区间终点落在拼接处时归入前一个区间
+        position += end - start
+        assert time_map.map_ms(position * 1000 / SR, end=True) == round(end * 1000 / SR)
+    print(f"✅ {len(regions)} 个语音区间，跳过 {statistics['skipped_fraction']:.1%}")
+
+def test_continuous_speech_not_trimmed():
+    """测试整段语音（含安静的段落）不被裁剪"""
+    print("\n🔍 测试整段语音...")
+
+    rng = np.random.default_rng(1)
+    data = (rng.standard_normal(SR * 30) * 0.3).astype(np.float32)
+    data[SR * 10:SR * 20] *= 0.05  # 轻声说话
+    regions, statistics = plan_trim(data, SR)
+    assert regions is None and statistics["skipped_fraction"] == 0.0, statistics
+    assert plan_trim(np.zeros(SR * 5, np.float32), SR)[0] is None, "全静音时不裁剪"
+    print("✅ 整段语音不裁剪")
+
+def test_recognize_trimmed():
+    """测试只把语音交给模型，返回的时间戳映射回原始时间轴"""
+    print("\n🔍 测试去除静音后识别...")
+
+    lengths = []
+
+    async def run_asr(func, ref, *args):
+        lengths.append(ref.length / ref.sample_rate)
+        return fake_recognize(ref, *args)
+
+    data = make_recording()
+    original = asr_pool.run_asr
+    asr_pool.run_asr = run_asr
+    try:
+        with SharedAudio.create(data, SR) as shared:
+            result = asyncio.run(asr_pool.recognize_shared(shared, "zh"))
+    finally:
+        asr_pool.run_asr = original
+
+    trim = result["speech_trim"]
+    assert len(lengths) == 1 and abs(lengths[0] - trim["speech_seconds"]) < 0.01, f"应只识别语音区间: {lengths}"
+    assert trim["rtf_gain"] > 3 and "real_time_factor" in trim, trim
+
+    # 0.4s停顿处的两句在拼接后的音频里也是两句，映射回原始时间误差不超过一帧
+    sentences = result["sentences"]
+    assert len(sentences) == len(UTTERANCES), sentences
+    for sentence, (begin, end) in zip(sentences, UTTERANCES):
+        assert abs(sentence["start"] - begin) <= 10 and abs(sentence["end"] - end) <= 10, (sentence, begin, end)
+        assert sentence["timestamp"] == [[sentence["start"], sentence["end"]]]
+    assert abs(result["timestamp"][0][0] - UTTERANCES[0][0]) <= 10
+    assert abs(result["timestamp"][0][1] - UTTERANCES[-1][1]) <= 10
+    assert "00:00:55," in result["srt"], "字幕应使用原始时间"
+    print(f"✅ 识别 {lengths[0]:.1f}s / 60s，时间戳映射正确")
+
+def test_stream_trimmed():
+    """测试流式识别同样去除静音，逐块输出的句子已是原始时间"""
+    print("\n🔍 测试流式识别去除静音...")
+
+    async def run_asr(func, ref, *args):
+        return fake_recognize(ref, *args)
+
+    async def collect(path, stitcher):
+        return [sentence async for batch in asr_pool.stream_file(path, stitcher) for sentence in batch]
+
+    original = asr_pool.run_asr, asr_pool.transcript_cache
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "rehearsal.wav")
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SR)
+            f.writeframes((np.clip(make_recording(), -1, 1) * 32767).astype(np.int16).tobytes())
+
+        asr_pool.run_asr, asr_pool.transcript_cache = run_asr, TranscriptCache(os.path.join(root, "cache"))
+        try:
+            stitcher = ChunkStitcher(SR)
+            streamed = asyncio.run(collect(path, stitcher))
+            result = asr_pool.stitched_result(stitcher)
+        finally:
+            asr_pool.run_asr, asr_pool.transcript_cache = original
+
+    assert [s["start"] for s in streamed] == [s["start"] for s in result["sentences"]]
+    assert all(abs(s["start"] - begin) <= 10 for s, (begin, _) in zip(streamed, UTTERANCES)), streamed
+    assert result["speech_trim"]["skipped_fraction"] > 0.7
+    print("✅ 流式识别时间戳正确")
+
+if __name__ == "__main__":
+    test_regions_and_time_map()
+    test_continuous_speech_not_trimmed()
+    test_recognize_trimmed()
+    test_stream_trimmed()
+    print("\n🎉 去除静音测试通过！")
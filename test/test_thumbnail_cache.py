@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+测试缩略图缓存的按键锁清理和源文件版本
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.thumbnail_cache import ThumbnailCache
+
+def test_key_locks_released():
+    """测试命中、等锁后命中和渲染失败时按键锁都被移除"""
+    print("🔍 测试按键锁清理...")
+
+    with tempfile.TemporaryDirectory() as root:
+        cache = ThumbnailCache(root)
+        key = cache.make_key("video", 1.0, 320)
+        started, release = threading.Event(), threading.Event()
+        renders = []
+
+        def slow_render():
+            renders.append(1)
+            started.set()
+            release.wait(5)
+            return b"jpeg"
+
+        # 一个请求渲染时，其他同键请求等锁后命中
+        threads = [threading.Thread(target=cache.get_or_create, args=(key, slow_render)) for _ in range(4)]
+        threads[0].start()
+        assert started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        assert renders == [1], "同一个键只应渲染一次"
+        assert cache._key_locks == {}, f"按键锁未移除: {cache._key_locks}"
+
+        def failing_render():
+            raise RuntimeError("解码失败")
+
+        failing = cache.make_key("video", 2.0, 320)
+        try:
+            cache.get_or_create(failing, failing_render)
+            assert False, "渲染失败应抛出异常"
+        except RuntimeError:
+            pass
+        assert cache._key_locks == {}, "渲染失败后按键锁应被移除"
+    print("✅ 按键锁清理正确")
+
+def test_source_version():
+    """测试源文件改变（重新上传、换用代理）后缓存键和ETag改变"""
+    print("\n🔍 测试源文件版本...")
+
+    with tempfile.TemporaryDirectory() as root:
+        cache = ThumbnailCache(os.path.join(root, "cache"))
+        original, proxy = os.path.join(root, "video.mp4"), os.path.join(root, "proxy.mp4")
+        for path in (original, proxy):
+            with open(path, "wb") as f:
+                f.write(b"video")
+
+        key = cache.make_key("video", 1.0, 320, original)
+        assert cache.make_key("video", 1.1, 320, original) == key
+        assert cache.make_key("video", 1.0, 320, proxy) != key, "代理和原文件的缩略图不应共用"
+
+        cache.get_or_create(key, lambda: b"old")
+        os.utime(original, (time.time() + 10, time.time() + 10))
+        with open(original, "wb") as f:
+            f.write(b"re-uploaded")
+        updated = cache.make_key("video", 1.0, 320, original)
+        assert updated != key and cache.etag(updated) != cache.etag(key), "文件改变后ETag应改变"
+        assert cache.get_or_create(updated, lambda: b"new") == b"new", "文件改变后不应命中旧缩略图"
+    print("✅ 源文件版本正确")
+
+if __name__ == "__main__":
+    test_key_locks_released()
+    test_source_version()
+    print("\n🎉 缩略图缓存测试通过！")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+测试多人跟踪、舞台标定和演员轨迹存储
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.tracker import MultiPersonTracker, match_previous_tracks
+from backend.core.stage_calibration import image_to_stage, get_homography, reproject_tracks
+from backend.core.data_store import InMemoryDataStore
+from backend.models.data_models import ActorTrack
+from backend.models.validators import validate_stage_calibration
+
+def make_crossing_detections(frames: int = 50, occluded=range(30, 35)):
+    """两名演员相向走过并交叉，第二名演员在occluded帧被遮挡"""
+    timestamps = np.arange(frames) * 0.2
+    detections = []
+    frame_ids = []
+    for f in range(frames):
+        for k, (x0, dx) in enumerate([(0.2, 0.012), (0.8, -0.012)]):
+            if k == 1 and f in occluded:
+                continue
+            x = x0 + dx * f
+            y = 0.8 + 0.002 * k
+            detections.append([x - 0.05, 0.4, x + 0.05, y, x, y, 0.9])
+            frame_ids.append(f)
+    return timestamps, np.array(frame_ids), np.array(detections, dtype=np.float32)
+
+def test_tracker_crossing():
+    """测试交叉和遮挡时演员ID保持稳定"""
+    print("🔍 测试多人跟踪...")
+
+    timestamps, frame_ids, detections = make_crossing_detections()
+    tracks = MultiPersonTracker().track(timestamps, frame_ids, detections)
+
+    assert len(tracks) == 2, f"轨迹数量错误: {len(tracks)}"
+
+    # 交叉后每条轨迹仍沿原方向运动
+    left_to_right, right_to_left = sorted(tracks, key=lambda t: t["points"][0, 0])
+    assert left_to_right["points"][-1, 0] > 0.7
+    assert right_to_left["points"][-1, 0] < 0.3
+    print("✅ 交叉后ID保持稳定")
+
+    # 遮挡期间的采样时刻被插值补齐，置信度降低
+    assert len(right_to_left["timestamps"]) == 50
+    assert np.all(right_to_left["scores"][30:35] < 0.9)
+    assert np.allclose(right_to_left["points"][32, 0], 0.8 - 0.012 * 32, atol=1e-3)
+    print("✅ 遮挡间隙插值正确")
+
+def test_fragment_linking():
+    """测试离场超过max_age后在附近重新出现的演员连接为同一条轨迹，远处出现的人不连接"""
+    print("\n🔍 测试轨迹片段连接...")
+
+    timestamps = np.arange(60) * 0.2
+    detections = []
+    frame_ids = []
+    for f in range(60):
+        # 第一名演员在第3-6秒离场（超过max_age），回来时位置略有移动
+        if not 15 <= f < 30:
+            x = 0.3 + 0.002 * f
+            detections.append([x - 0.05, 0.4, x + 0.05, 0.8, x, 0.8, 0.9])
+            frame_ids.append(f)
+        # 第二名演员只在第8秒后出现在舞台另一侧
+        if f >= 40:
+            detections.append([0.85, 0.4, 0.95, 0.8, 0.9, 0.8, 0.9])
+            frame_ids.append(f)
+
+    tracks = MultiPersonTracker().track(timestamps, np.array(frame_ids), np.array(detections, dtype=np.float32))
+    assert len(tracks) == 2, f"轨迹数量错误: {len(tracks)}"
+    linked, other = tracks
+    assert linked["timestamps"][0] == 0.0 and linked["timestamps"][-1] == timestamps[-1]
+    # 离场期间没有采样点，不做插值
+    assert len(linked["timestamps"]) == 45 and not np.any((linked["timestamps"] > 2.9) & (linked["timestamps"] < 5.9))
+    assert len(linked["timestamps"]) == len(linked["points"]) == len(linked["scores"])
+    assert other["timestamps"][0] == 8.0 and np.allclose(other["points"][:, 0], 0.9)
+    print("✅ 同一演员的轨迹片段被连接")
+
+def test_match_previous_tracks():
+    """测试重新处理时按时间重合部分的位置匹配旧轨迹，与顺序无关"""
+    print("\n🔍 测试匹配原有轨迹...")
+
+    times = np.arange(20) * 0.2
+    left = {"timestamps": times, "points": np.column_stack([np.full(20, 0.2), np.full(20, 0.8)])}
+    right = {"timestamps": times, "points": np.column_stack([np.full(20, 0.8), np.full(20, 0.8)])}
+    late = {"timestamps": times + 10.0, "points": np.column_stack([np.full(20, 0.2), np.full(20, 0.8)])}
+
+    # 新轨迹与旧轨迹顺序相反、位置略有偏差
+    shifted = {"timestamps": times + 0.01, "points": right["points"] + 0.02}
+    assert match_previous_tracks([shifted, left, late], [left, right]) == [1, 0, None]
+    # 时间不重合或距离过远都不匹配
+    far = {"timestamps": times, "points": np.column_stack([np.full(20, 0.5), np.full(20, 0.2)])}
+    assert match_previous_tracks([late, far], [left, right]) == [None, None]
+    assert match_previous_tracks([left], []) == [None]
+    print("✅ 旧轨迹匹配正确")
+
+def test_match_previous_actors():
+    """测试重新处理视频时新轨迹沿用原有演员（同一演员的多条旧轨迹合并匹配）"""
+    print("\n🔍 测试沿用原有演员...")
+
+    from backend.api.video_analysis import _match_previous_actors
+
+    store = InMemoryDataStore()
+    video = store.add_video("test.mp4", "/path/to/test.mp4")
+    first, second = store.add_actor("演员1"), store.add_actor("演员2")
+    times = [0.0, 0.2, 0.4, 0.6]
+    store.add_actor_tracks(video.id, [
+        ActorTrack.create(second.id, times, [0.0] * 4, [0.0] * 4, [0.9] * 4, [0.8] * 4, [0.8] * 4),
+        ActorTrack.create(first.id, times, [0.0] * 4, [0.0] * 4, [0.9] * 4, [0.2] * 4, [0.8] * 4),
+        ActorTrack.create(first.id, [t + 5.0 for t in times], [0.0] * 4, [0.0] * 4, [0.9] * 4, [0.25] * 4, [0.8] * 4)
+    ])
+
+    new_times = np.array(times + [t + 5.0 for t in times])
+    tracks = [
+        {"timestamps": new_times, "image_points": np.column_stack([[0.21] * 8, [0.8] * 8])},
+        {"timestamps": np.array(times), "image_points": np.column_stack([[0.79] * 4, [0.8] * 4])},
+        {"timestamps": np.array(times), "image_points": np.column_stack([[0.5] * 4, [0.3] * 4])}
+    ]
+    assert _match_previous_actors(store, video.id, tracks) == [first.id, second.id, None]
+    print("✅ 新轨迹沿用原有演员")
+
+def test_stage_calibration():
+    """测试舞台标定的透视变换和轨迹重新投影"""
+    print("\n🔍 测试舞台标定...")
+
+    # 未标定时整幅画面对应整个舞台
+    assert np.allclose(image_to_stage(np.array([[0.5, 0.5], [1.0, 1.0]])), [[400, 250], [800, 500]])
+
+    # 梯形（透视）标定：四个角点映射到舞台四角，舞台中心落在两条对角线交点
+    corners = [[0.3, 0.4], [0.7, 0.4], [0.9, 0.9], [0.1, 0.9]]
+    assert not validate_stage_calibration(corners)
+    assert np.allclose(image_to_stage(np.array(corners), corners), [[0, 0], [800, 0], [800, 500], [0, 500]], atol=1e-3)
+    assert get_homography(corners) is get_homography([list(p) for p in corners])
+    print("✅ 单应矩阵计算和缓存正确")
+
+    # 自交或点数不对的标定被拒绝
+    assert validate_stage_calibration([[0.3, 0.4], [0.9, 0.9], [0.7, 0.4], [0.1, 0.9]])
+    assert validate_stage_calibration(corners[:3])
+
+    # 重新标定只根据保存的画面坐标重算舞台坐标
+    track = ActorTrack.create("a", [0.0, 1.0], [400.0, 800.0], [250.0, 500.0], [0.9, 0.9],
+                              image_x=[0.3, 0.9], image_y=[0.4, 0.9])
+    legacy = ActorTrack.create("b", [0.0], [1.0], [2.0], [0.9])
+    assert reproject_tracks([track, legacy], corners) == 1
+    assert np.allclose([track.x, track.y], [[0, 800], [0, 500]], atol=0.1)
+    assert legacy.x == [1.0]
+    print("✅ 轨迹批量重新投影正确")
+
+def test_actor_track_storage():
+    """测试轨迹的存储、展开和JSON持久化"""
+    print("\n🔍 测试演员轨迹存储...")
+
+    import tempfile
+
+    store = InMemoryDataStore()
+    video = store.add_video("test.mp4", "/path/to/test.mp4")
+    actor = store.add_actor("演员1")
+    track = ActorTrack.create(actor.id, [0.0, 0.2, 0.4], [100.0, 110.0, 120.0], [200.0, 200.0, 200.0], [0.9, 0.45, 0.9])
+    store.add_actor_tracks(video.id, [track])
+
+    positions = track.to_positions()
+    assert len(positions) == 3
+    assert positions[1].position_2d.x == 110.0 and positions[1].confidence == 0.45
+    assert [p.id for p in positions] == [p.id for p in track.to_positions()]
+    print("✅ 轨迹展开为位置点")
+
+    # 检测得到的位置只以轨迹存储一份，项目数据里不再重复展开
+    assert store.get_actor_positions(video.id) == []
+    project_data = store.get_project_data(store.create_project("测试项目").id)
+    assert project_data["actor_positions"] == {video.id: []}
+    assert [t["id"] for t in project_data["actor_tracks"][video.id]] == [track.id]
+
+    # 拖动修改时更新轨迹中最接近的采样点
+    assert store.update_track_position(video.id, actor.id, 0.21, 105.0, 150.0)
+    assert track.x[1] == 105.0 and track.y[1] == 150.0
+    assert not store.update_track_position(video.id, actor.id, 1.0, 0.0, 0.0)
+    assert not store.update_track_position(video.id, "other", 0.2, 0.0, 0.0)
+    track.x[1], track.y[1] = 110.0, 200.0
+    print("✅ 轨迹只存储一份，拖动修改轨迹采样点")
+
+    # 各列长度不一致的轨迹会让重新投影出错，存入时即被拒绝，原有数据不变
+    for bad in (
+        ActorTrack.create(actor.id, [0.0, 0.2], [100.0], [200.0, 200.0], [0.9, 0.9]),
+        ActorTrack.create(actor.id, [0.0, 0.2], [100.0, 110.0], [200.0, 200.0], [0.9, 0.9], [0.1], [0.2, 0.3])
+    ):
+        try:
+            store.add_actor_tracks(video.id, [track, bad])
+            assert False, "长度不一致的轨迹应被拒绝"
+        except ValueError as e:
+            assert "长度" in str(e), e
+    assert store.get_actor_tracks(video.id) == [track]
+    print("✅ 不合法的轨迹被拒绝")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "data.json")
+        store.save_to_json(path)
+        restored = InMemoryDataStore()
+        restored.load_from_json(path)
+
+    restored_track = restored.get_actor_tracks(video.id)[0]
+    assert restored_track.x == track.x and restored_track.actor_id == actor.id
+    assert not restored.validate_data_integrity()
+    print("✅ 轨迹JSON持久化正确")
+
+if __name__ == "__main__":
+    test_tracker_crossing()
+    test_fragment_linking()
+    test_match_previous_tracks()
+    test_match_previous_actors()
+    test_stage_calibration()
+    test_actor_track_storage()
+    print("\n🎉 跟踪测试通过！")
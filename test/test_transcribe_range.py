@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+测试区间重新转录：只解码和识别该区间，替换区间内的片段，区间外的片段和手动指定的说话人不变；
+以及默认的整段转录任务
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.api import video_analysis
+from backend.core import asr_pool
+from backend.core.data_store import InMemoryDataStore
+from backend.core.transcript_cache import TranscriptCache
+from backend.core.transcript_splice import expand_range, splice_transcripts
+from backend.models.data_models import TranscriptSegment
+from test_audio_pipeline import make_media
+
+def make_transcripts():
+    return [
+        TranscriptSegment.create("第一句", 0.5, 2.0, "spk_0"),
+        TranscriptSegment.create("第二句", 3.0, 5.0, "演员甲"),  # 手动指定的说话人
+        TranscriptSegment.create("第三句", 6.0, 8.0, "spk_0"),
+        TranscriptSegment.create("第四句", 9.0, 11.0, "spk_1")
+    ]
+
+class FakeJob:
+    def report(self, progress, message=""):
+        pass
+
+def test_splice():
+    """测试区间扩展、替换和说话人继承"""
+    print("🔍 测试片段替换...")
+
+    transcripts = make_transcripts()
+    assert expand_range(transcripts, 4.0, 7.0) == (3.0, 8.0), "区间应扩展到相交片段的边界"
+    assert expand_range(transcripts, 2.2, 2.8) == (2.2, 2.8)
+
+    new_segments = [
+        TranscriptSegment.create("新的第二句", 3.1, 4.9, "spk_9"),
+        TranscriptSegment.create("新的第三句", 6.2, 7.9, "spk_9"),
+        TranscriptSegment.create("新插入的一句", 5.2, 5.8, "spk_9")
+    ]
+    spliced, replaced = splice_transcripts(transcripts, new_segments, 3.0, 8.0)
+    assert [s.text for s in spliced] == ["第一句", "新的第二句", "新插入的一句", "新的第三句", "第四句"]
+    assert [s.id for s in replaced] == [transcripts[1].id, transcripts[2].id]
+    assert spliced[0] is transcripts[0] and spliced[-1] is transcripts[3], "区间外的片段不应改变"
+    assert [s.speaker_id for s in spliced[1:4]] == ["演员甲", None, "spk_0"], "新片段应继承重合最长的旧片段的说话人"
+    print("✅ 片段替换正确")
+
+def test_transcribe_range_task():
+    """测试区间转录任务只识别该区间并替换存储中的片段"""
+    print("\n🔍 测试区间转录任务...")
+
+    calls = []
+
+    async def run_asr(func, ref, language, enable_speaker_diarization, hotwords):
+        calls.append((ref.length / ref.sample_rate, hotwords))
+        return {"text": "", "srt": "", "raw_text": "", "timestamp": [], "sentences": [
+            {"text": "重新识别的第二句", "timestamp": [[100, 1900]], "spk": 0},
+            {"text": "重新识别的第三句", "timestamp": [[3100, 4800]], "spk": 0}
+        ]}
+
+    data_store = InMemoryDataStore()
+    data_store.save_to_json = lambda path: None
+    transcripts = make_transcripts()
+    originals = (asr_pool.run_asr, asr_pool.transcript_cache, video_analysis.get_data_store)
+    with tempfile.TemporaryDirectory() as root:
+        asr_pool.run_asr = run_asr
+        asr_pool.transcript_cache = TranscriptCache(os.path.join(root, "cache"))
+        video_analysis.get_data_store = lambda: data_store
+        try:
+            video_path = os.path.join(root, "rehearsal.mp4")
+            make_media(video_path, seconds=20.0)
+            data_store.add_transcripts("video", list(transcripts))
+
+            result = asyncio.run(video_analysis.transcribe_range_task(
+                FakeJob(), "video", video_path, 4.0, 7.0, "zh", "王小明"
+            ))
+        finally:
+            asr_pool.run_asr, asr_pool.transcript_cache, video_analysis.get_data_store = originals
+
+    assert len(calls) == 1 and abs(calls[0][0] - 5.0) < 0.05, f"应只解码扩展后的5秒区间: {calls}"
+    assert calls[0][1] == "王小明"
+    assert result == {"start_time": 3.0, "end_time": 8.0, "removed": 2, "added": 2, "segments": 4}
+
+    stored = data_store.get_transcripts("video")
+    assert [s.id for s in stored][::3] == [transcripts[0].id, transcripts[3].id]
+    assert [(s.text, s.start_time, s.end_time, s.speaker_id) for s in stored[1:3]] == [
+        ("重新识别的第二句", 3.1, 4.9, "演员甲"),
+        ("重新识别的第三句", 6.1, 7.8, "spk_0")
+    ]
+    print("✅ 区间转录任务正确")
+
+def test_transcribe_task_default():
+    """测试默认（不带use_whisper）的整段转录任务经ASR执行器识别并保存片段"""
+    print("\n🔍 测试整段转录任务...")
+
+    calls = []
+
+    async def run_asr(func, ref, language, enable_speaker_diarization, hotwords):
+        calls.append((ref.length / ref.sample_rate, language))
+        return {"text": "", "srt": "", "raw_text": "", "timestamp": [], "sentences": [
+            {"text": "第一句台词", "timestamp": [[500, 1800]], "spk": 0},
+            {"text": "第二句台词", "timestamp": [[2500, 3900]], "spk": 1}
+        ]}
+
+    data_store = InMemoryDataStore()
+    data_store.save_to_json = lambda path: None
+    originals = (asr_pool.run_asr, asr_pool.transcript_cache, video_analysis.get_data_store)
+    with tempfile.TemporaryDirectory() as root:
+        asr_pool.run_asr = run_asr
+        asr_pool.transcript_cache = TranscriptCache(os.path.join(root, "cache"))
+        video_analysis.get_data_store = lambda: data_store
+        try:
+            video_path = os.path.join(root, "rehearsal.mp4")
+            make_media(video_path, seconds=5.0)
+            video = data_store.add_video("rehearsal.mp4", video_path)
+
+            result = asyncio.run(video_analysis.transcribe_audio_task(
+                FakeJob(), video.id, video_path, False, "zh"
+            ))
+        finally:
+            asr_pool.run_asr, asr_pool.transcript_cache, video_analysis.get_data_store = originals
+
+    assert len(calls) == 1 and abs(calls[0][0] - 5.0) < 0.05 and calls[0][1] == "zh", calls
+    assert result == {"segments": 2}
+    stored = data_store.get_transcripts(video.id)
+    assert [(s.text, s.start_time, s.end_time) for s in stored] == [
+        ("第一句台词", 0.5, 1.8), ("第二句台词", 2.5, 3.9)
+    ], stored
+    assert data_store.get_video(video.id).status == "transcribed"
+    print("✅ 整段转录任务正确")
+
+if __name__ == "__main__":
+    test_splice()
+    test_transcribe_range_task()
+    test_transcribe_task_default()
+    print("\n🎉 区间重新转录测试通过！")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试识别结果缓存：按音频和识别参数命中、同一文件跳过解码、按磁盘预算淘汰
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import subprocess
+import numpy as np
+import imageio_ffmpeg
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import asr_pool
+from backend.core.transcript_cache import TranscriptCache, audio_digest, params_digest
+from test_audio_pipeline import make_media
+
+RESULT = {
+    "text": "你好",
+    "srt": "1\n00:00:00,500 --> 00:00:01,500\n你好\n",
+    "sentences": [{"text": "你好", "start": 500, "end": 1500, "timestamp": [[500, 1500]], "spk": np.int64(0)}],
+    "raw_text": "你 好",
+    "timestamp": [[500, 1000], [1000, 1500]]
+}
+
+def test_keys_and_eviction():
+    """测试缓存键区分识别参数，超出预算时淘汰最久未使用的结果"""
+    print("🔍 测试缓存键和淘汰...")
+
+    assert params_digest("zh", False, "") != params_digest("zh", True, "")
+    assert params_digest("zh", False, "") != params_digest("zh", False, "王小明")
+    assert params_digest("zh", False, "") != params_digest("en", False, "")
+    assert audio_digest(np.zeros(10, np.float32)) != audio_digest(np.zeros(11, np.float32))
+
+    with tempfile.TemporaryDirectory() as root:
+        params = params_digest()
+        probe = TranscriptCache(os.path.join(root, "probe"))
+        probe.put("a" * 64, params, RESULT)
+        entry_bytes = probe.get_statistics()["disk_bytes"]
+
+        # 预算可容纳4个结果
+        cache = TranscriptCache(os.path.join(root, "cache"), disk_budget=entry_bytes * 4)
+        cache.put("a" * 64, params, RESULT)
+        cached = cache.get("a" * 64, params)
+        assert cached["sentences"][0]["spk"] == 0 and cached["text"] == "你好"
+        assert cache.get("a" * 64, params_digest("en")) is None
+
+        for index, key in enumerate("bcdefgh"):
+            time.sleep(0.01)
+            cache.put(key * 64, params, RESULT)
+            if index % 2 == 0:
+                cache.get("a" * 64, params)  # 保持a最近使用
+        assert cache.get("a" * 64, params) is not None, "最近使用的结果不应被淘汰"
+        assert cache.get("b" * 64, params) is None, "最久未使用的结果应被淘汰"
+        assert cache.get_statistics()["disk_bytes"] <= entry_bytes * 4
+    print("✅ 缓存键和淘汰正确")
+
+def test_recognize_file_cache():
+    """测试再次识别同一文件、以及音频相同的另一文件时不再识别"""
+    print("\n🔍 测试识别结果缓存命中...")
+
+    calls = []
+
+    async def run_asr(func, ref, *args):
+        calls.append(ref)
+        return RESULT
+
+    original_run_asr, original_cache = asr_pool.run_asr, asr_pool.transcript_cache
+    with tempfile.TemporaryDirectory() as root:
+        asr_pool.run_asr = run_asr
+        asr_pool.transcript_cache = TranscriptCache(os.path.join(root, "cache"))
+        try:
+            video_path = os.path.join(root, "clip.mp4")
+            make_media(video_path, seconds=2.0)
+
+            first = asyncio.run(asr_pool.recognize_file(video_path, "zh", True))
+            assert len(calls) == 1 and first["text"] == "你好"
+
+            start = time.perf_counter()
+            second = asyncio.run(asr_pool.recognize_file(video_path, "zh", True))
+            elapsed = time.perf_counter() - start
+            assert len(calls) == 1, "同一文件应命中缓存"
+            assert second["sentences"] == [{**RESULT["sentences"][0], "spk": 0}]
+            assert asr_pool.transcript_cache.get_statistics()["file_hits"] == 1
+            print(f"✅ 同一文件命中缓存，耗时 {elapsed * 1000:.1f}ms")
+
+            asyncio.run(asr_pool.recognize_file(video_path, "zh", False))
+            assert len(calls) == 2, "识别参数不同时不应命中"
+
+            # 同一段PCM音频放在不同封装中：文件内容不同，解码后的音频相同
+            wav_path, mkv_path = os.path.join(root, "clip.wav"), os.path.join(root, "clip.mkv")
+            ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+            subprocess.run([ffmpeg, "-v", "error", "-y", "-i", video_path, "-vn", "-c:a", "pcm_s16le", wav_path], check=True)
+            subprocess.run([ffmpeg, "-v", "error", "-y", "-i", wav_path, "-c", "copy", mkv_path], check=True)
+            asyncio.run(asr_pool.recognize_file(wav_path, "zh", True))
+            assert len(calls) == 3
+            asyncio.run(asr_pool.recognize_file(mkv_path, "zh", True))
+            assert len(calls) == 3, "音频相同的文件应命中缓存"
+            print("✅ 音频相同的文件命中缓存")
+        finally:
+            asr_pool.run_asr, asr_pool.transcript_cache = original_run_asr, original_cache
+
+if __name__ == "__main__":
+    test_keys_and_eviction()
+    test_recognize_file_cache()
+    print("\n🎉 识别结果缓存测试通过！")
@@ -6,14 +6,30 @@
 import sys
 import os
 import tempfile
+import subprocess
+import contextlib
 import numpy as np
 import cv2
 from pathlib import Path
 
-# 添加backend路径
-sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+# 添加项目根目录路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.video_processor import VideoProcessor
+from backend.core import video_processor as video_processor_module
+from backend.core.frame_reader import FrameReaderPool
+from backend.core.keyframe_index import KeyframeIndexStore
+from backend.core.video_processor import VideoProcessor
+
+@contextlib.contextmanager
+def temporary_index_store(store=None):
+    """取帧期间使用临时目录下的关键帧索引，不写入全局的 data/keyframe_index"""
+    with tempfile.TemporaryDirectory() as index_dir:
+        original = video_processor_module.keyframe_index_store
+        video_processor_module.keyframe_index_store = store or KeyframeIndexStore(index_dir)
+        try:
+            yield video_processor_module.keyframe_index_store
+        finally:
+            video_processor_module.keyframe_index_store = original
 
 def create_test_video(output_path: str, duration: int = 5, fps: int = 30, width: int = 640, height: int = 480):
     """创建测试视频文件"""
@@ -61,87 +77,326 @@ def test_video_processor():
     with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
         test_video_path = temp_file.name
     
-    try:
-        # 创建测试视频
-        create_test_video(test_video_path, duration=3, fps=25)
-        
-        # 测试文件验证
-        print("\n📋 测试文件验证...")
-        validation = processor.validate_video_file(test_video_path)
-        if validation["valid"]:
-            print("✅ 文件验证通过")
-        else:
-            print(f"❌ 文件验证失败: {validation['errors']}")
+    with temporary_index_store():
+        try:
+            # 创建测试视频
+            create_test_video(test_video_path, duration=3, fps=25)
+            
+            # 测试文件验证
+            print("\n📋 测试文件验证...")
+            validation = processor.validate_video_file(test_video_path)
+            if validation["valid"]:
+                print("✅ 文件验证通过")
+            else:
+                print(f"❌ 文件验证失败: {validation['errors']}")
+                return False
+            
+            # 测试视频信息提取
+            print("\n📊 测试视频信息提取...")
+            info = processor.extract_video_info(test_video_path)
+            print(f"✅ 视频信息: {info}")
+            
+            # 验证信息准确性
+            expected_duration = 3.0
+            if abs(info["duration"] - expected_duration) < 0.1:
+                print("✅ 时长信息准确")
+            else:
+                print(f"⚠️ 时长信息可能不准确: {info['duration']} vs {expected_duration}")
+            
+            if info["fps"] == 25:
+                print("✅ 帧率信息准确")
+            else:
+                print(f"⚠️ 帧率信息可能不准确: {info['fps']} vs 25")
+            
+            # 测试内容验证
+            print("\n🔍 测试内容验证...")
+            content_validation = processor.validate_video_content(test_video_path)
+            if content_validation["valid"]:
+                print(f"✅ 内容验证通过: {content_validation['readable_frames']}/{content_validation['total_frames']} 帧可读")
+            else:
+                print(f"❌ 内容验证失败: {content_validation['errors']}")
+            
+            # 测试缩略图提取
+            print("\n🖼️ 测试缩略图提取...")
+            thumbnail_path = processor.extract_thumbnail(test_video_path, 1.5)
+            if thumbnail_path and os.path.exists(thumbnail_path):
+                print(f"✅ 缩略图提取成功: {thumbnail_path}")
+                
+                # 验证缩略图
+                thumbnail = cv2.imread(thumbnail_path)
+                if thumbnail is not None:
+                    h, w = thumbnail.shape[:2]
+                    print(f"✅ 缩略图尺寸: {w}x{h}")
+                else:
+                    print("❌ 缩略图文件损坏")
+            else:
+                print("❌ 缩略图提取失败")
+            
+            # 测试帧样本提取
+            print("\n🎞️ 测试帧样本提取...")
+            samples = processor.get_video_frames_sample(test_video_path, 5)
+            if samples:
+                print(f"✅ 帧样本提取成功: {len(samples)} 个样本")
+                for i, (timestamp, frame_path) in enumerate(samples):
+                    if os.path.exists(frame_path):
+                        print(f"  样本 {i+1}: {timestamp:.2f}s -> {frame_path}")
+                    else:
+                        print(f"  ❌ 样本 {i+1} 文件不存在: {frame_path}")
+            else:
+                print("❌ 帧样本提取失败")
+            
+            return True
+            
+        except Exception as e:
+            print(f"❌ 测试过程中发生错误: {e}")
             return False
+            
+        finally:
+            # 清理测试文件
+            try:
+                os.unlink(test_video_path)
+                processor.cleanup_temp_files()
+                print("🧹 测试文件清理完成")
+            except:
+                pass
+
+def test_keyframe_index():
+    """测试关键帧索引和按时间戳取帧"""
+    print("\n🔍 测试关键帧索引...")
+    
+    processor = VideoProcessor()
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_video_path = os.path.join(temp_dir, "index_test.mp4")
+        create_test_video(test_video_path, duration=2, fps=10, width=160, height=120)
         
-        # 测试视频信息提取
-        print("\n📊 测试视频信息提取...")
-        info = processor.extract_video_info(test_video_path)
-        print(f"✅ 视频信息: {info}")
+        store = KeyframeIndexStore(os.path.join(temp_dir, "index"), max_cached=1)
+        index = store.get(test_video_path)
+        assert index.frame_count == 20 and index.keyframes[0] == 0, \
+            f"索引内容异常: {index.frame_count} 帧, 关键帧 {index.keyframes}"
+        print(f"✅ 索引构建成功: {index.frame_count} 帧, {len(index.keyframes)} 个关键帧")
         
-        # 验证信息准确性
-        expected_duration = 3.0
-        if abs(info["duration"] - expected_duration) < 0.1:
-            print("✅ 时长信息准确")
-        else:
-            print(f"⚠️ 时长信息可能不准确: {info['duration']} vs {expected_duration}")
+        # 再次获取应命中磁盘索引
+        reloaded = KeyframeIndexStore(os.path.join(temp_dir, "index")).get(test_video_path, build=False)
+        assert reloaded is not None and np.allclose(reloaded.frame_times, index.frame_times), "磁盘索引读取失败"
+        print("✅ 磁盘索引读取成功")
         
-        if info["fps"] == 25:
-            print("✅ 帧率信息准确")
-        else:
-            print(f"⚠️ 帧率信息可能不准确: {info['fps']} vs 25")
+        # 内存层超过上限时淘汰最久未用的索引
+        other_video_path = os.path.join(temp_dir, "index_other.mp4")
+        create_test_video(other_video_path, duration=1, fps=10, width=160, height=120)
+        store.get(other_video_path)
+        assert list(store._indexes) == [str(Path(other_video_path).resolve())], "内存索引未按LRU淘汰"
         
-        # 测试内容验证
-        print("\n🔍 测试内容验证...")
-        content_validation = processor.validate_video_content(test_video_path)
-        if content_validation["valid"]:
-            print(f"✅ 内容验证通过: {content_validation['readable_frames']}/{content_validation['total_frames']} 帧可读")
-        else:
-            print(f"❌ 内容验证失败: {content_validation['errors']}")
+        assert abs(index.frame_times[index.frame_at(1.05)] - 1.0) <= 1e-6, "时间戳定位错误"
         
-        # 测试缩略图提取
-        print("\n🖼️ 测试缩略图提取...")
-        thumbnail_path = processor.extract_thumbnail(test_video_path, 1.5)
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            print(f"✅ 缩略图提取成功: {thumbnail_path}")
-            
-            # 验证缩略图
-            thumbnail = cv2.imread(thumbnail_path)
-            if thumbnail is not None:
-                h, w = thumbnail.shape[:2]
-                print(f"✅ 缩略图尺寸: {w}x{h}")
-            else:
-                print("❌ 缩略图文件损坏")
-        else:
-            print("❌ 缩略图提取失败")
-        
-        # 测试帧样本提取
-        print("\n🎞️ 测试帧样本提取...")
-        samples = processor.get_video_frames_sample(test_video_path, 5)
-        if samples:
-            print(f"✅ 帧样本提取成功: {len(samples)} 个样本")
-            for i, (timestamp, frame_path) in enumerate(samples):
-                if os.path.exists(frame_path):
-                    print(f"  样本 {i+1}: {timestamp:.2f}s -> {frame_path}")
-                else:
-                    print(f"  ❌ 样本 {i+1} 文件不存在: {frame_path}")
-        else:
-            print("❌ 帧样本提取失败")
+        with temporary_index_store(store):
+            frame = processor.read_frame_at(test_video_path, 1.0)
+        assert frame is not None and frame.shape[:2] == (120, 160), "按时间戳取帧失败"
+        print("✅ 按时间戳取帧成功")
+
+def test_frame_reader():
+    """测试单帧读取：可变帧率且视频流晚于容器起点的文件，任意顺序读取都与顺序解码的帧一致"""
+    print("\n🔍 测试按关键帧索引读取单帧...")
+    
+    import imageio_ffmpeg
+    ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+    processor = VideoProcessor()
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 前5秒每0.1秒一帧，之后每0.2秒一帧，每12帧一个关键帧；音轨从0开始，视频流晚0.3秒
+        vfr_path = os.path.join(temp_dir, "vfr.mp4")
+        subprocess.run([
+            ffmpeg, "-y", "-v", "error",
+            "-f", "lavfi", "-i", "testsrc=size=160x120:rate=10:duration=10",
+            "-vf", "settb=1/1000,setpts='if(lt(N,50),N*100,5000+(N-50)*200)'", "-fps_mode", "passthrough",
+            "-c:v", "libx264", "-g", "12", "-pix_fmt", "yuv420p", vfr_path
+        ], check=True)
+        offset_path = os.path.join(temp_dir, "offset.mp4")
+        subprocess.run([
+            ffmpeg, "-y", "-v", "error", "-itsoffset", "0.3", "-i", vfr_path,
+            "-f", "lavfi", "-i", "sine=duration=16", "-map", "0:v", "-map", "1:a",
+            "-c:v", "copy", "-c:a", "aac", offset_path
+        ], check=True)
         
-        return True
+        cap = cv2.VideoCapture(offset_path)
+        frames = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
         
-    except Exception as e:
-        print(f"❌ 测试过程中发生错误: {e}")
-        return False
+        store = KeyframeIndexStore(os.path.join(temp_dir, "index"))
+        index = store.get(offset_path)
+        assert index.frame_count == len(frames) == 100, f"帧数异常: {index.frame_count}, {len(frames)}"
+        assert abs(index.start_offset - 0.3) < 1e-3, f"首帧偏移异常: {index.start_offset}"
+        assert abs(index.frame_times[60] - 7.0) < 1e-3 and index.keyframe_before(60) == 60 and index.keyframe_before(71) == 60
         
-    finally:
-        # 清理测试文件
+        pool = FrameReaderPool(max_open=1)
+        original = video_processor_module.frame_reader_pool
+        video_processor_module.frame_reader_pool = pool
         try:
-            os.unlink(test_video_path)
-            processor.cleanup_temp_files()
-            print("🧹 测试文件清理完成")
-        except:
-            pass
+            with temporary_index_store(store):
+                # 乱序读取，每次都需要seek
+                order = np.random.default_rng(0).permutation(index.frame_count)
+                wrong = [int(i) for i in order
+                         if not np.array_equal(processor.read_frame_at(offset_path, index.frame_times[i] + 0.01), frames[i])]
+                assert wrong == [], f"以下帧读取错误: {wrong}"
+                
+                # 顺序读取时沿用同一个解码器向后解码，只需一次seek
+                reader = pool.get(offset_path, index)
+                seeks = reader.seeks
+                for i in range(index.frame_count):
+                    assert np.array_equal(processor.read_frame_at(offset_path, index.frame_times[i]), frames[i]), f"第{i}帧读取错误"
+                assert pool.get(offset_path, index) is reader and reader.seeks - seeks == 1, f"顺序读取不应反复seek: {reader.seeks - seeks}"
+                
+                # 超过打开上限时关闭最久未用的解码器
+                processor.read_frame_at(vfr_path, 1.0)
+                assert reader.closed and list(pool._readers) == [str(Path(vfr_path).resolve())]
+        finally:
+            pool.close()
+            video_processor_module.frame_reader_pool = original
+    print("✅ 单帧读取正确，顺序读取不重复seek")
+
+def test_frame_batches():
+    """测试内存批量取帧"""
+    print("\n🔍 测试内存批量取帧...")
+    
+    processor = VideoProcessor()
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_video_path = os.path.join(temp_dir, "batch_test.mp4")
+        create_test_video(test_video_path, duration=2, fps=10, width=160, height=120)
+        
+        batches = list(processor.iter_frame_batches(
+            test_video_path, sample_fps=5, batch_size=4, max_width=80, color="gray"
+        ))
+        
+        sizes = [len(timestamps) for timestamps, _ in batches]
+        assert sizes == [4, 4, 2], f"批次大小异常: {sizes}"
+        
+        timestamps, frames = batches[0]
+        assert frames.shape == (4, 60, 80) and frames.flags["C_CONTIGUOUS"], f"帧数组格式异常: {frames.shape}"
+        assert np.allclose(timestamps, [0.0, 0.2, 0.4, 0.6]), f"时间戳异常: {timestamps}"
+
+        # 缩放直接写入批次数组，结果与单独缩放一致
+        cap = cv2.VideoCapture(test_video_path)
+        _, first = cap.read()
+        cap.release()
+        _, frames = next(processor.iter_frame_batches(test_video_path, batch_size=2, max_width=80))
+        assert frames.shape == (2, 60, 80, 3), f"帧数组格式异常: {frames.shape}"
+        assert np.array_equal(frames[0], cv2.resize(first, (80, 60), interpolation=cv2.INTER_AREA)), "缩放结果异常"
+        print(f"✅ 批量取帧成功: {sum(sizes)} 帧, 批次 {sizes}")
+
+        # 可变帧率：前5秒每0.1秒一帧，之后每0.2秒一帧，时间戳应取每帧的实际时间
+        import imageio_ffmpeg
+        vfr_path = os.path.join(temp_dir, "vfr_test.mp4")
+        create_test_video(test_video_path, duration=10, fps=10, width=64, height=48)
+        subprocess.run([
+            imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-v", "error", "-i", test_video_path,
+            "-vf", "setpts='if(lt(N,50),N*0.1,5+(N-50)*0.2)/TB'", "-fps_mode", "passthrough",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", vfr_path
+        ], check=True)
+        timestamps = np.concatenate([t for t, _ in processor.iter_frame_batches(vfr_path, batch_size=16)])
+        expected = np.concatenate([np.arange(50) * 0.1, 5 + np.arange(50) * 0.2])[:len(timestamps)]
+        assert len(timestamps) >= 95 and np.allclose(timestamps, expected, atol=1e-3), f"可变帧率时间戳异常: {timestamps}"
+        print(f"✅ 可变帧率时间戳正确: {len(timestamps)} 帧, 最后 {timestamps[-1]:.1f}s")
+
+def test_scene_detection():
+    """测试场景边界检测"""
+    print("\n🔍 测试场景检测...")
+    
+    from backend.core.scene_detection import detect_scenes
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_video_path = os.path.join(temp_dir, "scene_test.mp4")
+        
+        # 三段不同颜色的画面（第4秒、第7秒切换），每段内有一个移动的方块模拟演员走动
+        fps, width, height = 10, 160, 120
+        out = cv2.VideoWriter(test_video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        for i in range(10 * fps):
+            color = (40, 40, 200) if i < 4 * fps else (200, 80, 40) if i < 7 * fps else (60, 180, 60)
+            frame = np.full((height, width, 3), color, dtype=np.uint8)
+            x = (i * 3) % (width - 20)
+            frame[50:90, x:x + 20] = 255
+            out.write(frame)
+        out.release()
+        
+        result = detect_scenes(test_video_path)
+        timestamps = [boundary["timestamp"] for boundary in result["boundaries"]]
+        assert len(timestamps) == 2 and np.allclose(timestamps, [4.0, 7.0], atol=0.21), \
+            f"场景边界异常: {result['boundaries']}"
+        print(f"✅ 场景检测成功: {result['frames']} 帧, 边界 {timestamps}")
+
+def test_motion_energy():
+    """测试运动能量曲线和多分辨率金字塔"""
+    print("\n🔍 测试运动能量...")
+    
+    from backend.core.motion_energy import compute_motion_energy, build_pyramid, MotionEnergyStore
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_video_path = os.path.join(temp_dir, "motion_test.mp4")
+        
+        # 静止画面中第3~6秒有一个方块移动
+        fps, width, height = 10, 160, 120
+        out = cv2.VideoWriter(test_video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        for i in range(10 * fps):
+            frame = np.full((height, width, 3), 60, dtype=np.uint8)
+            if 3 * fps <= i < 6 * fps:
+                x = (i - 3 * fps) * 4
+                frame[40:100, x:x + 20] = 255
+            out.write(frame)
+        out.release()
+        
+        store = MotionEnergyStore(data_dir=temp_dir)
+        stats = compute_motion_energy(test_video_path, str(store.path_for("video")))
+        pyramid = store.get_pyramid("video", test_video_path)
+        energy = pyramid[0][0]
+        
+        assert stats["seconds"] == 10 and energy.dtype == np.float32, f"运动能量格式异常: {stats}, {energy.dtype}"
+        
+        moving = energy[3:6]
+        still = np.concatenate([energy[:3], energy[7:]])
+        assert moving.min() > 0.005 and still.max() <= 0.001, f"运动能量异常: {np.round(energy, 4)}"
+        print(f"✅ 运动能量计算成功: {np.round(energy, 3)}")
+    
+    # 金字塔每层格数减半，平均值按实际秒数加权，峰值取最大
+    levels = build_pyramid(np.array([1, 0, 0, 0, 4], dtype=np.float32))
+    assert [len(mean) for mean, _ in levels] == [5, 3, 2, 1], f"金字塔层数异常: {levels}"
+    assert np.allclose(levels[1][0], [0.5, 0, 4]) and np.allclose(levels[3][0], [1.0]), f"金字塔平均值异常: {levels}"
+    assert np.allclose(levels[3][1], [4]), f"金字塔峰值异常: {levels}"
+    print("✅ 多分辨率金字塔正确")
+
+def test_thumbnail_cache():
+    """测试缩略图缓存的LRU淘汰和磁盘层"""
+    print("\n🔍 测试缩略图缓存...")
+    
+    from backend.core.thumbnail_cache import ThumbnailCache
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = ThumbnailCache(temp_dir, memory_budget=250, disk_budget=10 * 1024)
+        renders = []
+        
+        def render_for(key):
+            def render():
+                renders.append(key)
+                return bytes([key[2] % 256]) * 100
+            return render
+        
+        keys = [cache.make_key("video", t, 320) for t in (0.0, 1.0, 2.0)]
+        assert keys[0] != keys[1] and cache.make_key("video", 1.1, 320) == keys[1], "时间桶计算错误"
+        
+        for key in keys:
+            cache.get_or_create(key, render_for(key))
+        
+        # 内存预算只够两张，最早的一张应被淘汰到只剩磁盘层
+        stats = cache.get_statistics()
+        assert stats["memory_entries"] == 2 and stats["memory_bytes"] == 200, f"内存层LRU淘汰异常: {stats}"
+        
+        data = cache.get_or_create(keys[0], render_for(keys[0]))
+        assert len(renders) == 3 and data == bytes([keys[0][2]]) * 100 and cache.disk_hits == 1, "磁盘层未命中"
+        print(f"✅ 缩略图缓存工作正常: {cache.get_statistics()}")
 
 def test_error_handling():
     """测试错误处理"""
@@ -185,8 +440,17 @@ def main():
         print(f"📹 OpenCV版本: {cv2.__version__}")
         
         success &= test_video_processor()
+        test_keyframe_index()
+        test_frame_reader()
+        test_frame_batches()
+        test_scene_detection()
+        test_motion_energy()
+        test_thumbnail_cache()
         success &= test_error_handling()
         
+    except AssertionError as e:
+        print(f"❌ 断言失败: {e}")
+        success = False
     except Exception as e:
         print(f"❌ 测试过程中发生错误: {e}")
         success = False
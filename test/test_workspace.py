@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+测试临时工作区、磁盘配额和过期清理
+"""
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.workspace import WorkspaceManager, WorkspaceQuotaExceeded
+
+def test_workspace_isolation():
+    """测试同名文件在不同工作区中互不覆盖，退出时删除"""
+    print("🔍 测试工作区隔离...")
+
+    with tempfile.TemporaryDirectory() as root:
+        manager = WorkspaceManager(root=root, quota_bytes=1024 * 1024)
+
+        with manager.workspace("audio") as first, manager.workspace("audio") as second:
+            assert first.path != second.path
+            first.file("clip.wav").write_bytes(b"a")
+            second.file("clip.wav").write_bytes(b"b")
+            assert first.file("clip.wav").read_bytes() == b"a"
+            # 文件名中的目录部分被忽略，不会写到工作区之外
+            assert first.file("../../clip.wav").parent == first.path
+
+        assert not first.path.exists() and not second.path.exists()
+        print("✅ 工作区隔离正确")
+
+def test_workspace_cleanup():
+    """测试过期清理、配额清理和使用中的工作区保护"""
+    print("\n🔍 测试工作区清理...")
+
+    with tempfile.TemporaryDirectory() as root:
+        manager = WorkspaceManager(root=root, quota_bytes=10_000, max_age=3600)
+
+        def age(workspace, seconds):
+            mtime = time.time() - seconds
+            for path in [workspace.path, *workspace.path.iterdir()]:
+                os.utime(path, (mtime, mtime))
+
+        # 过期的空闲工作区被删除，使用中的即使过期也保留
+        stale = manager.create("frames", detach=True)
+        stale.file("a.jpg").write_bytes(b"x" * 100)
+        age(stale, 7200)
+
+        active = manager.create("frames")
+        active.file("b.jpg").write_bytes(b"x" * 100)
+        age(active, 7200)
+
+        result = manager.cleanup()
+        assert result["removed"] == 1
+        assert not stale.path.exists() and active.path.exists()
+        print("✅ 过期清理正确")
+
+        # 超出配额时从最旧的空闲工作区开始删除
+        idle = []
+        for i in range(3):
+            workspace = manager.create("audio", detach=True)
+            workspace.file("clip.wav").write_bytes(b"x" * 4000)
+            age(workspace, 100 - i)
+            idle.append(workspace)
+
+        manager.cleanup()
+        assert manager.disk_usage() <= 9000
+        assert not idle[0].path.exists() and idle[2].path.exists() and active.path.exists()
+        print("✅ 配额清理正确")
+
+        # 清理后仍超出配额时拒绝创建
+        active.file("big.bin").write_bytes(b"x" * 20_000)
+        try:
+            manager.create("audio")
+            assert False, "应当超出配额"
+        except WorkspaceQuotaExceeded:
+            pass
+        active.release()
+        print("✅ 配额限制正确")
+
+def test_cross_process_in_use():
+    """测试其他进程（如ASR工作进程）正在使用的工作区不会被本进程的清理任务删除"""
+    print("\n🔍 测试跨进程使用中保护...")
+
+    with tempfile.TemporaryDirectory() as root:
+        manager = WorkspaceManager(root=root, quota_bytes=1024 * 1024)
+        script = (
+            "import sys, time\n"
+            f"sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r})\n"
+            "from backend.core.workspace import WorkspaceManager\n"
+            f"workspace = WorkspaceManager(root={root!r}).create('asr')\n"
+            "workspace.file('audio.wav').write_bytes(b'x' * 100)\n"
+            "print(workspace.path, flush=True)\n"
+            "time.sleep(30)\n"
+        )
+        worker = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True)
+        try:
+            path = worker.stdout.readline().strip()
+            assert path and os.path.isdir(path)
+            assert manager.cleanup(max_age=0)["removed"] == 0, "其他进程使用中的工作区不应被删除"
+            assert os.path.isdir(path)
+        finally:
+            worker.kill()
+            worker.wait()
+            worker.stdout.close()
+
+        # 创建进程退出后标记失效，按普通空闲工作区清理
+        assert manager.cleanup(max_age=0)["removed"] == 1
+        assert not os.path.exists(path)
+        print("✅ 跨进程使用中保护正确")
+
+def test_remove_files_skips_in_use():
+    """测试按文件名清理临时文件时只删除空闲工作区中的文件"""
+    print("\n🔍 测试按文件名清理...")
+
+    from backend.core import video_processor as video_processor_module
+
+    with tempfile.TemporaryDirectory() as root:
+        manager = WorkspaceManager(root=root, quota_bytes=1024 * 1024)
+        idle = manager.create("frames", detach=True)
+        active = manager.create("frames")
+        for workspace in (idle, active):
+            workspace.file("frame_0001.jpg").write_bytes(b"x")
+            workspace.file("clip.wav").write_bytes(b"x")
+
+        original = video_processor_module.workspace_manager
+        video_processor_module.workspace_manager = manager
+        try:
+            video_processor_module.VideoProcessor().cleanup_temp_files("*.jpg")
+        finally:
+            video_processor_module.workspace_manager = original
+
+        assert not idle.file("frame_0001.jpg").exists() and idle.file("clip.wav").exists()
+        assert active.file("frame_0001.jpg").exists(), "使用中的工作区中的文件不应被删除"
+        assert manager.remove_files("*") == 1 and active.file("clip.wav").exists()
+        active.release()
+        print("✅ 按文件名清理只影响空闲工作区")
+
+if __name__ == "__main__":
+    test_workspace_isolation()
+    test_workspace_cleanup()
+    test_cross_process_in_use()
+    test_remove_files_skips_in_use()
+    print("\n🎉 工作区测试通过！")